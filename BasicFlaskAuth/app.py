@@ -1,124 +1,55 @@
-from flask import Flask, request, abort
-import json
+from flask import Flask, jsonify
+import os
 from functools import wraps
-from jose import jwt
-from urllib.request import urlopen
+
+# the verifier of flask_toolkit is shared with the coffee shop backend
+from flask_toolkit.auth import AuthError, TokenCache, Verifier, get_token_auth_header, key_source
 
 
 app = Flask(__name__)
 
-AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
+# @TODO replace the defaults with your Auth0 domain and API audience, or export them
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'YOUR_DOMAIN.auth0.com')
 ALGORITHMS = ['RS256']
-API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
-
-
-class AuthError(Exception):
-    def __init__(self, error, status_code):
-        self.error = error
-        self.status_code = status_code
-
-
-def get_token_auth_header():
-    """Obtains the Access Token from the Authorization Header
-    """
-    auth = request.headers.get('Authorization', None)
-    if not auth:
-        raise AuthError({
-            'code': 'authorization_header_missing',
-            'description': 'Authorization header is expected.'
-        }, 401)
-
-    parts = auth.split()
-    if parts[0].lower() != 'bearer':
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization header must start with "Bearer".'
-        }, 401)
-
-    elif len(parts) == 1:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Token not found.'
-        }, 401)
-
-    elif len(parts) > 2:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization header must be bearer token.'
-        }, 401)
+API_AUDIENCE = os.environ.get('API_AUDIENCE', 'YOUR_API_AUDIENCE')
+JWKS_URL = os.environ.get('JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
 
-    token = parts[1]
-    return token
+verifier = Verifier(
+    key_source(JWKS_URL),
+    issuer='https://' + AUTH0_DOMAIN + '/',
+    audience=API_AUDIENCE,
+    algorithms=ALGORITHMS,
+    cache=TokenCache(maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)))
+)
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
-    if 'kid' not in unverified_header:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization malformed.'
-        }, 401)
-
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-    if rsa_key:
-        try:
-            payload = jwt.decode(
-                token,
-                rsa_key,
-                algorithms=ALGORITHMS,
-                audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
-            )
-
-            return payload
-
-        except jwt.ExpiredSignatureError:
-            raise AuthError({
-                'code': 'token_expired',
-                'description': 'Token expired.'
-            }, 401)
-
-        except jwt.JWTClaimsError:
-            raise AuthError({
-                'code': 'invalid_claims',
-                'description': 'Incorrect claims. Please, check the audience and issuer.'
-            }, 401)
-        except Exception:
-            raise AuthError({
-                'code': 'invalid_header',
-                'description': 'Unable to parse authentication token.'
-            }, 400)
-    raise AuthError({
-                'code': 'invalid_header',
-                'description': 'Unable to find the appropriate key.'
-            }, 400)
+    payload, _ = verifier.verify(token)
+    return payload
 
 
 def requires_auth(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         token = get_token_auth_header()
-        try:
-            payload = verify_decode_jwt(token)
-        except:
-            abort(401)
+        payload = verify_decode_jwt(token)
         return f(payload, *args, **kwargs)
 
     return wrapper
 
+
+@app.errorhandler(AuthError)
+def auth_error(error):
+    return jsonify({
+        'success': False,
+        'error': error.status_code,
+        'code': error.error['code'],
+        'message': error.error['description']
+    }), error.status_code
+
+
 @app.route('/headers')
 @requires_auth
 def headers(payload):
     print(payload)
-    return 'Access Granted'
\ No newline at end of file
+    return 'Access Granted'
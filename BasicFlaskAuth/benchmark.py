@@ -0,0 +1,130 @@
+'''
+Auth overhead benchmark for the follow-along app.
+
+Signs tokens with a local RSA issuer and serves its JWKS over local HTTP
+(the stand-in is flask_toolkit/auth/local_idp.py), so
+nothing reaches Auth0. GET /headers is called through the Flask test
+client with valid, expired, wrong-audience and unknown-kid tokens.
+get_token_auth_header and verify_decode_jwt are timed separately from the
+rest of the request, and the shared verifier's timing hooks split
+verify_decode_jwt into cache lookup, header parsing, key lookup (including
+the JWKS download) and signature/claims check. p50/p95 per scenario are
+printed as JSON in milliseconds.
+
+Usage:
+    python benchmark.py --requests 200 --jwks-delay 0.02
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from functools import wraps
+
+from flask_toolkit.auth.local_idp import LocalIssuer, serve_jwks
+
+STAGES = ('get_token_auth_header', 'verify_decode_jwt')
+VERIFIER_STAGES = ('cache', 'header', 'key', 'decode')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return round(values[index] * 1000, 3)
+
+
+def install_timers(module, spent):
+    for name in STAGES:
+        original = getattr(module, name)
+
+        def timed(*args, _name=name, _original=original, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                spent[_name] = spent.get(_name, 0) + time.perf_counter() - start
+        setattr(module, name, wraps(original)(timed))
+
+    def record(stage, seconds):
+        spent[stage] = spent.get(stage, 0) + seconds
+    module.verifier.add_hook(record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--jwks-delay', type=float, default=0.0,
+                        help='seconds the JWKS stand-in waits before answering')
+    args = parser.parse_args(argv)
+
+    issuer = LocalIssuer('https://bench.local/', 'bench-api')
+    server = serve_jwks(issuer, delay=args.jwks_delay)
+    os.environ.update({
+        'AUTH0_DOMAIN': 'bench.local',
+        'API_AUDIENCE': 'bench-api',
+        'JWKS_URL': server.url
+    })
+    import app as basic_auth
+
+    spent = {}
+    install_timers(basic_auth, spent)
+    client = basic_auth.app.test_client()
+    tokens = {
+        'valid': issuer.issue(),
+        'expired': issuer.issue(expires_in=-60),
+        'wrong_audience': issuer.issue(audience='not-the-api'),
+        'unknown_kid': issuer.issue(kid='retired-key')
+    }
+
+    report = {}
+    for name, token in tokens.items():
+        headers = {'Authorization': 'Bearer ' + token}
+        totals, auth_times, handler_times, statuses = [], [], [], {}
+        stages = {stage: [] for stage in STAGES + VERIFIER_STAGES}
+        for _ in range(args.requests):
+            spent.clear()
+            start = time.perf_counter()
+            # /headers prints the payload, keep it out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = client.get('/headers', headers=headers)
+            total = time.perf_counter() - start
+
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            auth_time = spent.get('get_token_auth_header', 0) + spent.get('verify_decode_jwt', 0)
+            totals.append(total)
+            auth_times.append(auth_time)
+            handler_times.append(max(total - auth_time, 0))
+            for stage in stages:
+                if stage in spent:
+                    stages[stage].append(spent[stage])
+
+        report[name] = {
+            'requests': len(totals),
+            'status': statuses,
+            'total_p50_ms': percentile(totals, 50),
+            'total_p95_ms': percentile(totals, 95),
+            'auth_p50_ms': percentile(auth_times, 50),
+            'auth_p95_ms': percentile(auth_times, 95),
+            'handler_p50_ms': percentile(handler_times, 50),
+            'handler_p95_ms': percentile(handler_times, 95),
+            'stages_p50_ms': {stage: percentile(values, 50)
+                              for stage, values in stages.items() if values}
+        }
+    server.shutdown()
+
+    json.dump({
+        'requests': args.requests,
+        'jwks_delay_s': args.jwks_delay,
+        'jwks_fetches': server.fetches,
+        'scenarios': report
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,16 @@
-from flask import Flask, request, jsonify, abort
+import os
+from flask import request, abort
 
-app = Flask(__name__)
+from greeting_store import GreetingStore, open_backend
+
+from flask_toolkit import create_app
+
+# JSON errors and request timing from flask_toolkit, no cross-origin clients
+app = create_app(__name__, {'CORS_ENABLED': False})
 
 greetings = {
-            'en': 'hello', 
-            'es': 'Hola', 
+            'en': 'hello',
+            'es': 'Hola',
             'ar': 'مرحبا',
             'ru': 'Привет',
             'fi': 'Hei',
@@ -12,22 +18,38 @@ greetings = {
             'ja': 'こんにちは'
             }
 
+# greetings above are the initial set; GREETINGS_STORE=greetings.json or
+# sqlite:///greetings.db shares them between worker processes
+store = GreetingStore(greetings, backend=open_backend(os.environ.get('GREETINGS_STORE')))
+
+
+def json_body(body, status=200):
+    return app.response_class(body, status=status, mimetype='application/json')
+
 @app.route('/greeting', methods=['GET'])
 def greeting_all():
-    return jsonify({'greetings': greetings})
+    snapshot = store.snapshot()
+    accept_language = request.headers.get('Accept-Language')
+    lang = snapshot.negotiate(accept_language) if accept_language else None
+    if(lang is None):
+        response = json_body(snapshot.body)
+    else:
+        response = json_body(snapshot.bodies[lang])
+        response.headers['Content-Language'] = lang
+    response.vary.add('Accept-Language')
+    return response
 
 @app.route('/greeting/<lang>', methods=['GET'])
 def greeting_one(lang):
     print(lang)
-    if(lang not in greetings):
+    body = store.snapshot().bodies.get(lang)
+    if(body is None):
         abort(404)
-    return jsonify({'greeting': greetings[lang
-    ]})
+    return json_body(body)
 
 @app.route('/greeting', methods=['POST'])
 def greeting_add():
     info = request.get_json()
-    if('lang' not in info or 'greeting' not in info):
+    if(not isinstance(info, dict) or not isinstance(info.get('lang'), str) or 'greeting' not in info):
         abort(422)
-    greetings[info['lang']] = info['greeting']
-    return jsonify({'greetings':greetings})
+    return json_body(store.set(info['lang'], info['greeting']).body)
@@ -0,0 +1,90 @@
+'''
+Accept-Language negotiation benchmark.
+
+Loads the greetings plus --locales generated region variants (xx-YY) into
+a snapshot and times Snapshot.negotiate() for a mix of browser-style
+headers: first seen (header parsed and matched) and repeated (answered
+from the per-snapshot memo). Also times a full GET /greeting through the
+Flask test client for comparison. Prints microseconds per call as JSON.
+
+Usage:
+    python benchmark.py --locales 500 --headers 200
+'''
+import argparse
+import json
+import random
+import string
+import sys
+import time
+
+from greeting_store import Snapshot, parse_accept_language
+
+
+def locales(count, rng):
+    tags = set()
+    while len(tags) < count:
+        language = ''.join(rng.choice(string.ascii_lowercase) for _ in range(2))
+        region = ''.join(rng.choice(string.ascii_uppercase) for _ in range(2))
+        tags.add(f'{language}-{region}')
+    return sorted(tags)
+
+
+def headers(tags, count, rng):
+    result = []
+    for _ in range(count):
+        first, second = rng.sample(tags, 2)
+        # a region the index does not hold, falling back to the language
+        result.append(f'{first.split("-")[0]}-ZZ,{second};q=0.8,en;q=0.5,*;q=0.1')
+    return result
+
+
+def per_call_us(f, values, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            f(value)
+    return round((time.perf_counter() - start) / (repeat * len(values)) * 1e6, 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locales', type=int, default=500)
+    parser.add_argument('--headers', type=int, default=200, help='distinct Accept-Language headers')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    import FlaskRecap
+    rng = random.Random(args.seed)
+    tags = locales(args.locales, rng)
+    greetings = dict(FlaskRecap.greetings)
+    greetings.update((tag, f'greeting {tag}') for tag in tags)
+    sample = headers(tags, args.headers, rng)
+
+    def first_seen(header):
+        parse_accept_language.cache_clear()
+        return Snapshot._negotiate(snapshot, parse_accept_language(header))
+
+    snapshot = Snapshot(1, greetings)
+    first_seen_us = per_call_us(first_seen, sample, args.repeat)
+    repeated_us = per_call_us(snapshot.negotiate, sample, args.repeat)
+
+    for tag in tags:
+        FlaskRecap.store.set(tag, f'greeting {tag}')
+    client = FlaskRecap.app.test_client()
+    request_us = per_call_us(lambda header: client.get('/greeting', headers={'Accept-Language': header}),
+                             sample, 2)
+
+    json.dump({
+        'locales': len(greetings),
+        'headers': len(sample),
+        'negotiate_first_seen_us': first_seen_us,
+        'negotiate_repeated_us': repeated_us,
+        'get_greeting_request_us': request_us
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from types import MappingProxyType
+
+try:
+    import fcntl
+except ImportError:
+    # no cross-process file locks on Windows, writes are then only
+    # serialized within a process
+    fcntl = None
+
+
+def encode(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+@lru_cache(maxsize=1024)
+def parse_accept_language(header):
+    '''
+    the language ranges of an Accept-Language header as (range, q) pairs,
+    lower-cased and ordered by q, then by position. parsed once per
+    distinct header.
+    '''
+    ranges = []
+    for position, part in enumerate(header.split(',')):
+        tag, _, params = part.partition(';')
+        tag = tag.strip().lower()
+        if not tag:
+            continue
+        q = 1.0
+        name, _, value = params.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                q = max(0.0, min(1.0, float(value)))
+            except ValueError:
+                continue
+        ranges.append((-q, position, tag))
+    ranges.sort()
+    return tuple((tag, -q) for q, _, tag in ranges)
+
+
+# distinct Accept-Language headers remembered per snapshot
+NEGOTIATED_CACHE_SIZE = 1024
+_MISSING = object()
+
+
+class Snapshot:
+    '''
+    one immutable version of the greetings: a read-only mapping, the
+    encoded body of GET /greeting and the encoded body of each
+    GET /greeting/<lang>, all built once when the version is created.
+    index maps every lower-cased language tag, and every prefix of one
+    (es for es-MX), to the greeting key that serves it.
+    '''
+    __slots__ = ('version', 'greetings', 'body', 'bodies', 'index', '_negotiated')
+
+    def __init__(self, version, greetings):
+        self.version = version
+        self.greetings = MappingProxyType(dict(greetings))
+        self.body = encode({'greetings': self.greetings.copy()})
+        self.bodies = MappingProxyType({lang: encode({'greeting': greeting})
+                                        for lang, greeting in self.greetings.items()})
+        index = {lang.lower(): lang for lang in self.greetings}
+        for lang in self.greetings:
+            subtags = lang.lower().split('-')
+            for end in range(len(subtags) - 1, 0, -1):
+                index.setdefault('-'.join(subtags[:end]), lang)
+        self.index = MappingProxyType(index)
+        self._negotiated = {}
+
+    '''
+    negotiate(accept_language)
+        the greeting key best matching the header, None when nothing
+        acceptable is loaded. ranges are tried by q; a range matches its
+        own tag, a more specific tag (es matches es-MX), or else falls back
+        to its prefixes (es-MX falls back to es). q=0 excludes a language.
+        results are remembered per header for the life of the snapshot.
+    '''
+    def negotiate(self, accept_language):
+        lang = self._negotiated.get(accept_language, _MISSING)
+        if lang is _MISSING:
+            lang = self._negotiate(parse_accept_language(accept_language))
+            if len(self._negotiated) < NEGOTIATED_CACHE_SIZE:
+                self._negotiated[accept_language] = lang
+        return lang
+
+    def _negotiate(self, ranges):
+        excluded = {tag for tag, q in ranges if q == 0}
+        for tag, q in ranges:
+            if q == 0:
+                break
+            if tag == '*':
+                for lang in self.greetings:
+                    if lang.lower() not in excluded:
+                        return lang
+                continue
+            while True:
+                lang = self.index.get(tag)
+                if lang is not None and lang.lower() not in excluded:
+                    return lang
+                cut = tag.rfind('-')
+                if cut == -1:
+                    break
+                tag = tag[:cut]
+        return None
+
+
+class GreetingStore:
+    '''
+    copy-on-write store of greetings. readers take the current snapshot
+    with a single attribute read and never lock; a writer builds the next
+    version from a copy and swaps it in, so a reader sees either the old
+    or the new version, never a half-written one.
+
+    backend: optional FileBackend or SQLiteBackend shared by several worker
+        processes. writes go through it, and readers pick up versions
+        written by other processes at most check_interval seconds late.
+    '''
+
+    def __init__(self, initial, backend=None, check_interval=0.1):
+        self.backend = backend
+        self.check_interval = check_interval
+        self._write_lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        if backend is None:
+            self._current = Snapshot(1, initial)
+        else:
+            self._current = Snapshot(*backend.load(initial))
+
+    def snapshot(self):
+        current = self._current
+        if self.backend is not None and time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            if self.backend.version() != current.version:
+                with self._write_lock:
+                    current = self._current = Snapshot(*self.backend.load())
+        return current
+
+    def set(self, lang, greeting):
+        with self._write_lock:
+            if self.backend is None:
+                greetings = dict(self._current.greetings)
+                greetings[lang] = greeting
+                self._current = Snapshot(self._current.version + 1, greetings)
+            else:
+                self._current = Snapshot(*self.backend.set(lang, greeting))
+            return self._current
+
+
+class FileBackend:
+    '''
+    greetings in a JSON file. writers lock a sibling .lock file, re-read
+    the file, and replace it atomically with os.replace(), so readers in
+    other processes only ever open a complete version. the version is
+    the (inode, mtime) of the file, checked with a single stat().
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock_path = path + '.lock'
+
+    def version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def load(self, initial=None):
+        with self._locked():
+            if initial is not None and not os.path.exists(self.path):
+                self._write(initial)
+            return self._read()
+
+    def set(self, lang, greeting):
+        with self._locked():
+            _, greetings = self._read()
+            greetings[lang] = greeting
+            self._write(greetings)
+            return self._read()
+
+    def _read(self):
+        version = self.version()
+        with open(self.path, encoding='utf-8') as f:
+            greetings = json.load(f)
+        # a replace between stat() and open() only makes the next check reload
+        return version, greetings
+
+    def _write(self, greetings):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.greetings-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(greetings, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _locked(self):
+        return _FileLock(self._lock_path)
+
+
+class _FileLock:
+    _thread_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+class SQLiteBackend:
+    '''
+    greetings in a SQLite table. every write bumps a counter in the meta
+    table in the same transaction, so checking for a new version is one
+    primary-key read on a per-thread connection.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS greetings '
+                               '(lang TEXT PRIMARY KEY, greeting TEXT NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS meta '
+                               '(id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)')
+            connection.execute('INSERT OR IGNORE INTO meta (id, version) VALUES (1, 0)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode = WAL')
+            self._local.connection = connection
+        return connection
+
+    def version(self):
+        return self._connect().execute('SELECT version FROM meta WHERE id = 1').fetchone()[0]
+
+    def load(self, initial=None):
+        connection = self._connect()
+        with connection:
+            # the version and the rows are read in one transaction
+            connection.execute('BEGIN' if initial is None else 'BEGIN IMMEDIATE')
+            if initial is not None and self._version(connection) == 0:
+                connection.executemany('INSERT OR IGNORE INTO greetings (lang, greeting) VALUES (?, ?)',
+                                       initial.items())
+                connection.execute('UPDATE meta SET version = 1 WHERE id = 1')
+            return self._read(connection)
+
+    def set(self, lang, greeting):
+        connection = self._connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('INSERT OR REPLACE INTO greetings (lang, greeting) VALUES (?, ?)',
+                               (lang, greeting))
+            connection.execute('UPDATE meta SET version = version + 1 WHERE id = 1')
+            return self._read(connection)
+
+    def _read(self, connection):
+        return self._version(connection), dict(connection.execute('SELECT lang, greeting FROM greetings'))
+
+    @staticmethod
+    def _version(connection):
+        return connection.execute('SELECT version FROM meta WHERE id = 1').fetchone()[0]
+
+
+def open_backend(url):
+    '''
+    the backend for GREETINGS_STORE: sqlite:///path/to/greetings.db,
+    a path to a JSON file, or None to keep greetings in this process
+    '''
+    if not url:
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    return FileBackend(url)
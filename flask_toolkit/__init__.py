@@ -0,0 +1,19 @@
+'''
+flask_toolkit
+    the app factory shared by the Flask projects of this repository:
+    CORS, JSON error responses, fast JSON, compression, request timing,
+    an in-process response cache and connection pool settings, each
+    switched on or tuned by config. see README.md.
+
+    installed with pip (pyproject.toml in this directory), each project
+    lists it in its requirements.txt.
+    versions and conditional (SQLAlchemy) and auth (python-jose) are
+    imported on their own, so apps without those dependencies can use
+    the rest.
+'''
+from .caching import ResponseCache
+from .database import engine_options, init_db
+from .errors import DEFAULT_ERROR_MESSAGES, error_response, register_json_errors
+from .factory import DEFAULTS, Toolkit, create_app, init_app
+from .responses import FastJSONProvider, compress_response
+from .timing import RequestTiming
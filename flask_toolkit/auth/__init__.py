@@ -0,0 +1,14 @@
+'''
+flask_toolkit.auth
+    bearer token verification shared by the coffee shop backend and
+    BasicFlaskAuth: Verifier, AuthError and get_token_auth_header
+    (verifier.py), key sources (keys.py, jwks.py), the verified-token
+    cache (token_cache.py) and permission requirements (permissions.py).
+    needs python-jose, which is why flask_toolkit does not import it.
+    local_idp.py is a stand-in IdP for tests and benchmarks.
+'''
+from .jwks import JWKSKeyStore, JWKSUnavailable
+from .keys import key_source
+from .permissions import all_of, any_of, compile_permissions, permissions_of
+from .token_cache import TokenCache
+from .verifier import AuthError, Verifier, get_token_auth_header
@@ -0,0 +1,158 @@
+import json
+import logging
+import threading
+import time
+from urllib.request import urlopen
+
+from jose import jwk
+
+logger = logging.getLogger(__name__)
+
+
+'''
+JWKSUnavailable Exception
+    no signing keys could be fetched, __cause__ is the error of the last attempt
+'''
+class JWKSUnavailable(Exception):
+    pass
+
+
+'''
+JWKSKeyStore
+    caches the signing keys published at a JWKS url (https:// or file://),
+    indexed by kid, with each key parsed into a jose key object once.
+
+    ttl: seconds a fetched key set is trusted. once it is older than
+        refresh_ahead * ttl the next lookup starts a background refresh and
+        keeps answering from the current set; only a lookup past ttl waits
+        for the fetch.
+    min_refetch_interval: an unknown kid triggers one immediate refetch
+        (the IdP may have rotated keys). no fetch starts sooner than this
+        after the previous attempt, failed or not, so neither tokens with
+        made-up kids nor an IdP outage turn into a fetch per request.
+
+    fetches are single-flight: threads that miss while a fetch is running
+    wait for it and reuse its outcome, the new keys or its error, instead
+    of fetching again. when a refresh fails the previous keys stay in use;
+    with no keys at all, lookups raise JWKSUnavailable until
+    min_refetch_interval has passed since the failed attempt.
+'''
+class JWKSKeyStore:
+    requires_kid = True
+
+    def __init__(self, url, ttl=3600, refresh_ahead=0.8, min_refetch_interval=30,
+                 timeout=5, algorithm='RS256'):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.algorithm = algorithm
+
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        self._error = None
+        # completed attempts, successful or not, bumped under _fetch_lock
+        self._attempts = 0
+        self._fetch_lock = threading.Lock()
+        self._background = None
+        self.fetches = 0
+
+    '''
+    get_key(kid)
+        returns the key object for kid, None if the IdP does not publish it.
+        raises JWKSUnavailable when there are no keys and none can be fetched
+    '''
+    def get_key(self, kid):
+        attempts = self._attempts
+        age = self._age()
+        if age is None:
+            # no keys yet: back off after a failed attempt unless one is in flight
+            if not self._may_fetch() and not self._fetch_lock.locked():
+                self._raise_unavailable()
+            self.refresh(attempts)
+        elif age >= self.ttl * self.refresh_ahead and self._may_fetch():
+            if age >= self.ttl:
+                self.refresh(attempts)
+            else:
+                self._refresh_in_background()
+
+        attempts = self._attempts
+        key = self._keys.get(kid)
+        # a fetch already in flight may bring the key, wait for it
+        if key is None and (self._may_fetch() or self._fetch_lock.locked()):
+            self.refresh(attempts)
+            key = self._keys.get(kid)
+        return key
+
+    '''
+    refresh(seen_attempts=None)
+        fetches the key set now. with seen_attempts, a thread that waited
+        for the lock while another attempt completed reuses that attempt's
+        outcome instead of fetching: it returns, or raises JWKSUnavailable
+        when the attempt failed and there are no keys.
+    '''
+    def refresh(self, seen_attempts=None):
+        with self._fetch_lock:
+            if seen_attempts is not None and self._attempts != seen_attempts:
+                if not self._keys and self._error is not None:
+                    self._raise_unavailable()
+                return
+            self._attempted_at = time.monotonic()
+            try:
+                keys = self._fetch()
+            except Exception as e:
+                self._error = e
+                self._attempts += 1
+                if not self._keys:
+                    self._raise_unavailable()
+                logger.warning('JWKS refresh from %s failed, keeping %d cached keys',
+                               self.url, len(self._keys), exc_info=True)
+                return
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            self._error = None
+            self._attempts += 1
+
+    def clear(self):
+        with self._fetch_lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._attempted_at = None
+            self._error = None
+
+    def _fetch(self):
+        self.fetches += 1
+        with urlopen(self.url, timeout=self.timeout) as response:
+            jwks = json.loads(response.read())
+
+        keys = {}
+        for key in jwks.get('keys', []):
+            if 'kid' not in key or key.get('use', 'sig') != 'sig':
+                continue
+            try:
+                keys[key['kid']] = jwk.construct(key, algorithm=self.algorithm)
+            except Exception:
+                logger.warning('skipping unusable JWKS key %s', key['kid'], exc_info=True)
+        return keys
+
+    def _age(self):
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def _raise_unavailable(self):
+        raise JWKSUnavailable('no signing keys could be fetched from {}'.format(self.url)) from self._error
+
+    def _may_fetch(self):
+        return (self._attempted_at is None or
+                time.monotonic() - self._attempted_at >= self.min_refetch_interval)
+
+    def _refresh_in_background(self):
+        if self._background is not None and self._background.is_alive():
+            return
+        thread = threading.Thread(target=self.refresh, args=(self._attempts,),
+                                  name='jwks-refresh', daemon=True)
+        self._background = thread
+        thread.start()
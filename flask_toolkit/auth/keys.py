@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+
+from jose import jwk
+
+from .jwks import JWKSKeyStore
+
+
+'''
+key sources
+    where a Verifier takes its signing keys from. every source has
+    get_key(kid), returning a key object or None when it has no key for
+    kid, and raising when the keys cannot be read at all, and
+    requires_kid, telling whether tokens must name their key.
+
+    JWKSKeyStore (jwks.py)  a remote JWKS url, cached and refreshed ahead
+    JWKSFile(path)          a JWKS document on disk, re-read when it changes
+    StaticKey(pem)          one PEM public key, e.g. a service's own signer
+'''
+
+'''
+JWKSFile(path, check_interval=1, algorithm='RS256')
+    a JWKS document on disk, parsed once and re-read when its mtime
+    changes. the mtime is checked at most every check_interval seconds.
+'''
+class JWKSFile:
+    requires_kid = True
+
+    def __init__(self, path, check_interval=1, algorithm='RS256'):
+        self.path = path
+        self.check_interval = check_interval
+        self.algorithm = algorithm
+        self._keys = {}
+        self._mtime = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def get_key(self, kid):
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            with self._lock:
+                self._checked_at = now
+                try:
+                    mtime = os.stat(self.path).st_mtime_ns
+                    if mtime != self._mtime:
+                        self._keys = self._load()
+                        self._mtime = mtime
+                except (OSError, ValueError):
+                    # keep the last keys while the file is being replaced
+                    if not self._keys:
+                        raise
+        return self._keys.get(kid)
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._mtime = None
+            self._checked_at = None
+
+    def _load(self):
+        self.fetches += 1
+        with open(self.path) as f:
+            jwks = json.load(f)
+        return {key['kid']: jwk.construct(key, algorithm=self.algorithm)
+                for key in jwks.get('keys', [])
+                if 'kid' in key and key.get('use', 'sig') == 'sig'}
+
+
+'''
+StaticKey(pem, kid=None, algorithm='RS256')
+    a single public key. with a kid, only tokens naming that kid match;
+    without one, every token is checked against the key, kid or not.
+'''
+class StaticKey:
+    def __init__(self, pem, kid=None, algorithm='RS256'):
+        self.kid = kid
+        self.requires_kid = kid is not None
+        self._key = jwk.construct(pem, algorithm=algorithm)
+
+    def get_key(self, kid):
+        if self.kid is not None and kid != self.kid:
+            return None
+        return self._key
+
+    def clear(self):
+        pass
+
+
+'''
+key_source(spec, ttl=3600, algorithm='RS256')
+    the key source for a configuration value:
+        https://... or http://...   JWKSKeyStore, keys trusted for ttl seconds
+        file:///path or a path      JWKSFile
+        -----BEGIN PUBLIC KEY-----  StaticKey
+'''
+def key_source(spec, ttl=3600, algorithm='RS256'):
+    if spec.lstrip().startswith('-----BEGIN'):
+        return StaticKey(spec, algorithm=algorithm)
+    if spec.startswith(('https://', 'http://')):
+        return JWKSKeyStore(spec, ttl=ttl, algorithm=algorithm)
+    if spec.startswith('file://'):
+        spec = spec[len('file://'):]
+    return JWKSFile(spec, algorithm=algorithm)
@@ -0,0 +1,139 @@
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from jose import jwt
+
+
+'''
+local IdP stand-in
+    an RSA token issuer that publishes its keys as a JWKS document, either
+    written to a file (point JWKS_URL at file://...) or served over local
+    HTTP, so the auth layer can be exercised without reaching Auth0.
+    never use it outside tests and benchmarks.
+'''
+
+def _b64_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _generate_rsa_key(bits):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=bits)
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode('ascii')
+    numbers = private_key.public_key().public_numbers()
+    return pem, numbers.n, numbers.e
+
+
+'''
+LocalIssuer(issuer, audience, bits=2048)
+    holds one or more RSA signing keys. the newest key signs new tokens,
+    rotate() adds a key the way an IdP rollover does.
+'''
+class LocalIssuer:
+    def __init__(self, issuer, audience, bits=2048):
+        self.issuer = issuer
+        self.audience = audience
+        self.bits = bits
+        self.keys = []
+        self.rotate()
+
+    @property
+    def kid(self):
+        return self.keys[-1]['kid']
+
+    def rotate(self, kid=None):
+        pem, n, e = _generate_rsa_key(self.bits)
+        self.keys.append({
+            'kid': kid or uuid.uuid4().hex,
+            'pem': pem,
+            'n': _b64_uint(n),
+            'e': _b64_uint(e)
+        })
+        return self.kid
+
+    def jwks(self):
+        return {'keys': [{
+            'kty': 'RSA',
+            'use': 'sig',
+            'alg': 'RS256',
+            'kid': key['kid'],
+            'n': key['n'],
+            'e': key['e']
+        } for key in self.keys]}
+
+    def write_jwks(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.jwks(), f)
+        return 'file://' + path
+
+    '''
+    issue(permissions=(), expires_in=3600, audience=None, kid=None, **claims)
+        returns a signed RS256 access token shaped like Auth0's.
+        expires_in may be negative to mint an already expired token, and kid
+        may name a key the JWKS does not publish.
+    '''
+    def issue(self, permissions=(), expires_in=3600, audience=None, kid=None, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': self.issuer,
+            'sub': 'local|' + uuid.uuid4().hex[:12],
+            'aud': audience or self.audience,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(permissions)
+        }
+        payload.update(claims)
+        signing_key = self.keys[-1]
+        return jwt.encode(payload, signing_key['pem'], algorithm='RS256',
+                          headers={'kid': kid or signing_key['kid']})
+
+
+class _JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.fetches += 1
+        if server.delay:
+            time.sleep(server.delay)
+        if server.status != 200:
+            self.send_error(server.status)
+            return
+        body = json.dumps(server.issuer.jwks()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+'''
+serve_jwks(issuer, delay=0)
+    serves issuer.jwks() on an ephemeral local port from a daemon thread.
+    returns the server; server.url is the JWKS url, server.fetches counts
+    requests, server.delay (seconds) simulates a slow IdP and server.status
+    (e.g. 503) a failing one.
+    call server.shutdown() when done.
+'''
+def serve_jwks(issuer, delay=0):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _JWKSHandler)
+    server.daemon_threads = True
+    server.issuer = issuer
+    server.delay = delay
+    server.status = 200
+    server.fetches = 0
+    server.url = 'http://127.0.0.1:{}/.well-known/jwks.json'.format(server.server_port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,75 @@
+from itertools import product
+
+
+'''
+Requirement
+    a permission expression compiled once, when the route is registered,
+    into conjunctive normal form: every clause must share at least one
+    permission with the token. single-permission clauses are merged into
+    one frozenset checked with a subset test, so the common cases (one
+    permission, all-of) cost a single set operation per request.
+'''
+class Requirement:
+    def __init__(self, clauses):
+        self.clauses = tuple(frozenset(clause) for clause in clauses)
+        self.required = frozenset(p for clause in self.clauses if len(clause) == 1 for p in clause)
+        self.choices = tuple(clause for clause in self.clauses if len(clause) > 1)
+
+    def satisfied_by(self, permissions):
+        if not self.required <= permissions:
+            return False
+        for clause in self.choices:
+            if clause.isdisjoint(permissions):
+                return False
+        return True
+
+    def __repr__(self):
+        return ' and '.join('(' + ' or '.join(sorted(clause)) + ')' for clause in self.clauses)
+
+
+'''
+compile_permissions(expression)
+    expression is a permission string, or all_of()/any_of() of expressions
+    EXAMPLE
+        @requires_auth(any_of('patch:drinks', all_of('post:drinks', 'delete:drinks')))
+    an empty all_of() or any_of() raises ValueError: it would let every
+    token through
+'''
+def compile_permissions(expression):
+    if isinstance(expression, Requirement):
+        return expression
+    if isinstance(expression, str):
+        return Requirement([[expression]])
+    raise TypeError(f'cannot compile permission expression {expression!r}')
+
+
+def _check_group(name, expressions):
+    if not expressions:
+        raise ValueError(f'{name}() needs at least one permission expression')
+
+
+def all_of(*expressions):
+    _check_group('all_of', expressions)
+    clauses = []
+    for expression in expressions:
+        clauses.extend(compile_permissions(expression).clauses)
+    return Requirement(clauses)
+
+
+def any_of(*expressions):
+    _check_group('any_of', expressions)
+    # (a and b) or c == (a or c) and (b or c)
+    compiled = [compile_permissions(expression).clauses for expression in expressions]
+    return Requirement(frozenset().union(*clauses) for clauses in product(*compiled))
+
+
+'''
+permissions_of(payload)
+    the permissions claim of a verified payload as a frozenset, None when
+    the token carries no permissions claim
+'''
+def permissions_of(payload):
+    permissions = payload.get('permissions')
+    if not isinstance(permissions, (list, tuple)):
+        return None
+    return frozenset(p for p in permissions if isinstance(p, str))
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+'''
+TokenCache(maxsize=1024)
+    bounded LRU of verified JWT payloads keyed by the SHA-256 digest of the
+    token, so the signature and claims of a token are checked once and
+    reused until the token's exp. the raw token is never kept in memory.
+    each payload is stored with the frozenset of its permissions, so the
+    set is built once per token as well.
+
+    tokens without an exp claim are not cached. hits, misses, expirations
+    and evictions are counted, see stats().
+'''
+class TokenCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    '''
+    get(token)
+        returns (payload, permissions) for token, None if it was never
+        verified, has been evicted or has expired
+    '''
+    def get(self, token):
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, permissions, expires_at = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload, permissions
+
+    def put(self, token, payload, permissions=None):
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (payload, permissions, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    '''
+    invalidate(token)
+        drops one token, e.g. on logout
+    invalidate_where(predicate)
+        drops every cached token whose payload matches, e.g. all tokens of
+        a user whose permissions changed: invalidate_where(lambda p: p['sub'] == sub)
+        returns the number of tokens dropped
+    '''
+    def invalidate(self, token):
+        with self._lock:
+            return self._entries.pop(self.digest(token), None) is not None
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            keys = [key for key, (payload, _, _) in self._entries.items() if predicate(payload)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
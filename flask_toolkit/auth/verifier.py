@@ -0,0 +1,217 @@
+import time
+
+from flask import request
+from jose import jwt
+
+from .permissions import permissions_of
+
+
+'''
+AuthError Exception
+A standardized way to communicate auth failure modes
+'''
+class AuthError(Exception):
+    def __init__(self, error, status_code):
+        self.error = error
+        self.status_code = status_code
+
+
+'''
+get_token_auth_header()
+    the token of the request's "Authorization: Bearer <token>" header,
+    raises an AuthError (401) if the header is missing, blank or malformed
+'''
+def get_token_auth_header():
+    auth = request.headers.get('Authorization', None)
+    parts = auth.split() if auth else []
+    if not parts:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    if parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    elif len(parts) == 1:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.'
+        }, 401)
+
+    elif len(parts) > 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must be bearer token.'
+        }, 401)
+
+    return parts[1]
+
+
+'''
+Verifier(keys, issuer, audience, algorithms=('RS256',), cache=None)
+    verifies bearer tokens against a key source (see keys.py) and the
+    expected issuer and audience. shared by the coffee shop and
+    BasicFlaskAuth, so both get the same key caching and error codes.
+
+    cache: an optional TokenCache; verify() then checks each token once
+        until it expires
+    hooks: callables hook(stage, seconds), called after each stage of a
+        verification: 'cache' (lookup), 'header' (parsing the unverified
+        header), 'key' (key lookup, including any JWKS fetch) and 'decode'
+        (signature and claims). add them with add_hook().
+'''
+class Verifier:
+    def __init__(self, keys, issuer, audience, algorithms=('RS256',), cache=None):
+        self.keys = keys
+        self.issuer = issuer
+        self.audience = audience
+        self.algorithms = list(algorithms)
+        self.cache = cache
+        self.hooks = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _done(self, stage, started):
+        if self.hooks:
+            elapsed = time.perf_counter() - started
+            for hook in self.hooks:
+                hook(stage, elapsed)
+
+    '''
+    decode(token)
+        verifies the signature and claims of token, bypassing the cache.
+        returns the payload, raises an AuthError: 401 for missing kid,
+        expired token or wrong claims, 400 for an unparseable token or
+        unknown key, 503 when the key source cannot be read.
+    '''
+    def decode(self, token):
+        return self._decode(token, self.keys.get_key)
+
+    def _decode(self, token, get_key):
+        started = time.perf_counter()
+        try:
+            unverified_header = jwt.get_unverified_header(token)
+        except jwt.JWTError:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+        finally:
+            self._done('header', started)
+
+        kid = unverified_header.get('kid')
+        if kid is None and self.keys.requires_kid:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Authorization malformed.'
+            }, 401)
+
+        started = time.perf_counter()
+        try:
+            key = get_key(kid)
+        except Exception:
+            raise AuthError({
+                'code': 'jwks_unavailable',
+                'description': 'Unable to fetch the signing keys.'
+            }, 503)
+        finally:
+            self._done('key', started)
+
+        if key is None:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to find the appropriate key.'
+            }, 400)
+
+        started = time.perf_counter()
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer
+            )
+
+        except jwt.ExpiredSignatureError:
+            raise AuthError({
+                'code': 'token_expired',
+                'description': 'Token expired.'
+            }, 401)
+
+        except jwt.JWTClaimsError:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Incorrect claims. Please, check the audience and issuer.'
+            }, 401)
+
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+        finally:
+            self._done('decode', started)
+
+    '''
+    verify(token)
+        decode() behind the cache. returns a copy of the payload, so callers
+        cannot alter the cached one, and the frozenset of its permissions
+        (None without a permissions claim).
+    '''
+    def verify(self, token):
+        return self._verify(token, self.keys.get_key)
+
+    def _verify(self, token, get_key):
+        if self.cache is not None:
+            started = time.perf_counter()
+            cached = self.cache.get(token)
+            self._done('cache', started)
+            if cached is not None:
+                payload, permissions = cached
+                return dict(payload), permissions
+
+        payload = self._decode(token, get_key)
+        permissions = permissions_of(payload)
+        if self.cache is not None:
+            self.cache.put(token, payload, permissions)
+        return dict(payload), permissions
+
+    '''
+    verify_many(tokens)
+        verifies a batch of tokens, e.g. for a gateway checking the tokens
+        of many queued calls at once. returns one (payload, permissions,
+        error) tuple per token, in order; error is the AuthError of a
+        rejected token, payload and permissions are None then. a token
+        that appears several times is verified once, and each kid is
+        looked up in the key source once per batch.
+    '''
+    def verify_many(self, tokens):
+        keys = {}
+
+        def get_key(kid):
+            if kid not in keys:
+                keys[kid] = self.keys.get_key(kid)
+            return keys[kid]
+
+        verified = {}
+        results = []
+        for token in tokens:
+            if token not in verified:
+                try:
+                    payload, permissions = self._verify(token, get_key)
+                    verified[token] = (payload, permissions, None)
+                except AuthError as e:
+                    verified[token] = (None, None, e)
+            payload, permissions, error = verified[token]
+            results.append((dict(payload) if payload is not None else None, permissions, error))
+        return results
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, request
+
+# request headers a cached response may vary on, part of the cache key
+KEY_HEADERS = ('Accept', 'Accept-Encoding', 'Accept-Language')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ResponseCache:
+    '''
+    ResponseCache
+        keeps the final bytes of successful GET responses in the process
+        for RESPONSE_CACHE_TTL seconds, keyed by path, query string and the
+        KEY_HEADERS of the request, at most RESPONSE_CACHE_SIZE entries of
+        at most RESPONSE_CACHE_MAX_BYTES each (least recently used first out).
+        requests with an Authorization or Cookie header, streamed responses
+        and responses marked Cache-Control: no-store or private are never
+        cached. every successful POST, PUT, PATCH or DELETE empties the
+        cache of the process; other workers serve their copy until it expires.
+        responses carry X-Cache: HIT or MISS.
+    '''
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._lookup)
+        app.after_request(self._store)
+
+    def _key(self):
+        if request.method != 'GET' or 'Authorization' in request.headers or 'Cookie' in request.headers:
+            return None
+        return (request.full_path,) + tuple(request.headers.get(name, '') for name in KEY_HEADERS)
+
+    def _lookup(self):
+        key = self._key()
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+                    entry = None
+        if entry is None:
+            g._response_cache_key = key
+            return None
+
+        _, status, headers, body = entry
+        response = self.app.response_class(body, status=status, headers=headers)
+        response.headers['X-Cache'] = 'HIT'
+        return response.make_conditional(request)
+
+    def _store(self, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            self.clear()
+            return response
+        key = g.pop('_response_cache_key', None)
+        if key is None:
+            return response
+        response.headers['X-Cache'] = 'MISS'
+
+        config = self.app.config
+        cache_control = response.cache_control
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough or
+                cache_control.no_store or cache_control.private or 'Set-Cookie' in response.headers):
+            return response
+        body = response.get_data()
+        if len(body) > config['RESPONSE_CACHE_MAX_BYTES']:
+            return response
+
+        headers = [(name, value) for name, value in response.headers if name != 'X-Cache']
+        entry = (time.monotonic() + config['RESPONSE_CACHE_TTL'], response.status_code, headers, body)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > config['RESPONSE_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
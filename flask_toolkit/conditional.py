@@ -0,0 +1,96 @@
+import calendar
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from .versions import request_versions
+
+# compressed responses carry the encoding in their ETag, see
+# responses.compress_response
+ENCODING_SUFFIXES = ('', '-gzip', '-br')
+
+
+'''
+compute_etag(versions, extra=())
+    a strong ETag for the current request from the path, the query string,
+    the {tablename: (version, changed_at)} read by TableVersions.read and
+    any extra parts
+'''
+def compute_etag(versions, extra=()):
+    parts = [request.path, request.query_string.decode('latin-1')]
+    parts.extend(f'{table}:{version}' for table, (version, _) in sorted(versions.items()))
+    parts.extend(str(part) for part in extra)
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+'''
+matching_etag(etag, changed_at)
+    returns the validator the client already holds if it is still current,
+    None otherwise. compressed variants carry an encoding suffix.
+    If-Modified-Since is only trusted once the last change is a full second
+    old, since HTTP dates have no sub-second precision. changed_at None
+    (no Last-Modified sent) ignores If-Modified-Since.
+'''
+def matching_etag(etag, changed_at):
+    if request.if_none_match:
+        for suffix in ENCODING_SUFFIXES:
+            if request.if_none_match.contains(etag + suffix):
+                return etag + suffix
+        return None
+
+    since = request.if_modified_since
+    if changed_at is not None and since is not None and time.time() - changed_at >= 1:
+        if int(changed_at) <= calendar.timegm(since.utctimetuple()):
+            return etag
+    return None
+
+
+'''
+@conditional(*tables, vary=None, bypass=None)
+    adds a strong ETag and Last-Modified derived from the versions of the
+    given tables (see versions.TableVersions) to a GET view, and answers
+    If-None-Match / If-Modified-Since with 304 before the view (and its
+    queries) runs. the versions are read from the database in one query
+    before the view reads anything, so a write racing with the view can
+    only make the next check miss, never hit, and every process issues the
+    same validators. the view gets the same versions from
+    versions.request_versions() without another query.
+    vary: optional callable whose result is folded into the ETag, for views
+        that also depend on something other than table contents (e.g. the
+        clock). Last-Modified is not sent for those views.
+    bypass: optional callable, when it returns true the view runs
+        unconditionally and gets no validators (e.g. pending flash messages)
+'''
+def conditional(*tables, vary=None, bypass=None):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or (bypass is not None and bypass()):
+                return f(*args, **kwargs)
+
+            versions = request_versions(tables)
+            extra = (vary(),) if vary is not None else ()
+            etag = compute_etag(versions, extra)
+            changed_at = None
+            modified = None
+            if vary is None:
+                changed_at = max(changed for _, changed in versions.values())
+                modified = datetime.fromtimestamp(int(changed_at), tz=timezone.utc)
+
+            held = matching_etag(etag, changed_at)
+            if held is not None:
+                response = current_app.response_class(status=304)
+                response.set_etag(held)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            if modified is not None:
+                response.last_modified = modified
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+'''
+engine settings
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (seconds to wait for a
+    free connection), DB_POOL_RECYCLE (seconds before a connection is
+    replaced) and DB_POOL_PRE_PING tune the connection pool of server
+    databases. DB_CONNECT_TIMEOUT (seconds) and DB_STATEMENT_TIMEOUT_MS are
+    passed to Postgres. None keeps SQLAlchemy's own default.
+    SQLite engines keep the pool Flask-SQLAlchemy (or the app) picks for them.
+'''
+DB_DEFAULTS = {
+    'DB_POOL_SIZE': None,
+    'DB_MAX_OVERFLOW': None,
+    'DB_POOL_TIMEOUT': None,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_PRE_PING': False,
+    'DB_CONNECT_TIMEOUT': 10,
+    'DB_STATEMENT_TIMEOUT_MS': None
+}
+
+POOL_OPTIONS = (
+    ('DB_POOL_SIZE', 'pool_size'),
+    ('DB_MAX_OVERFLOW', 'max_overflow'),
+    ('DB_POOL_TIMEOUT', 'pool_timeout'),
+    ('DB_POOL_RECYCLE', 'pool_recycle')
+)
+
+
+def _setting(config, key):
+    return config.get(key, DB_DEFAULTS[key])
+
+
+def _backend(uri):
+    return uri.partition(':')[0].partition('+')[0]
+
+
+'''
+engine_options(config)
+    SQLALCHEMY_ENGINE_OPTIONS with the DB_* settings applied for the
+    database of SQLALCHEMY_DATABASE_URI. options already present in
+    SQLALCHEMY_ENGINE_OPTIONS win over the DB_* settings.
+'''
+def engine_options(config):
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    backend = _backend(config.get('SQLALCHEMY_DATABASE_URI') or '')
+    if backend in ('', 'sqlite'):
+        return options
+
+    for key, option in POOL_OPTIONS:
+        value = _setting(config, key)
+        if value is not None:
+            options.setdefault(option, value)
+    if _setting(config, 'DB_POOL_PRE_PING'):
+        options.setdefault('pool_pre_ping', True)
+
+    if backend in ('postgres', 'postgresql'):
+        connect_args = dict(options.get('connect_args') or {})
+        connect_timeout = _setting(config, 'DB_CONNECT_TIMEOUT')
+        if connect_timeout is not None:
+            connect_args.setdefault('connect_timeout', int(connect_timeout))
+        statement_timeout = _setting(config, 'DB_STATEMENT_TIMEOUT_MS')
+        if statement_timeout is not None and 'statement_timeout' not in connect_args.get('options', ''):
+            connect_args['options'] = ' '.join(filter(None, [
+                connect_args.get('options'), '-c statement_timeout={:d}'.format(int(statement_timeout))]))
+        if connect_args:
+            options['connect_args'] = connect_args
+    return options
+
+
+'''
+init_db(app, db, database_uri=None)
+    binds a flask application and a Flask-SQLAlchemy service, with the
+    engine options of the app's DB_* settings. database_uri replaces
+    SQLALCHEMY_DATABASE_URI when given.
+'''
+def init_db(app, db, database_uri=None):
+    if database_uri is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.app = app
+    db.init_app(app)
@@ -0,0 +1,62 @@
+from flask import jsonify
+from werkzeug.exceptions import HTTPException
+
+'''
+the message of an error response whose abort() gave no description,
+ERROR_MESSAGES in the app config adds to or replaces these
+'''
+DEFAULT_ERROR_MESSAGES = {
+    400: 'bad request',
+    401: 'unauthorized',
+    403: 'forbidden',
+    404: 'resource not found',
+    405: 'method not allowed',
+    409: 'conflict',
+    412: 'precondition failed',
+    413: 'payload too large',
+    415: 'unsupported media type',
+    422: 'unprocessable',
+    429: 'too many requests',
+    500: 'internal server error',
+    503: 'service unavailable'
+}
+
+
+def error_message(error, messages):
+    # werkzeug fills in a generic description, only keep one given to abort()
+    if error.description and error.description != type(error).description:
+        return error.description
+    return messages.get(error.code, error.name.lower())
+
+
+'''
+error_response(error, messages=DEFAULT_ERROR_MESSAGES)
+    {"success": False, "error": code, "message": message} for an HTTPException,
+    keeping the headers it carries (Allow, WWW-Authenticate, Retry-After, ...)
+'''
+def error_response(error, messages=DEFAULT_ERROR_MESSAGES):
+    response = jsonify({
+        'success': False,
+        'error': error.code,
+        'message': error_message(error, messages)
+    })
+    response.status_code = error.code
+    for name, value in error.get_headers():
+        if name.lower() != 'content-type':
+            response.headers.add(name, value)
+    return response
+
+
+'''
+register_json_errors(app)
+    answers every HTTP error, including unhandled exceptions (500), with
+    error_response(). handlers the app registers for a specific code or
+    exception still take precedence.
+'''
+def register_json_errors(app):
+    messages = dict(DEFAULT_ERROR_MESSAGES)
+    messages.update(app.config.get('ERROR_MESSAGES') or {})
+
+    @app.errorhandler(HTTPException)
+    def http_error(error):
+        return error_response(error, messages)
@@ -0,0 +1,112 @@
+from flask import Flask
+
+from .caching import ResponseCache
+from .database import DB_DEFAULTS
+from .errors import register_json_errors
+from .responses import FastJSONProvider, compress_response
+from .timing import RequestTiming
+
+try:
+    from flask_cors import CORS
+except ImportError:
+    CORS = None
+
+'''
+DEFAULTS
+    the toolkit settings, any of them can be set in the config passed to
+    create_app() or as a FLASK_ prefixed environment variable
+    (FLASK_COMPRESS=true, FLASK_DB_POOL_SIZE=10)
+    CORS_ENABLED: flask-cors on every route, configured by its CORS_* keys
+    JSON_ERRORS: JSON bodies for every HTTP error, see errors.py
+    FAST_JSON: orjson-backed jsonify (Flask >= 2.2, orjson installed)
+    COMPRESS: gzip/brotli for responses of at least COMPRESS_MIN_SIZE bytes
+    REQUEST_TIMING, SERVER_TIMING, SLOW_REQUEST_MS: see timing.py
+    RESPONSE_CACHE_TTL: seconds GET responses are served from memory,
+        0 disables the cache, see caching.py
+    DB_*: connection pool and timeouts, see database.py
+'''
+DEFAULTS = {
+    'CORS_ENABLED': True,
+    'JSON_ERRORS': True,
+    'ERROR_MESSAGES': {},
+    'FAST_JSON': True,
+    'COMPRESS': False,
+    'COMPRESS_MIN_SIZE': 1024,
+    'COMPRESS_LEVEL': 6,
+    'COMPRESS_BROTLI_QUALITY': 4,
+    'REQUEST_TIMING': True,
+    'SERVER_TIMING': False,
+    'SLOW_REQUEST_MS': 500,
+    'RESPONSE_CACHE_TTL': 0,
+    'RESPONSE_CACHE_SIZE': 256,
+    'RESPONSE_CACHE_MAX_BYTES': 1024 * 1024
+}
+DEFAULTS.update(DB_DEFAULTS)
+
+
+class Toolkit:
+    '''
+    Toolkit
+        the extensions init_app() installed on an app, available as
+        app.extensions['flask_toolkit']: timing (RequestTiming) and
+        cache (ResponseCache), None when disabled
+    '''
+
+    def __init__(self, timing=None, cache=None):
+        self.timing = timing
+        self.cache = cache
+
+
+'''
+create_app(import_name, config=None, **kwargs)
+    a Flask app (kwargs go to Flask()) configured from DEFAULTS, then
+    config (a mapping, or an object or import path for from_object()),
+    then FLASK_ prefixed environment variables, with init_app() applied
+'''
+def create_app(import_name, config=None, **kwargs):
+    app = Flask(import_name, **kwargs)
+    app.config.update(DEFAULTS)
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+    if hasattr(app.config, 'from_prefixed_env'):
+        # Flask >= 2.1, values are parsed as JSON
+        app.config.from_prefixed_env()
+    init_app(app)
+    return app
+
+
+'''
+init_app(app)
+    installs the toolkit features its config enables, in the order their
+    hooks must run: timing wraps everything, the cache stores responses
+    after compression, and the app's own after_request hooks, registered
+    later, run before any of them
+'''
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    config = app.config
+
+    if config['CORS_ENABLED']:
+        if CORS is None:
+            raise RuntimeError('CORS_ENABLED needs flask-cors, install it or set CORS_ENABLED to False')
+        CORS(app)
+    if config['JSON_ERRORS']:
+        register_json_errors(app)
+    if config['FAST_JSON'] and FastJSONProvider is not None:
+        app.json = FastJSONProvider(app)
+
+    toolkit = Toolkit()
+    if config['REQUEST_TIMING']:
+        toolkit.timing = RequestTiming(app)
+    if config['RESPONSE_CACHE_TTL']:
+        toolkit.cache = ResponseCache(app)
+    if config['COMPRESS']:
+        @app.after_request
+        def compress(response):
+            return compress_response(response, config)
+
+    app.extensions['flask_toolkit'] = toolkit
+    return app
@@ -0,0 +1,111 @@
+import gzip
+
+from flask import request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:
+    # Flask < 2.2 has no pluggable provider, jsonify keeps using the stdlib
+    DefaultJSONProvider = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/plain',
+    'text/html'
+}
+
+
+if DefaultJSONProvider is not None:
+    class FastJSONProvider(DefaultJSONProvider):
+        '''
+        FastJSONProvider
+            encodes with orjson when it is installed and falls back to
+            Flask's default provider for anything orjson cannot handle
+            (custom dumps() arguments, integers beyond 64 bits, ...).
+            dates and dataclasses are passed through to Flask's default()
+            so the output matches the stdlib provider.
+        '''
+
+        def _options(self, indent=False):
+            option = (orjson.OPT_NON_STR_KEYS |
+                      orjson.OPT_PASSTHROUGH_DATETIME |
+                      orjson.OPT_PASSTHROUGH_DATACLASS)
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return option
+
+        def dumps(self, obj, **kwargs):
+            if orjson is None or kwargs:
+                return super().dumps(obj, **kwargs)
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+            except TypeError:
+                return super().dumps(obj)
+
+        def response(self, *args, **kwargs):
+            if orjson is None:
+                return super().response(*args, **kwargs)
+
+            obj = self._prepare_response_obj(args, kwargs)
+            indent = self.compact is False or (self.compact is None and self._app.debug)
+            try:
+                body = orjson.dumps(obj, default=self.default, option=self._options(indent))
+            except TypeError:
+                return super().response(*args, **kwargs)
+            return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+else:
+    FastJSONProvider = None
+
+
+def _compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'])
+
+
+'''
+compress_response(response, config)
+    gzip/brotli encodes a buffered response when the client accepts it,
+    its mimetype is textual and its body is at least COMPRESS_MIN_SIZE bytes.
+    streamed responses and responses that already carry an encoding are
+    left untouched.
+'''
+def compress_response(response, config):
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (response.direct_passthrough or response.is_streamed or
+            'Content-Encoding' in response.headers or
+            not 200 <= response.status_code < 300 or response.status_code == 204):
+        return response
+
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    encoding = request.accept_encodings.best_match(encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    response.set_data(_compress(data, encoding, config))
+    response.headers['Content-Encoding'] = encoding
+    # each encoding is a different representation, keep strong validators distinct
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
@@ -0,0 +1,286 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+from flask_toolkit.auth import (AuthError, JWKSKeyStore, JWKSUnavailable, TokenCache, Verifier, all_of, any_of,
+                                compile_permissions, get_token_auth_header, key_source)
+from flask_toolkit.auth.local_idp import LocalIssuer, serve_jwks
+
+
+class AuthorizationHeaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def header_error(self, value):
+        with self.app.test_request_context(headers={'Authorization': value}):
+            with self.assertRaises(AuthError) as raised:
+                get_token_auth_header()
+        return raised.exception
+
+    def test_token(self):
+        with self.app.test_request_context(headers={'Authorization': 'Bearer abc'}):
+            self.assertEqual(get_token_auth_header(), 'abc')
+
+    def test_blank_header_is_missing(self):
+        for value in ('', '   ', '\t'):
+            error = self.header_error(value)
+
+            self.assertEqual(error.status_code, 401)
+            self.assertEqual(error.error['code'], 'authorization_header_missing')
+
+    def test_malformed_header(self):
+        for value in ('Bearer', 'Basic abc', 'Bearer a b'):
+            error = self.header_error(value)
+
+            self.assertEqual(error.status_code, 401)
+            self.assertEqual(error.error['code'], 'invalid_header')
+
+
+class PermissionsTestCase(unittest.TestCase):
+
+    def test_nested_expression(self):
+        requirement = compile_permissions(any_of('patch:drinks', all_of('post:drinks', 'delete:drinks')))
+
+        self.assertTrue(requirement.satisfied_by(frozenset(['patch:drinks'])))
+        self.assertTrue(requirement.satisfied_by(frozenset(['post:drinks', 'delete:drinks'])))
+        self.assertFalse(requirement.satisfied_by(frozenset(['post:drinks'])))
+
+    def test_empty_group_is_rejected(self):
+        for group in (any_of, all_of):
+            with self.assertRaises(ValueError):
+                group()
+        with self.assertRaises(ValueError):
+            any_of('patch:drinks', all_of())
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.issuer = LocalIssuer('https://issuer.test/', 'test', bits=1024)
+        cls.server = serve_jwks(cls.issuer)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.server.fetches = 0
+        self.server.delay = 0
+        self.server.status = 200
+
+    def concurrently(self, store, kid, threads=8):
+        barrier = threading.Barrier(threads)
+        results = []
+
+        def lookup():
+            barrier.wait()
+            try:
+                results.append(store.get_key(kid))
+            except Exception as e:
+                results.append(e)
+
+        workers = [threading.Thread(target=lookup) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_key_rotation(self):
+        store = JWKSKeyStore(self.server.url, min_refetch_interval=0)
+        self.assertIsNotNone(store.get_key(self.issuer.kid))
+
+        kid = self.issuer.rotate()
+
+        self.assertIsNotNone(store.get_key(kid))
+        self.assertEqual(self.server.fetches, 2)
+
+    def test_unknown_kid_refetches_once(self):
+        store = JWKSKeyStore(self.server.url, min_refetch_interval=30)
+        store.get_key(self.issuer.kid)
+
+        self.assertIsNone(store.get_key('unknown'))
+        self.assertIsNone(store.get_key('unknown'))
+        self.assertEqual(self.server.fetches, 1)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        self.server.delay = 0.2
+        store = JWKSKeyStore(self.server.url)
+
+        results = self.concurrently(store, self.issuer.kid)
+
+        self.assertTrue(all(key is not None and not isinstance(key, Exception) for key in results))
+        self.assertEqual(self.server.fetches, 1)
+
+    def test_concurrent_misses_share_one_failure(self):
+        self.server.delay = 0.2
+        self.server.status = 503
+        store = JWKSKeyStore(self.server.url)
+
+        results = self.concurrently(store, self.issuer.kid)
+
+        self.assertTrue(all(isinstance(error, JWKSUnavailable) for error in results))
+        self.assertEqual(self.server.fetches, 1)
+
+    def test_failing_idp_backs_off(self):
+        self.server.status = 503
+        store = JWKSKeyStore(self.server.url, min_refetch_interval=0.2)
+
+        for _ in range(3):
+            with self.assertRaises(JWKSUnavailable):
+                store.get_key(self.issuer.kid)
+        self.assertEqual(self.server.fetches, 1)
+
+        self.server.status = 200
+        time.sleep(0.2)
+
+        self.assertIsNotNone(store.get_key(self.issuer.kid))
+        self.assertEqual(self.server.fetches, 2)
+
+    def test_failed_refresh_keeps_keys(self):
+        store = JWKSKeyStore(self.server.url, min_refetch_interval=0)
+        store.get_key(self.issuer.kid)
+        self.server.status = 503
+
+        store.refresh()
+
+        self.assertIsNotNone(store.get_key(self.issuer.kid))
+
+
+class CountingKeys:
+    '''a key source that records the kids looked up in another one'''
+    requires_kid = True
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.lookups = []
+
+    def get_key(self, kid):
+        self.lookups.append(kid)
+        return self.keys.get_key(kid)
+
+
+class VerifierTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.issuer = LocalIssuer('https://issuer.test/', 'test', bits=1024)
+        cls.jwks_url = cls.issuer.write_jwks(os.path.join(cls.directory, 'jwks.json'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        # keys of the local issuer read from a JWKS file, tokens cached
+        self.cache = TokenCache(maxsize=8)
+        self.verifier = Verifier(key_source(self.jwks_url), issuer='https://issuer.test/',
+                                 audience='test', cache=self.cache)
+        self.stages = []
+        self.verifier.add_hook(lambda stage, seconds: self.stages.append(stage))
+
+    def test_cache_hit_skips_verification(self):
+        token = self.issuer.issue(['get:drinks'])
+        first, permissions = self.verifier.verify(token)
+        second, _ = self.verifier.verify(token)
+
+        self.assertEqual(first, second)
+        self.assertEqual(permissions, frozenset(['get:drinks']))
+        self.assertEqual(self.stages.count('decode'), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_cached_payload_cannot_be_altered(self):
+        token = self.issuer.issue()
+        self.verifier.verify(token)[0]['sub'] = 'someone else'
+
+        self.assertNotEqual(self.verifier.verify(token)[0]['sub'], 'someone else')
+
+    def test_rejected_tokens_are_not_cached(self):
+        tokens = [self.issuer.issue(expires_in=-60),
+                  self.issuer.issue(audience='other'),
+                  self.issuer.issue(kid='unknown'),
+                  self.issuer.issue()[:-4] + 'AAAA']
+        for token in tokens:
+            for _ in range(2):
+                with self.assertRaises(AuthError):
+                    self.verifier.verify(token)
+
+        self.assertEqual(self.cache.stats()['size'], 0)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_entry_expires_with_the_token(self):
+        token = 'token'
+        self.cache.put(token, {'exp': time.time() + 0.05})
+        self.assertIsNotNone(self.cache.get(token))
+        time.sleep(0.1)
+
+        self.assertIsNone(self.cache.get(token))
+        self.assertEqual(self.cache.expirations, 1)
+
+    def test_tokens_without_future_exp_are_not_cached(self):
+        self.cache.put('no exp', {'sub': 'a'})
+        self.cache.put('expired', {'exp': time.time() - 1})
+        self.cache.put('not a number', {'exp': 'tomorrow'})
+
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TokenCache(maxsize=2)
+        payload = {'exp': time.time() + 60}
+        cache.put('a', payload)
+        cache.put('b', payload)
+        cache.get('a')
+        cache.put('c', payload)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_invalidate(self):
+        payload = {'exp': time.time() + 60}
+        self.cache.put('a', dict(payload, sub='ann'))
+        self.cache.put('b', dict(payload, sub='bob'))
+        self.cache.put('c', dict(payload, sub='bob'))
+
+        self.assertTrue(self.cache.invalidate('a'))
+        self.assertFalse(self.cache.invalidate('a'))
+        self.assertEqual(self.cache.invalidate_where(lambda payload: payload['sub'] == 'bob'), 2)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_verify_many_keeps_input_order(self):
+        valid, other = self.issuer.issue(['get:drinks']), self.issuer.issue(['post:drinks'])
+        expired = self.issuer.issue(expires_in=-60)
+        unknown_kid = self.issuer.issue(kid='unknown')
+        results = self.verifier.verify_many([valid, expired, unknown_kid, valid, other])
+
+        self.assertEqual(len(results), 5)
+        (payload, permissions, error), expired_result, unknown_result, repeated, last = results
+        self.assertIsNone(error)
+        self.assertEqual(permissions, frozenset(['get:drinks']))
+        self.assertEqual(repeated[:2], (payload, permissions))
+        self.assertEqual(last[1], frozenset(['post:drinks']))
+        self.assertEqual((expired_result[0], expired_result[2].error['code']), (None, 'token_expired'))
+        self.assertEqual((unknown_result[0], unknown_result[2].status_code), (None, 400))
+
+    def test_verify_many_checks_each_token_and_kid_once(self):
+        self.verifier.keys = keys = CountingKeys(self.verifier.keys)
+        tokens = [self.issuer.issue(), self.issuer.issue(kid='unknown')]
+        self.verifier.verify_many(tokens * 3 + [self.issuer.issue()])
+
+        self.assertEqual(self.stages.count('decode'), 2)
+        self.assertEqual(sorted(keys.lookups), sorted([self.issuer.kid, 'unknown']))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,259 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from flask import abort, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from flask_toolkit import create_app, engine_options, init_db
+from flask_toolkit.conditional import conditional
+from flask_toolkit.versions import TableVersions, request_versions
+
+
+def make_app(**config):
+    app = create_app(__name__, dict({'CORS_ENABLED': False}, **config))
+    app.calls = 0
+
+    @app.route('/menu')
+    def menu():
+        app.calls += 1
+        return jsonify({'success': True, 'items': ['latte'] * 200})
+
+    @app.route('/menu', methods=['POST'])
+    def add_to_menu():
+        return jsonify({'success': True}), 201
+
+    @app.route('/missing')
+    def missing():
+        abort(404)
+
+    @app.route('/invalid')
+    def invalid():
+        abort(400, 'page must be positive')
+
+    @app.route('/broken')
+    def broken():
+        raise ValueError('broken')
+
+    return app
+
+
+class JSONErrorsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = make_app(ERROR_MESSAGES={404: 'no such thing'}).test_client()
+
+    def test_default_message(self):
+        res = self.client.get('/missing')
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.get_json(), {'success': False, 'error': 404, 'message': 'no such thing'})
+
+    def test_abort_description_is_the_message(self):
+        res = self.client.get('/invalid')
+
+        self.assertEqual(res.get_json()['message'], 'page must be positive')
+
+    def test_method_not_allowed_keeps_allow_header(self):
+        res = self.client.delete('/menu')
+
+        self.assertEqual(res.status_code, 405)
+        self.assertEqual(res.get_json()['message'], 'method not allowed')
+        self.assertIn('POST', res.headers['Allow'])
+
+    def test_unhandled_exception(self):
+        res = self.client.get('/broken')
+
+        self.assertEqual(res.status_code, 500)
+        self.assertEqual(res.get_json()['message'], 'internal server error')
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = make_app(RESPONSE_CACHE_TTL=60, COMPRESS=True)
+        self.client = self.app.test_client()
+
+    def test_second_get_is_served_from_cache(self):
+        first = self.client.get('/menu', headers={'Accept-Encoding': 'gzip'})
+        second = self.client.get('/menu', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(self.app.calls, 1)
+        self.assertEqual((first.headers['X-Cache'], second.headers['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(second.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(second.data), gzip.decompress(first.data))
+
+    def test_key_includes_accept_encoding(self):
+        self.client.get('/menu', headers={'Accept-Encoding': 'gzip'})
+        res = self.client.get('/menu')
+
+        self.assertEqual(self.app.calls, 2)
+        self.assertNotIn('Content-Encoding', res.headers)
+
+    def test_authorized_requests_are_not_cached(self):
+        self.client.get('/menu', headers={'Authorization': 'Bearer token'})
+        self.client.get('/menu', headers={'Authorization': 'Bearer token'})
+
+        self.assertEqual(self.app.calls, 2)
+
+    def test_write_empties_cache(self):
+        self.client.get('/menu')
+        self.client.post('/menu')
+        self.client.get('/menu')
+
+        self.assertEqual(self.app.calls, 2)
+
+
+class RequestTimingTestCase(unittest.TestCase):
+
+    def test_stats_and_server_timing(self):
+        app = make_app(SERVER_TIMING=True)
+        client = app.test_client()
+        res = client.get('/menu')
+        client.get('/menu')
+
+        self.assertTrue(res.headers['Server-Timing'].startswith('app;dur='))
+        self.assertEqual(app.extensions['flask_toolkit'].timing.stats()['menu']['count'], 2)
+
+    def test_disabled(self):
+        app = make_app(REQUEST_TIMING=False)
+
+        self.assertNotIn('Server-Timing', app.test_client().get('/menu').headers)
+        self.assertIsNone(app.extensions['flask_toolkit'].timing)
+
+
+class EngineOptionsTestCase(unittest.TestCase):
+
+    def test_postgres(self):
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'postgresql:///trivia',
+            'DB_POOL_SIZE': 10,
+            'DB_STATEMENT_TIMEOUT_MS': 5000
+        })
+
+        self.assertEqual(options['pool_size'], 10)
+        self.assertEqual(options['pool_recycle'], 1800)
+        self.assertEqual(options['connect_args'], {'connect_timeout': 10, 'options': '-c statement_timeout=5000'})
+
+    def test_explicit_engine_options_win(self):
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'postgresql:///trivia',
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_recycle': 60},
+            'DB_POOL_RECYCLE': 300
+        })
+
+        self.assertEqual(options['pool_recycle'], 60)
+
+    def test_sqlite_keeps_its_pool(self):
+        self.assertEqual(engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///app.db', 'DB_POOL_SIZE': 10}), {})
+
+
+class ConditionalTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = db = SQLAlchemy()
+
+        class Drink(db.Model):
+            __tablename__ = 'drink'
+            id = db.Column(db.Integer, primary_key=True)
+            title = db.Column(db.String(80))
+
+        cls.Drink = Drink
+        cls.versions = TableVersions(db)
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = app = make_app()
+        init_db(app, self.db, 'sqlite:///' + self.path)
+        self.versions.init_app(app)
+        app.calls = 0
+
+        @app.route('/drinks')
+        @conditional('drink')
+        def drinks():
+            app.calls += 1
+            return jsonify([drink.title for drink in self.Drink.query.all()])
+
+        @app.route('/drinks/version')
+        @conditional('drink')
+        def drinks_version():
+            return jsonify(request_versions(['drink'])['drink'][0])
+
+        with app.app_context():
+            self.db.create_all()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            self.db.session.remove()
+            self.db.engine.dispose()
+        os.remove(self.path)
+
+    def add_drink(self, title):
+        with self.app.app_context():
+            self.db.session.add(self.Drink(title=title))
+            self.db.session.commit()
+
+    def test_not_modified(self):
+        etag = self.client.get('/drinks').headers['ETag']
+        res = self.client.get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(self.app.calls, 1)
+
+    def test_commit_changes_etag(self):
+        etag = self.client.get('/drinks').headers['ETag']
+        self.add_drink('latte')
+        res = self.client.get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json(), ['latte'])
+
+    def test_write_from_another_engine_changes_etag(self):
+        etag = self.client.get('/drinks').headers['ETag']
+        # another process writing to the same database
+        engine = create_engine('sqlite:///' + self.path)
+        with Session(engine) as session:
+            session.add(self.Drink(title='mocha'))
+            session.commit()
+        engine.dispose()
+        res = self.client.get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json(), ['mocha'])
+
+    def test_rollback_keeps_etag(self):
+        etag = self.client.get('/drinks').headers['ETag']
+        with self.app.app_context():
+            self.db.session.add(self.Drink(title='latte'))
+            self.db.session.flush()
+            self.db.session.rollback()
+        res = self.client.get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_view_reuses_versions_read_by_conditional(self):
+        self.add_drink('latte')
+        statements = []
+        with self.app.app_context():
+            engine = self.db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            res = self.client.get('/drinks/version')
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+        self.assertEqual(len(statements), 1)
+        with self.app.app_context():
+            self.assertEqual(res.get_json(), self.versions.version('drink'))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import threading
+import time
+
+from flask import g, has_app_context, request
+
+try:
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+except ImportError:
+    Engine = None
+
+_QUERY_STARTED = '_flask_toolkit_query_started'
+_listening = False
+_listening_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info[_QUERY_STARTED] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop(_QUERY_STARTED, None)
+    if started is None or not has_app_context():
+        return
+    timing = g.get('_request_timing')
+    if timing is not None:
+        timing[1] += time.perf_counter() - started
+        timing[2] += 1
+
+
+def _listen_for_queries():
+    # one pair of listeners on the Engine class covers every engine of the process
+    global _listening
+    with _listening_lock:
+        if Engine is None or _listening:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+class RequestTiming:
+    '''
+    RequestTiming
+        times every request and the SQL statements it runs, and keeps
+        count, total and max per endpoint (see stats()).
+        SERVER_TIMING adds a Server-Timing header (app and db durations) to
+        each response, SLOW_REQUEST_MS logs a warning for every request
+        that takes longer (None never logs).
+    '''
+
+    def __init__(self, app=None):
+        self._stats = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        _listen_for_queries()
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        # started, seconds in SQL, statements
+        g._request_timing = [time.perf_counter(), 0.0, 0]
+
+    def _finish(self, response):
+        timing = g.pop('_request_timing', None)
+        if timing is None:
+            return response
+        started, db_seconds, queries = timing
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        db_ms = db_seconds * 1000
+        endpoint = request.endpoint or '<unmatched>'
+
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = [0, 0.0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += elapsed_ms
+            stats[2] = max(stats[2], elapsed_ms)
+            stats[3] += db_ms
+            stats[4] += queries
+
+        config = self.app.config
+        if config['SERVER_TIMING']:
+            response.headers.add('Server-Timing', 'app;dur={:.1f}, db;dur={:.1f};desc="{:d} queries"'
+                                 .format(elapsed_ms, db_ms, queries))
+        slow_ms = config['SLOW_REQUEST_MS']
+        if slow_ms is not None and elapsed_ms > slow_ms:
+            self.app.logger.warning('slow request: %s %s took %.1f ms (%.1f ms in %d queries)',
+                                    request.method, request.full_path.rstrip('?'), elapsed_ms,
+                                    db_ms, queries)
+        return response
+
+    '''
+    stats()
+        {endpoint: {count, mean_ms, max_ms, db_mean_ms, queries_per_request}}
+        for the requests answered by this process
+    '''
+    def stats(self):
+        with self._lock:
+            items = [(endpoint, list(stats)) for endpoint, stats in self._stats.items()]
+        return {endpoint: {
+            'count': count,
+            'mean_ms': round(total / count, 3),
+            'max_ms': round(longest, 3),
+            'db_mean_ms': round(db_total / count, 3),
+            'queries_per_request': round(queries / count, 2)
+        } for endpoint, (count, total, longest, db_total, queries) in items}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,158 @@
+import time
+import uuid
+
+from flask import current_app, request
+from sqlalchemy import Column, Float, String, Table, event, select
+from sqlalchemy.orm import Session
+
+_trackers = []
+
+
+def _new_version():
+    # random rather than counted: a rolled back bump can never be reissued
+    # with other contents, so nothing cached under it turns stale
+    return uuid.uuid4().hex
+
+
+class TableVersions:
+    '''
+    TableVersions(db)
+        a version and change time per table, kept in the table_versions
+        table of the database itself. every Session that commits a write to
+        a table (an ORM flush, a bulk query update or delete, or a table
+        marked with mark_changed()) replaces that table's row in the same
+        transaction. every process, worker and thread reading the database
+        therefore sees the same validators, and a rolled back write bumps
+        nothing. writers that bypass the Session (psql, core connections,
+        other programs) must call bump() or they leave the validators stale.
+
+        the table_versions table is part of db.metadata, so create_all()
+        and migrations create it. init_app(app) makes it the one
+        @conditional reads.
+    '''
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.table = Table(
+            'table_versions', db.metadata,
+            Column('tablename', String(64), primary_key=True),
+            Column('version', String(32), nullable=False),
+            Column('changed_at', Float, nullable=False))
+        event.listen(self.table, 'after_create', self._seed)
+        _trackers.append(self)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['table_versions'] = self
+
+    def tracks(self, tablename):
+        return tablename in self.db.metadata.tables and tablename != self.table.name
+
+    '''
+    read(tablenames, session=None)
+        {tablename: (version, changed_at)} in one query. a table without a
+        row (never written since table_versions was created) reads as
+        ('', 0.0).
+    '''
+    def read(self, tablenames, session=None):
+        session = session if session is not None else self.db.session
+        c = self.table.c
+        rows = session.execute(
+            select(c.tablename, c.version, c.changed_at).where(c.tablename.in_(list(tablenames))))
+        versions = {tablename: (version, changed_at) for tablename, version, changed_at in rows}
+        return {tablename: versions.get(tablename, ('', 0.0)) for tablename in tablenames}
+
+    def version(self, tablename, session=None):
+        return self.read([tablename], session)[tablename][0]
+
+    def changed_at(self, tablename, session=None):
+        return self.read([tablename], session)[tablename][1]
+
+    '''
+    bump(connection, tablenames)
+        gives the tables a new version within the transaction of connection
+    '''
+    def bump(self, connection, tablenames):
+        c = self.table.c
+        now = time.time()
+        for tablename in sorted(tablenames):
+            updated = connection.execute(
+                self.table.update().where(c.tablename == tablename)
+                .values(version=_new_version(), changed_at=now))
+            if updated.rowcount == 0:
+                connection.execute(self.table.insert().values(
+                    tablename=tablename, version=_new_version(), changed_at=now))
+
+    def _seed(self, table, connection, **kwargs):
+        now = time.time()
+        rows = [{'tablename': name, 'version': _new_version(), 'changed_at': now}
+                for name in self.db.metadata.tables if self.tracks(name)]
+        if rows:
+            connection.execute(table.insert(), rows)
+
+
+'''
+current_versions()
+    the TableVersions of the current app, see TableVersions.init_app
+'''
+def current_versions():
+    return current_app.extensions['table_versions']
+
+
+'''
+request_versions(tablenames)
+    {tablename: (version, changed_at)} read once per request: tables
+    already read in this request, e.g. by @conditional before the view,
+    are not read again. a view that reads them after its own commit
+    must call TableVersions.read().
+'''
+def request_versions(tablenames):
+    # the environ of the request, not g: an app context, and g with it, can
+    # outlive a request
+    known = request.environ.setdefault('flask_toolkit.table_versions', {})
+    missing = [tablename for tablename in tablenames if tablename not in known]
+    if missing:
+        known.update(current_versions().read(missing))
+    return {tablename: known[tablename] for tablename in tablenames}
+
+
+'''
+mark_changed(session, tablename)
+    records a write the Session cannot see (e.g. bulk_insert_mappings),
+    bumped when the session commits
+'''
+def mark_changed(session, tablename):
+    session.info.setdefault('changed_tables', set()).add(tablename)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_flushed_tables(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tablename = getattr(obj, '__tablename__', None)
+        if tablename:
+            mark_changed(session, tablename)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _collect_bulk_tables(context):
+    mark_changed(context.session, context.mapper.local_table.name)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_changed_tables(session):
+    # flush first, so the tables of pending objects are collected too
+    session.flush()
+    changed = session.info.pop('changed_tables', None)
+    if not changed:
+        return
+    for tracker in _trackers:
+        tables = [tablename for tablename in changed if tracker.tracks(tablename)]
+        if tables:
+            tracker.bump(session.connection(), tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('changed_tables', None)
@@ -3,9 +3,11 @@
 #----------------------------------------------------------------------------#
 
 import json
+import os
+import time
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, session
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
@@ -15,16 +17,23 @@ from forms import *
 
 from flask_migrate import Migrate
 
+from flask_toolkit import create_app, init_db
+from flask_toolkit.conditional import conditional as _conditional
+from flask_toolkit.versions import TableVersions
+
 from datetime import datetime
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
+app = create_app(__name__, 'config')
 moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+init_db(app, db)
+# a version per table, bumped in the transaction of every committed write
+# and shared by every process, see flask_toolkit/versions.py
+table_versions = TableVersions(db, app)
 
 migrate = Migrate(app, db)
 
@@ -94,6 +103,14 @@ def format_datetime(value, format='medium'):
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Conditional responses.
+#----------------------------------------------------------------------------#
+
+# pages with pending flash messages are always rendered, since the render consumes them
+def conditional(*tables, vary=None):
+  return _conditional(*tables, vary=vary, bypass=lambda: session.get('_flashes'))
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -106,7 +123,9 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
+# num_upcoming_shows changes as shows start, so the page may be reused for a minute at most
 @app.route('/venues')
+@conditional('Venue', 'Show', vary=lambda: int(time.time() // 60))
 def venues():
   # DONE: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
@@ -271,6 +290,7 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@conditional('Artist')
 def artists():
   # DONE: replace with real data returned from querying the database
 
@@ -10,4 +10,11 @@ DEBUG = True
 
 
 # DONE IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql:///fyyur'
\ No newline at end of file
+SQLALCHEMY_DATABASE_URI = 'postgresql:///fyyur'
+
+# flask_toolkit settings, FLASK_ prefixed environment variables override them
+# (e.g. FLASK_DB_POOL_SIZE=10). Pages are HTML: errors keep the templates of
+# app.py and CORS is not needed.
+CORS_ENABLED = False
+JSON_ERRORS = False
+COMPRESS = True
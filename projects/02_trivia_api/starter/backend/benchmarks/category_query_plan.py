@@ -0,0 +1,158 @@
+'''
+Category filter query plans, before and after the integer FK migration.
+
+Builds the legacy schema (questions.category as an unindexed VARCHAR), seeds
+it, captures the plan and timing of the category filter used by
+GET /categories/<id>/questions and POST /quizzes, runs migration
+3f1c2a9d8b7e against the same database and captures them again.
+
+Usage (from the backend directory):
+    python benchmarks/category_query_plan.py --rows 200000
+    python benchmarks/category_query_plan.py --database postgresql:///trivia_bench
+'''
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATION = os.path.join(BACKEND_DIR, 'migrations', 'versions',
+                         '3f1c2a9d8b7e_question_category_integer_fk.py')
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+
+QUERIES = {
+    # GET /categories/<id>/questions and POST /quizzes
+    'filter': sa.text(
+        'SELECT id, question, answer, category, difficulty FROM questions '
+        'WHERE category = :category ORDER BY id'),
+    # total_questions for a category
+    'count': sa.text('SELECT COUNT(*) FROM questions WHERE category = :category'),
+    # a single page of a category
+    'page': sa.text(
+        'SELECT id, question, answer, category, difficulty FROM questions '
+        'WHERE category = :category ORDER BY id LIMIT 10'),
+}
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location('category_migration', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_legacy_schema(conn, rows, seed):
+    conn.execute(sa.text('DROP TABLE IF EXISTS questions'))
+    conn.execute(sa.text('DROP TABLE IF EXISTS categories'))
+    conn.execute(sa.text(
+        'CREATE TABLE categories (id INTEGER PRIMARY KEY, type VARCHAR)'))
+    conn.execute(sa.text(
+        'CREATE TABLE questions (id INTEGER PRIMARY KEY, question VARCHAR, '
+        'answer VARCHAR, category VARCHAR, difficulty INTEGER)'))
+    conn.execute(sa.text('INSERT INTO categories (id, type) VALUES (:id, :type)'),
+                 [{'id': i, 'type': name} for i, name in enumerate(CATEGORIES, 1)])
+
+    rng = random.Random(seed)
+    batch = []
+    for i in range(1, rows + 1):
+        category = rng.randint(1, len(CATEGORIES))
+        # a share of legacy rows stored the category name instead of its id
+        value = CATEGORIES[category - 1] if i % 50 == 0 else str(category)
+        batch.append({'id': i, 'question': f'Question {i}?', 'answer': f'Answer {i}',
+                      'category': value, 'difficulty': rng.randint(1, 5)})
+        if len(batch) == 5000:
+            conn.execute(sa.text('INSERT INTO questions VALUES '
+                                 '(:id, :question, :answer, :category, :difficulty)'), batch)
+            batch = []
+    if batch:
+        conn.execute(sa.text('INSERT INTO questions VALUES '
+                             '(:id, :question, :answer, :category, :difficulty)'), batch)
+
+
+def explain(conn, query, category):
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(sa.text('EXPLAIN QUERY PLAN ' + query.text),
+                            {'category': category}).fetchall()
+        return [row[-1] for row in rows]
+    rows = conn.execute(sa.text('EXPLAIN ' + query.text),
+                        {'category': category}).fetchall()
+    return [row[0] for row in rows]
+
+
+def time_query(conn, query, category, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query, {'category': category}).fetchall()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return round(timings[len(timings) // 2] * 1000, 3)
+
+
+def measure(conn, category, repeat):
+    if conn.dialect.name == 'postgresql':
+        conn.execute(sa.text('ANALYZE questions'))
+    return {name: {'plan': explain(conn, query, category),
+                   'median_ms': time_query(conn, query, category, repeat)}
+            for name, query in QUERIES.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', default=None,
+                        help='SQLAlchemy URL, defaults to a temporary SQLite file')
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    url = args.database
+    if url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = 'sqlite:///' + os.path.join(tmpdir.name, 'bench.db')
+
+    engine = sa.create_engine(url)
+    migration = load_migration()
+
+    with engine.begin() as conn:
+        create_legacy_schema(conn, args.rows, args.seed)
+    with engine.connect() as conn:
+        before = measure(conn, '1', args.repeat)
+
+    with engine.begin() as conn:
+        migration.op = Operations(MigrationContext.configure(conn))
+        migration.upgrade()
+    with engine.connect() as conn:
+        after = measure(conn, 1, args.repeat)
+        unmatched = conn.execute(sa.text(
+            'SELECT COUNT(*) FROM questions WHERE category IS NULL')).scalar()
+
+    engine.dispose()
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+    json.dump({
+        'dialect': engine.dialect.name,
+        'rows': args.rows,
+        'unmatched_after_backfill': unmatched,
+        'before': before,
+        'after': after,
+        'speedup': {name: round(before[name]['median_ms'] / max(after[name]['median_ms'], 1e-3), 1)
+                    for name in QUERIES},
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+'''
+Load-test harness for the trivia API.
+
+Starts the app on a local port backed by a temporary SQLite database seeded
+with a synthetic question bank, drives a weighted mix of
+
+    questions   GET  /questions?page=<n>
+    category    GET  /categories/<id>/questions
+    search      POST /questions {"searchTerm": ...}
+    quiz        POST /quizzes
+
+from a thread pool, and prints throughput and p50/p95/p99 latency per
+endpoint as JSON. Runs are reproducible for a given --seed.
+
+Closed loop (fixed concurrency):
+    python benchmarks/loadtest.py --concurrency 8 --duration 10
+
+Open loop (fixed arrival rate; latency includes time queued behind the
+schedule, so a saturated server is not hidden by coordinated omission):
+    python benchmarks/loadtest.py --rate 200 --duration 10
+
+Pass --url to drive an already running server instead.
+'''
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_MIX = 'questions=40,category=30,search=15,quiz=15'
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+WORDS = ['river', 'painting', 'planet', 'empire', 'movie', 'team', 'element',
+        'capital', 'composer', 'ocean', 'battle', 'novel', 'athlete', 'mountain']
+
+
+def synthetic_questions(count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        words = rng.sample(WORDS, 3)
+        yield {
+            'question': f'Which {words[0]} is linked to the {words[1]} of {words[2]} #{i}?',
+            'answer': rng.choice(WORDS).title(),
+            'category': rng.randint(1, len(CATEGORIES)),
+            'difficulty': rng.randint(1, 5)
+        }
+
+
+def start_local_server(questions, seed):
+    '''
+    start_local_server(questions, seed)
+        creates the app on a temporary SQLite file, seeds it and serves it
+        from a threaded werkzeug server on an ephemeral port
+    '''
+    from werkzeug.serving import make_server
+    from flaskr import create_app
+    from flaskr.batch import import_questions
+    from models import db, Category
+
+    tmpdir = tempfile.TemporaryDirectory()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmpdir.name, 'load.db')
+    })
+    with app.app_context():
+        for category in CATEGORIES:
+            db.session.add(Category(category))
+        db.session.commit()
+        import_questions(synthetic_questions(questions, seed))
+
+    # per-request access logs would dominate the client's own timings
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        tmpdir.cleanup()
+
+    return f'http://127.0.0.1:{server.server_port}', stop
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in REQUESTS:
+            raise SystemExit(f'unknown endpoint in mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def questions_request(rng, state):
+    return 'GET', f'/questions?page={rng.randint(1, state["pages"])}', None
+
+
+def category_request(rng, state):
+    return 'GET', f'/categories/{rng.randint(1, len(CATEGORIES))}/questions', None
+
+
+def search_request(rng, state):
+    return 'POST', '/questions', {'searchTerm': rng.choice(WORDS)}
+
+
+def quiz_request(rng, state):
+    category = rng.randint(0, len(CATEGORIES))
+    previous = [rng.randint(1, state['questions']) for _ in range(rng.randint(0, 5))]
+    return 'POST', '/quizzes', {
+        'previous_questions': previous,
+        'quiz_category': {'id': category}
+    }
+
+
+REQUESTS = {
+    'questions': questions_request,
+    'category': category_request,
+    'search': search_request,
+    'quiz': quiz_request
+}
+
+
+class Client(threading.local):
+    '''
+    one keep-alive connection per worker thread
+    '''
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.conn = None
+
+    def send(self, method, path, body):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, payload, headers)
+                response = self.conn.getresponse()
+                response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.conn.close()
+                    self.conn = None
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1,
+                    int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    by_endpoint = {}
+    for name, latency, ok in samples:
+        by_endpoint.setdefault(name, []).append((latency, ok))
+
+    def stats(entries):
+        latencies = sorted(latency for latency, _ in entries)
+        return {
+            'requests': len(entries),
+            'errors': sum(1 for _, ok in entries if not ok),
+            'throughput_rps': round(len(entries) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3)
+        }
+
+    report = {name: stats(entries) for name, entries in sorted(by_endpoint.items())}
+    if samples:
+        report['total'] = stats([(latency, ok) for _, latency, ok in samples])
+    return report
+
+
+def run(base_url, mix, state, concurrency, duration, rate, seed):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    client = Client(base_url)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def one(name, request, scheduled):
+        method, path, body = request
+        try:
+            ok = 200 <= client.send(method, path, body) < 300
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - scheduled
+        with samples_lock:
+            samples.append((name, latency, ok))
+
+    started = time.perf_counter()
+    deadline = started + duration
+
+    if rate:
+        # open loop: one arrival every 1/rate seconds on a precomputed plan
+        rng = random.Random(seed)
+        interval = 1.0 / rate
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            scheduled = started
+            while scheduled < deadline:
+                name = rng.choices(names, weights)[0]
+                request = REQUESTS[name](rng, state)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(one, name, request, scheduled)
+                scheduled += interval
+    else:
+        def worker(index):
+            rng = random.Random(seed * 1000 + index)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                one(name, REQUESTS[name](rng, state), time.perf_counter())
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+
+    return summarize(samples, time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                    formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='target a running server instead of starting one')
+    parser.add_argument('--questions', type=int, default=2000,
+                        help='size of the synthetic question bank')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='comma separated endpoint=weight pairs (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='worker threads (closed loop) or pool size (with --rate)')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='fixed arrival rate in requests per second')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    stop = None
+    base_url = args.url
+    if base_url is None:
+        base_url, stop = start_local_server(args.questions, args.seed)
+
+    state = {
+        'questions': args.questions,
+        'pages': max(1, args.questions // 10)
+    }
+    try:
+        endpoints = run(base_url, mix, state, args.concurrency,
+                        args.duration, args.rate, args.seed)
+    finally:
+        if stop is not None:
+            stop()
+
+    json.dump({
+        'config': {
+            'url': args.url or 'local',
+            'questions': args.questions,
+            'mix': mix,
+            'mode': 'rate' if args.rate else 'concurrency',
+            'rate': args.rate,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'seed': args.seed
+        },
+        'endpoints': endpoints
+    }, args.output, indent=2)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
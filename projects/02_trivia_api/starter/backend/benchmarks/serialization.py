@@ -0,0 +1,100 @@
+'''
+JSON serialization and compression benchmark for the trivia API.
+
+Seeds a temporary SQLite database with a synthetic question bank, captures
+the payloads of the largest responses and reports, for each of them, the
+time to encode it with the stdlib provider and with FastJSONProvider
+(orjson, when installed) and the bytes on the wire uncompressed, gzipped
+and brotli-compressed (when brotli is installed).
+
+Usage (from the backend directory):
+    python benchmarks/serialization.py --questions 5000
+'''
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask.json.provider import DefaultJSONProvider
+
+from flaskr import create_app
+from flaskr.batch import import_questions
+from flask_toolkit.responses import FastJSONProvider, _compress, brotli, orjson
+from models import db, Category, Question
+from loadtest import CATEGORIES, synthetic_questions
+
+
+def time_dumps(provider, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        provider.dumps(payload)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return round(timings[len(timings) // 2] * 1000, 3)
+
+
+def measure(app, payload, repeat):
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    body = fast.dumps(payload).encode('utf-8')
+
+    result = {
+        'stdlib_ms': time_dumps(stdlib, payload, repeat),
+        'fast_ms': time_dumps(fast, payload, repeat),
+        'identity_bytes': len(body),
+        'gzip_bytes': len(_compress(body, 'gzip', app.config))
+    }
+    if brotli is not None:
+        result['br_bytes'] = len(_compress(body, 'br', app.config))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+        })
+        with app.app_context():
+            for category in CATEGORIES:
+                db.session.add(Category(category))
+            db.session.commit()
+            import_questions(synthetic_questions(args.questions, args.seed))
+
+            client = app.test_client()
+            payloads = {
+                'GET /questions': client.get('/questions?page=1').get_json(),
+                'GET /stats': client.get('/stats').get_json(),
+                # the full bank as an unpaginated listing would return it
+                'question listing': {
+                    'success': True,
+                    'questions': [q.format() for q in Question.query.order_by(Question.id).all()]
+                }
+            }
+            report = {name: measure(app, payload, args.repeat)
+                      for name, payload in payloads.items()}
+            db.engine.dispose()
+
+    json.dump({
+        'questions': args.questions,
+        'orjson': orjson is not None,
+        'brotli': brotli is not None,
+        'payloads': report
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
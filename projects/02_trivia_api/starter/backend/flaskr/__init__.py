@@ -1,42 +1,97 @@
 import os
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from flask_cors import CORS
 import random
 
 from models import setup_db, Question, Category
+from flask_toolkit import create_app as create_toolkit_app
+from flask_toolkit.conditional import conditional
+from .batch import import_questions, iter_ndjson
+from .stats import question_stats
+from .cli import trivia_cli
 
 QUESTIONS_PER_PAGE = 10
 
-def paginate_questions(request, selection):
-	page = request.args.get('page', 1, type=int)
-	start =  (page - 1) * QUESTIONS_PER_PAGE
-	end = start + QUESTIONS_PER_PAGE
-
-	questions = [question.format() for question in selection]
-	current_questions = questions[start:end]
-
-	return current_questions
+INCLUDES = ('categories',)
+
+'''
+requested_fields(request)
+	the question fields listed in ?fields=, every field when it is absent.
+	id is always returned so clients can still address the question.
+'''
+def requested_fields(request):
+	fields = request.args.get('fields', None)
+	if fields is None:
+		return Question.FIELDS
+
+	names = {name.strip() for name in fields.split(',') if name.strip()}
+	if not names <= set(Question.FIELDS):
+		abort(400)
+	return tuple(field for field in Question.FIELDS if field == 'id' or field in names)
+
+'''
+includes(request, name, default)
+	whether ?include= asks for the given embedded resource, default when
+	the parameter is absent. ?include= with no value embeds nothing.
+'''
+def includes(request, name, default):
+	include = request.args.get('include', None)
+	if include is None:
+		return default
+
+	names = {part.strip() for part in include.split(',') if part.strip()}
+	if not names <= set(INCLUDES):
+		abort(400)
+	return name in names
+
+'''
+paginate_questions(request, *criterion)
+	returns the requested page of questions matching criterion and the
+	total number of matches. only the requested fields are read and the
+	page is cut by the database, not by slicing the whole table.
+'''
+def paginate_questions(request, *criterion):
+	page = max(request.args.get('page', 1, type=int), 1)
+	current_questions = Question.select(requested_fields(request), *criterion,
+		offset=(page - 1) * QUESTIONS_PER_PAGE, limit=QUESTIONS_PER_PAGE)
+
+	return current_questions, Question.count(*criterion)
+
+def categories_map():
+	return {category.id: category.type for category in Category.query.all()}
+
+'''
+APP_CONFIG
+	flask_toolkit settings of the trivia API, test_config and FLASK_
+	prefixed environment variables override them
+'''
+APP_CONFIG = {
+	'COMPRESS': True,
+	'CORS_ALLOW_HEADERS': ['Content-Type', 'Authorization'],
+	'CORS_METHODS': ['GET', 'PUT', 'POST', 'DELETE', 'OPTIONS'],
+	'ERROR_MESSAGES': {
+		400: 'invalid syntax',
+		404: 'Resource not found',
+		422: 'request cannot be processed',
+		500: 'internal server error'
+	}
+}
 
 def create_app(test_config=None):
 	# create and configure the app
-	app = Flask(__name__)
-	setup_db(app)
+	app = create_toolkit_app(__name__, dict(APP_CONFIG, **(test_config or {})))
+	if test_config is None:
+		setup_db(app)
+	else:
+		setup_db(app, test_config['SQLALCHEMY_DATABASE_URI'])
+	app.cli.add_command(trivia_cli)
 	
 	'''
 	@TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
-	'''
-	CORS(app) # CAREFUL
-
-	'''
 	@TODO: Use the after_request decorator to set Access-Control-Allow
 	'''
-	# CORS Headers 
-	@app.after_request
-	def after_request(response):
-		response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,true')
-		response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-		return response
+	# flask_toolkit sets up CORS for every origin, preflight requests are
+	# answered with the CORS_ALLOW_HEADERS and CORS_METHODS of APP_CONFIG
 
 	'''
 	GET /categories 
@@ -58,6 +113,7 @@ def create_app(test_config=None):
 	}
 	'''
 	@app.route('/categories', methods=['GET'])
+	@conditional('categories')
 	def categories():
 		categories = Category.query.all()
 		categories_dict = {}
@@ -76,6 +132,12 @@ def create_app(test_config=None):
 	Page size is 10. If no page is specified as a parameter, first page is retrieved.
 	Returns questions for the given page, current category, all categories and total number of questions
 
+	Optional parameters:
+	fields		comma separated question fields to return (id is always included),
+				e.g. ?fields=question,difficulty. Unknown fields are a 400.
+	include		comma separated resources to embed. Defaults to categories;
+				?include= leaves the categories map out of the response.
+
 	Example Request: curl 'http://localhost:5000/questions?page=2'
 
 	Example Response: 
@@ -113,22 +175,18 @@ def create_app(test_config=None):
 
 	'''
 	@app.route('/questions', methods=['GET'])
+	@conditional('questions', 'categories')
 	def retrieve_questions():
-		selection = Question.query.order_by(Question.id).all()
-		total_num_questions = len(selection)
-		current_questions = paginate_questions(request, selection)
-		categories = Category.query.all()
-		categories_dict = {}
-		for category in categories:
-			category = category.format()
-			categories_dict[category['id']] = category['type']
-		return jsonify({
+		current_questions, total_num_questions = paginate_questions(request)
+		response = {
 			"success": True,
 			"questions": current_questions,
 			"current_category": None,
-			"categories": categories_dict,
 			"total_questions": total_num_questions
-		})
+		}
+		if includes(request, 'categories', default=True):
+			response['categories'] = categories_map()
+		return jsonify(response)
 
 	'''
 	DELETE /questions/<int:question_id>
@@ -220,22 +278,28 @@ def create_app(test_config=None):
 		search_term = body.get('searchTerm', None)
 
 		if search_term:
-			selection = Question.query.order_by(Question.id) \
-						.filter(Question.question.ilike(f'%{search_term}%')).all()
-
-			current_questions = paginate_questions(request, selection)
+			current_questions, total_num_questions = paginate_questions(request,
+				Question.question.ilike(f'%{search_term}%'))
 		
-			return jsonify({
+			response = {
 				'success': True,
 				'questions': current_questions,
-				'total_questions': len(selection),
+				'total_questions': total_num_questions,
 				'current_category': None
-			})
+			}
+			if includes(request, 'categories', default=False):
+				response['categories'] = categories_map()
+			return jsonify(response)
 
 		else:
 		
 			if question is None or answer is None or answer is None or category is None:
 				abort(400)
+
+			try:
+				category = int(category)
+			except (TypeError, ValueError):
+				abort(422)
 			
 			question = Question(question=question, 
 								answer=answer, 
@@ -248,9 +312,97 @@ def create_app(test_config=None):
 				"success": True
 			})
 
+	'''
+	POST /questions/batch
+	Creates many questions in a single transaction.
+	Accepts either a JSON array of questions (Content-Type: application/json)
+	or one question per line (Content-Type: application/x-ndjson), which is
+	streamed and inserted in chunks. Valid items are inserted, invalid ones
+	are reported by their position in the input.
+
+	Example Request:
+	curl --request POST 'http://localhost:5000/questions/batch' \
+	--header 'Content-Type: application/x-ndjson' \
+	--data-binary @questions.ndjson
+
+	Example Response:
+	{
+		"created": 2,
+		"errors": [
+			{
+			"index": 1,
+			"message": "category 42 does not exist"
+			}
+		],
+		"success": true
+	}
+	'''
+	@app.route('/questions/batch', methods=['POST'])
+	def create_questions_batch():
+		if request.mimetype in ('application/x-ndjson', 'application/jsonlines'):
+			items = iter_ndjson(request.stream)
+		else:
+			items = request.get_json(silent=True)
+			if not isinstance(items, list):
+				abort(400)
+
+		created, errors = import_questions(items)
+
+		if created == 0 and errors:
+			return jsonify({
+				'success': False,
+				'error': 422,
+				'message': 'no valid questions in batch',
+				'errors': errors
+			}), 422
+
+		return jsonify({
+			'success': True,
+			'created': created,
+			'errors': errors
+		})
+
+	'''
+	DELETE /questions/batch
+	Deletes every question whose id is listed, with a single statement.
+	Ids that do not exist are returned in not_found.
+
+	Example Request:
+	curl --request DELETE 'http://localhost:5000/questions/batch' \
+	--header 'Content-Type: application/json' \
+	--data-raw '{"ids": [24, 25, 999]}'
+
+	Example Response:
+	{
+		"deleted": [24, 25],
+		"not_found": [999],
+		"success": true
+	}
+	'''
+	@app.route('/questions/batch', methods=['DELETE'])
+	def delete_questions_batch():
+		body = request.get_json(silent=True) or {}
+		ids = body.get('ids', None)
+
+		if not isinstance(ids, list) or not ids:
+			abort(400)
+		if not all(isinstance(q_id, int) for q_id in ids):
+			abort(422)
+
+		deleted = Question.delete_many(ids)
+		deleted_set = set(deleted)
+
+		return jsonify({
+			'success': True,
+			'deleted': deleted,
+			'not_found': [q_id for q_id in ids if q_id not in deleted_set]
+		})
+
 	'''
 	GET /categories/<int:category_id>/questions
 	Retrieve questions based on category. 
+	Accepts the fields and include parameters of GET /questions,
+	categories are only embedded when asked for with ?include=categories.
 
 	Example Request: curl 'http://localhost:5000/categories/1/questions'
 
@@ -285,6 +437,7 @@ def create_app(test_config=None):
 	}
 	'''
 	@app.route('/categories/<int:category_id>/questions', methods=['GET'])
+	@conditional('questions', 'categories')
 	def get_questions_by_category(category_id):
 
 		
@@ -292,17 +445,18 @@ def create_app(test_config=None):
 		if not category:
 			abort(404)
 
-		selection = Question.query.order_by(Question.id) \
-			.filter(Question.category == category_id).all()
-		total_num_questions = len(selection)
-		current_questions = paginate_questions(request, selection)
+		current_questions, total_num_questions = paginate_questions(request,
+			Question.category == category_id)
 
-		return jsonify({
+		response = {
 			"success": True,
 			"questions": current_questions,
 			"current_category": category.format()['type'],
 			"total_questions": total_num_questions
-		})
+		}
+		if includes(request, 'categories', default=False):
+			response['categories'] = categories_map()
+		return jsonify(response)
 
 	'''
 	POST /quizzes
@@ -348,11 +502,16 @@ def create_app(test_config=None):
 		if 'id' not in quiz_category:
 			abort(400)
 
-		if quiz_category['id'] == 0:
+		try:
+			category_id = int(quiz_category['id'])
+		except (TypeError, ValueError):
+			abort(400)
+
+		if category_id == 0:
 			selection = Question.query.all()
 		else:
 			selection = Question.query.order_by(Question.id) \
-				.filter(Question.category == quiz_category['id']).all()
+				.filter(Question.category == category_id).all()
 		
 		questions = [question.format() for question in selection]
 		questions_filtered = []
@@ -370,43 +529,44 @@ def create_app(test_config=None):
 			"question": question
 		})
 
+	'''
+	GET /stats
+	Question counts per category, difficulty histograms and totals.
+	Every category is listed, those without questions with zero counts.
+	Computed with a single GROUP BY and cached until the next insert,
+	update or delete on questions or categories.
+
+	Example Request: curl 'http://localhost:5000/stats'
+
+	Example Response:
+	{
+		"categories": {
+			"1": {
+				"difficulty": {"3": 1, "4": 2},
+				"total_questions": 3,
+				"type": "Science"
+			},
+			...
+		},
+		"difficulty": {"1": 2, "2": 5, "3": 4, "4": 8},
+		"success": true,
+		"total_categories": 6,
+		"total_questions": 19
+	}
+	'''
+	@app.route('/stats', methods=['GET'])
+	@conditional('questions', 'categories')
+	def retrieve_stats():
+		return jsonify(dict(question_stats(), success=True))
+
 	'''
 	@TODO: 
 	Create error handlers for all expected errors 
 	including 404 and 422. 
 	'''
-
-	@app.errorhandler(404)
-	def not_found(error):
-		return jsonify({
-			'success': False,
-			'error': 404,
-			'message': 'Resource not found'
-		}), 404
-
-	@app.errorhandler(422)
-	def unprocessable(error):
-		return jsonify({
-			'success': False,
-			'error': 422,
-			'message': 'request cannot be processed'
-		}), 422
-
-	@app.errorhandler(400)
-	def bad_request(error):
-		return jsonify({
-			'success': False,
-			'error': 400,
-			'message': 'invalid syntax'
-		}), 400
-
-	@app.errorhandler(500)
-	def server_error(error):
-		return jsonify({
-			'success': False,
-			'error': 500,
-			'message': 'internal server error'
-		}), 500
+	# flask_toolkit answers every HTTP error with
+	# {"success": False, "error": code, "message": message},
+	# the messages are the ERROR_MESSAGES of APP_CONFIG
 	
 	return app
 
@@ -0,0 +1,131 @@
+import json
+
+from models import db, Question, Category
+
+BATCH_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = (Question.id, Question.question, Question.answer,
+				Question.category, Question.difficulty)
+
+
+'''
+validate_question(item, category_ids)
+	checks a single question payload and returns the column dict
+	to insert, raises ValueError with a readable message otherwise
+'''
+def validate_question(item, category_ids):
+	if not isinstance(item, dict):
+		raise ValueError('question must be a JSON object')
+
+	question = item.get('question', None)
+	answer = item.get('answer', None)
+	if not isinstance(question, str) or not question.strip():
+		raise ValueError('question is missing')
+	if not isinstance(answer, str) or not answer.strip():
+		raise ValueError('answer is missing')
+
+	try:
+		category = int(item.get('category', None))
+	except (TypeError, ValueError):
+		raise ValueError('category must be an integer')
+	if category not in category_ids:
+		raise ValueError(f'category {category} does not exist')
+
+	difficulty = item.get('difficulty', None)
+	if difficulty is not None:
+		try:
+			difficulty = int(difficulty)
+		except (TypeError, ValueError):
+			raise ValueError('difficulty must be an integer')
+
+	return {
+		'question': question,
+		'answer': answer,
+		'category': category,
+		'difficulty': difficulty
+	}
+
+
+'''
+iter_ndjson(lines)
+	yields one decoded value per non-blank line, decoding errors
+	are yielded as ValueError instances so they can be reported per item
+'''
+def iter_ndjson(lines):
+	for line in lines:
+		line = line.strip()
+		if not line:
+			continue
+		try:
+			# a line that is not UTF-8 is reported like any other invalid line
+			if isinstance(line, bytes):
+				line = line.decode('utf-8')
+			yield json.loads(line)
+		except ValueError as e:
+			yield ValueError(f'invalid JSON: {e}')
+
+
+'''
+import_questions(items, chunk_size)
+	validates and inserts an iterable of question payloads inside a
+	single transaction. rows are flushed in chunks of chunk_size so
+	memory stays bounded for arbitrarily long streams.
+	returns (created, errors) where errors is a list of
+	{"index": i, "message": ...} for every rejected item
+'''
+def import_questions(items, chunk_size=BATCH_CHUNK_SIZE):
+	category_ids = {row.id for row in db.session.query(Category.id).all()}
+	created = 0
+	errors = []
+	chunk = []
+
+	try:
+		for index, item in enumerate(items):
+			try:
+				if isinstance(item, ValueError):
+					raise item
+				chunk.append(validate_question(item, category_ids))
+			except ValueError as e:
+				errors.append({'index': index, 'message': str(e)})
+				continue
+
+			if len(chunk) >= chunk_size:
+				Question.insert_many(chunk)
+				created += len(chunk)
+				chunk = []
+
+		if chunk:
+			Question.insert_many(chunk)
+			created += len(chunk)
+		db.session.commit()
+	except Exception:
+		db.session.rollback()
+		raise
+
+	return created, errors
+
+
+'''
+export_questions(chunk_size)
+	yields the question bank as NDJSON lines ordered by id,
+	fetching chunk_size rows at a time instead of loading the whole table
+'''
+def export_questions(chunk_size=EXPORT_CHUNK_SIZE):
+	last_id = 0
+	while True:
+		rows = db.session.query(*EXPORT_COLUMNS) \
+			.filter(Question.id > last_id) \
+			.order_by(Question.id) \
+			.limit(chunk_size).all()
+		if not rows:
+			return
+		for row in rows:
+			yield json.dumps({
+				'id': row.id,
+				'question': row.question,
+				'answer': row.answer,
+				'category': row.category,
+				'difficulty': row.difficulty
+			}) + '\n'
+		last_id = rows[-1].id
@@ -0,0 +1,55 @@
+import json
+import sys
+
+import click
+from flask.cli import AppGroup
+
+from .batch import import_questions, export_questions, iter_ndjson, BATCH_CHUNK_SIZE
+
+trivia_cli = AppGroup('trivia', help='Bulk import and export of the question bank.')
+
+
+'''
+flask trivia import FILE
+	loads questions from an NDJSON file (one question per line) or a
+	JSON array, use - to read from stdin. NDJSON is streamed line by line,
+	a JSON array has to be read into memory first.
+'''
+@trivia_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--chunk-size', default=BATCH_CHUNK_SIZE, show_default=True,
+			help='Rows sent to the database per executemany.')
+def import_command(source, chunk_size):
+	first = source.read(1)
+	while first and first.isspace():
+		first = source.read(1)
+
+	if first == '[':
+		items = json.loads(first + source.read())
+	else:
+		items = iter_ndjson(_prepend(first, source))
+
+	created, errors = import_questions(items, chunk_size=chunk_size)
+	for error in errors:
+		click.echo(f"item {error['index']}: {error['message']}", err=True)
+	click.echo(f'imported {created} questions, rejected {len(errors)}')
+	if errors:
+		sys.exit(1)
+
+
+'''
+flask trivia export [FILE]
+	writes the question bank as NDJSON ordered by id (stdout by default)
+'''
+@trivia_cli.command('export')
+@click.argument('destination', type=click.File('w', encoding='utf-8'), default='-')
+def export_command(destination):
+	for line in export_questions():
+		destination.write(line)
+
+
+def _prepend(first, source):
+	line = first + source.readline()
+	while line:
+		yield line
+		line = source.readline()
@@ -0,0 +1,76 @@
+import threading
+
+from sqlalchemy import func
+
+from models import db, Question, Category, table_versions
+
+_cache = (None, None)
+_cache_lock = threading.Lock()
+
+
+'''
+compute_stats()
+	aggregates the question bank with a single GROUP BY over
+	(category, difficulty), then lists every category with its name,
+	so categories without questions appear with zero counts. questions
+	whose category was deleted are counted under "None".
+'''
+def compute_stats():
+	rows = db.session.query(Question.category, Question.difficulty, func.count(Question.id)) \
+		.group_by(Question.category, Question.difficulty) \
+		.all()
+
+	categories = {
+		str(category_id): {
+			'type': category_type,
+			'total_questions': 0,
+			'difficulty': {}
+		}
+		for category_id, category_type in db.session.query(Category.id, Category.type)
+	}
+	total_categories = len(categories)
+	difficulty = {}
+	total = 0
+	for category_id, level, count in rows:
+		total += count
+		difficulty[str(level)] = difficulty.get(str(level), 0) + count
+
+		key = str(category_id)
+		if key not in categories:
+			categories[key] = {
+				'type': None,
+				'total_questions': 0,
+				'difficulty': {}
+			}
+		categories[key]['total_questions'] += count
+		categories[key]['difficulty'][str(level)] = count
+
+	return {
+		'total_questions': total,
+		'total_categories': total_categories,
+		'categories': categories,
+		'difficulty': difficulty
+	}
+
+
+'''
+question_stats()
+	returns the cached aggregates, recomputing them only when the
+	questions or categories table has changed since the last call.
+	the versions are read from the table_versions table, so a write
+	committed by any process or worker invalidates every cache.
+'''
+def question_stats():
+	global _cache
+	versions = table_versions.read([Question.__tablename__, Category.__tablename__])
+	key = (str(db.engine.url),) + tuple(version for version, _ in versions.values())
+	cached_key, stats = _cache
+	if cached_key == key:
+		return stats
+
+	with _cache_lock:
+		cached_key, stats = _cache
+		if cached_key != key:
+			stats = compute_stats()
+			_cache = (key, stats)
+	return stats
@@ -0,0 +1,122 @@
+"""questions.category as an indexed integer foreign key
+
+Older databases created through db.create_all() stored questions.category as
+a VARCHAR with neither an index nor a foreign key, so category filters compared
+a string column against an integer id and scanned the whole table. This
+revision backfills the existing string values (numeric ids or category names),
+converts the column to INTEGER and adds ix_questions_category plus the
+"category" foreign key to categories.id.
+
+Every step inspects the live schema first, so databases restored from
+trivia.psql (already integer, FK present) only gain the index.
+
+Revision ID: 3f1c2a9d8b7e
+Revises:
+Create Date: 2026-10-19 10:12:41.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8b7e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_questions_category'
+FK_NAME = 'category'
+
+
+def _column_type(inspector):
+    for column in inspector.get_columns('questions'):
+        if column['name'] == 'category':
+            return column['type']
+    return None
+
+
+def _has_index(inspector):
+    return any(index['name'] == INDEX_NAME
+               for index in inspector.get_indexes('questions'))
+
+
+def _has_fk(inspector):
+    return any(fk['referred_table'] == 'categories' and
+               fk['constrained_columns'] == ['category']
+               for fk in inspector.get_foreign_keys('questions'))
+
+
+def backfill_categories(bind):
+    '''
+    backfill_categories(bind)
+        rewrites every string category value into the id it refers to.
+        numeric strings are kept when they match an existing category,
+        category names are matched case-insensitively, anything else
+        becomes NULL (the same outcome as ON DELETE SET NULL)
+    '''
+    categories = bind.execute(sa.text('SELECT id, type FROM categories')).fetchall()
+    ids = {str(row.id) for row in categories}
+    by_type = {(row.type or '').strip().lower(): str(row.id) for row in categories}
+
+    values = bind.execute(sa.text(
+        'SELECT DISTINCT category FROM questions WHERE category IS NOT NULL')).fetchall()
+    for (value,) in values:
+        cleaned = str(value).strip()
+        if cleaned in ids:
+            new_value = cleaned
+        else:
+            new_value = by_type.get(cleaned.lower())
+
+        if new_value == value:
+            continue
+        bind.execute(
+            sa.text('UPDATE questions SET category = :new WHERE category = :old'),
+            {'new': new_value, 'old': value})
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not isinstance(_column_type(inspector), sa.Integer):
+        backfill_categories(bind)
+        with op.batch_alter_table('questions') as batch_op:
+            batch_op.alter_column('category',
+                                  existing_type=sa.String(),
+                                  type_=sa.Integer(),
+                                  postgresql_using='category::integer')
+        inspector = sa.inspect(bind)
+
+    # orphaned ids would make the foreign key fail to validate
+    bind.execute(sa.text(
+        'UPDATE questions SET category = NULL '
+        'WHERE category IS NOT NULL '
+        'AND category NOT IN (SELECT id FROM categories)'))
+
+    if not _has_index(inspector):
+        op.create_index(INDEX_NAME, 'questions', ['category'])
+
+    if not _has_fk(inspector):
+        with op.batch_alter_table('questions') as batch_op:
+            batch_op.create_foreign_key(FK_NAME, 'categories',
+                                        ['category'], ['id'],
+                                        onupdate='CASCADE', ondelete='SET NULL')
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if _has_fk(inspector):
+        with op.batch_alter_table('questions') as batch_op:
+            batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+
+    if _has_index(inspector):
+        op.drop_index(INDEX_NAME, table_name='questions')
+
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.alter_column('category',
+                              existing_type=sa.Integer(),
+                              type_=sa.String(),
+                              postgresql_using='category::varchar')
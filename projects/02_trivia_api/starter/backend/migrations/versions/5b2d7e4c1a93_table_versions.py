@@ -0,0 +1,46 @@
+"""table_versions for ETags and caches shared by every process
+
+flask_toolkit.versions.TableVersions keeps a version and change time per
+table in table_versions, replaced in the transaction of every committed
+write. This revision creates the table (unless db.create_all() already did)
+with a row for questions and categories.
+
+Revision ID: 5b2d7e4c1a93
+Revises: 3f1c2a9d8b7e
+Create Date: 2026-10-19 14:05:12.530118
+
+"""
+import time
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2d7e4c1a93'
+down_revision = '3f1c2a9d8b7e'
+branch_labels = None
+depends_on = None
+
+TRACKED_TABLES = ('categories', 'questions')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table('table_versions'):
+        return
+
+    table_versions = op.create_table(
+        'table_versions',
+        sa.Column('tablename', sa.String(length=64), primary_key=True),
+        sa.Column('version', sa.String(length=32), nullable=False),
+        sa.Column('changed_at', sa.Float(), nullable=False))
+    now = time.time()
+    op.bulk_insert(table_versions, [
+        {'tablename': tablename, 'version': uuid.uuid4().hex, 'changed_at': now}
+        for tablename in TRACKED_TABLES])
+
+
+def downgrade():
+    op.drop_table('table_versions')
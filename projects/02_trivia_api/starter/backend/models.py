@@ -1,23 +1,31 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, ForeignKey, create_engine, func
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 import json
 
+from flask_toolkit import init_db
+from flask_toolkit.versions import TableVersions, mark_changed
+
 database_name = "trivia"
 # database_path = "postgres://{}/{}".format('localhost:5432', database_name)
 database_path = "postgres:///{}".format(database_name)
 
 db = SQLAlchemy()
+migrate = Migrate()
+# a version per table, bumped in the transaction of every committed write
+# and shared by every process, see flask_toolkit/versions.py
+table_versions = TableVersions(db)
 
 '''
 setup_db(app)
-    binds a flask application and a SQLAlchemy service
+    binds a flask application and a SQLAlchemy service, the DB_* settings
+    of flask_toolkit tune the connection pool
 '''
 def setup_db(app, database_path=database_path):
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
-    db.init_app(app)
+    init_db(app, db, database_path)
+    migrate.init_app(app, db)
+    table_versions.init_app(app)
     db.create_all()
 
 '''
@@ -27,10 +35,13 @@ Question
 class Question(db.Model):  
   __tablename__ = 'questions'
 
+  FIELDS = ('id', 'question', 'answer', 'category', 'difficulty')
+
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  category = Column(Integer, ForeignKey('categories.id', name='category',
+                    onupdate='CASCADE', ondelete='SET NULL'), index=True)
   difficulty = Column(Integer)
 
   def __init__(self, question, answer, category, difficulty):
@@ -50,14 +61,51 @@ class Question(db.Model):
     db.session.delete(self)
     db.session.commit()
 
-  def format(self):
-    return {
-      'id': self.id,
-      'question': self.question,
-      'answer': self.answer,
-      'category': self.category,
-      'difficulty': self.difficulty
-    }
+  '''
+  insert_many(mappings)
+      stages column dicts with one executemany inside the current
+      transaction, the caller commits once the whole batch is staged
+  '''
+  @classmethod
+  def insert_many(cls, mappings):
+    db.session.bulk_insert_mappings(cls, mappings)
+    mark_changed(db.session, cls.__tablename__)
+
+  '''
+  delete_many(ids)
+      deletes every question whose id is in ids with a single statement
+      and commits, returns the ids that actually existed
+  '''
+  @classmethod
+  def delete_many(cls, ids):
+    found = [row.id for row in
+             db.session.query(cls.id).filter(cls.id.in_(ids)).all()]
+    if found:
+      db.session.query(cls).filter(cls.id.in_(found)) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return found
+
+  '''
+  select(fields, *criterion, offset=0, limit=None)
+      returns dicts holding only the given fields ordered by id,
+      reading only those columns instead of loading full rows
+  '''
+  @classmethod
+  def select(cls, fields, *criterion, offset=0, limit=None):
+    columns = [getattr(cls, field) for field in fields]
+    query = db.session.query(*columns).filter(*criterion) \
+      .order_by(cls.id).offset(offset)
+    if limit is not None:
+      query = query.limit(limit)
+    return [dict(zip(fields, row)) for row in query.all()]
+
+  @classmethod
+  def count(cls, *criterion):
+    return db.session.query(func.count(cls.id)).filter(*criterion).scalar()
+
+  def format(self, fields=FIELDS):
+    return {field: getattr(self, field) for field in fields}
 
 '''
 Category
@@ -1,4 +1,5 @@
 #!/bin/sh
 sudo -u postgres dropdb trivia_test
 sudo -u postgres createdb trivia_test
-sudo -u postgres psql trivia_test < trivia.psql
\ No newline at end of file
+sudo -u postgres psql trivia_test < trivia.psql
+TRIVIA_TEST_DATABASE_URL=postgresql:///trivia_test python test_flaskr.py
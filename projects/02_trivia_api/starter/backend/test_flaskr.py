@@ -1,23 +1,24 @@
 import os
+import gzip
+import tempfile
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from models import db, Question, Category
+from testing import TransactionalTestCase
 
 
-class TriviaTestCase(unittest.TestCase):
+class TriviaTestCase(TransactionalTestCase):
 	"""This class represents the trivia test case"""
 
 	def setUp(self):
-		"""Define test variables and initialize app."""
-		self.app = create_app()
-		self.client = self.app.test_client
-		self.database_name = "trivia_test"
-		self.database_path = "postgres:///{}".format(self.database_name)
+		"""Define test variables and open the per-test transaction."""
+		super().setUp()
 		self.q_id = 2
-		setup_db(self.app, self.database_path)
 
 		self.question = {
 			"question": "Türkiye'nin başkenti hangi ilimizdir?",
@@ -31,17 +32,6 @@ class TriviaTestCase(unittest.TestCase):
 			"answer": "Ankara",
 			"difficulty": 1
 		}
-
-		# binds the app to the current context
-		with self.app.app_context():
-			self.db = SQLAlchemy()
-			self.db.init_app(self.app)
-			# create all tables
-			self.db.create_all()
-	
-	def tearDown(self):
-		"""Executed after reach test"""
-		pass
 	
 	def test_get_categories(self):
 		res = self.client().get('/categories')
@@ -254,6 +244,156 @@ class TriviaTestCase(unittest.TestCase):
 		self.assertEqual(res.status_code, 400)
 		self.assertFalse(data['success'])
 
+
+	def test_create_questions_batch(self):
+		res = self.client().post('/questions/batch', json=[self.question, self.question])
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertTrue(data['success'])
+		self.assertEqual(data['created'], 2)
+		self.assertEqual(data['errors'], [])
+
+	def test_create_questions_batch_ndjson_reports_errors(self):
+		lines = [json.dumps(self.question), '{not json', json.dumps(self.wrong_question)]
+		res = self.client().post('/questions/batch', data='\n'.join(lines),
+								content_type='application/x-ndjson')
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(data['created'], 1)
+		self.assertEqual([error['index'] for error in data['errors']], [1, 2])
+
+	def test_create_questions_batch_ndjson_reports_invalid_utf8(self):
+		lines = [json.dumps(self.question).encode('utf-8'), b'{"question": "caf\xe9"}',
+				json.dumps(self.question).encode('utf-8')]
+		res = self.client().post('/questions/batch', data=b'\n'.join(lines),
+								content_type='application/x-ndjson')
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(data['created'], 2)
+		self.assertEqual([error['index'] for error in data['errors']], [1])
+		self.assertTrue(data['errors'][0]['message'].startswith('invalid JSON'))
+
+	def test_create_questions_batch_fail_422(self):
+		res = self.client().post('/questions/batch', json=[self.wrong_question])
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 422)
+		self.assertFalse(data['success'])
+		self.assertEqual(data['errors'][0]['index'], 0)
+
+	def test_delete_questions_batch(self):
+		self.client().post('/questions/batch', json=[self.question, self.question])
+		with self.app.app_context():
+			ids = [q.id for q in Question.query.order_by(Question.id.desc()).limit(2).all()]
+
+		res = self.client().delete('/questions/batch', json={'ids': ids + [-100]})
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(sorted(data['deleted']), sorted(ids))
+		self.assertEqual(data['not_found'], [-100])
+
+	def test_delete_questions_batch_fail_400(self):
+		res = self.client().delete('/questions/batch', json={'ids': []})
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 400)
+		self.assertFalse(data['success'])
+
+	def test_get_stats(self):
+		res = self.client().get('/stats')
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertTrue(data['success'])
+		self.assertEqual(data['total_questions'],
+						sum(c['total_questions'] for c in data['categories'].values()))
+		self.assertEqual(data['total_questions'], sum(data['difficulty'].values()))
+
+	def test_get_stats_refreshes_after_insert(self):
+		before = json.loads(self.client().get('/stats').data)
+		self.client().post('/questions', json=self.question)
+		after = json.loads(self.client().get('/stats').data)
+
+		self.assertEqual(after['total_questions'], before['total_questions'] + 1)
+		self.assertEqual(after['categories']['3']['total_questions'],
+						before['categories']['3']['total_questions'] + 1)
+
+	def test_get_questions_gzip(self):
+		plain = self.client().get('/questions?page=1')
+		res = self.client().get('/questions?page=1', headers={'Accept-Encoding': 'gzip'})
+
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+		self.assertIn('Accept-Encoding', res.headers['Vary'])
+		self.assertLess(len(res.data), len(plain.data))
+		self.assertEqual(json.loads(gzip.decompress(res.data)), json.loads(plain.data))
+
+	def test_small_responses_not_compressed(self):
+		res = self.client().get('/categories', headers={'Accept-Encoding': 'gzip'})
+
+		self.assertEqual(res.status_code, 200)
+		self.assertNotIn('Content-Encoding', res.headers)
+
+	def test_get_categories_not_modified(self):
+		res = self.client().get('/categories')
+		etag = res.headers['ETag']
+
+		res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+		self.assertEqual(res.status_code, 304)
+		self.assertEqual(res.data, b'')
+		self.assertEqual(res.headers['ETag'], etag)
+
+	def test_get_questions_etag_changes_after_insert(self):
+		etag = self.client().get('/questions?page=1').headers['ETag']
+		self.assertNotEqual(etag, self.client().get('/questions?page=2').headers['ETag'])
+
+		self.client().post('/questions', json=self.question)
+		res = self.client().get('/questions?page=1', headers={'If-None-Match': etag})
+
+		self.assertEqual(res.status_code, 200)
+		self.assertNotEqual(res.headers['ETag'], etag)
+
+	def test_get_questions_not_modified_gzip(self):
+		headers = {'Accept-Encoding': 'gzip'}
+		res = self.client().get('/questions?page=1', headers=headers)
+		etag = res.headers['ETag']
+		self.assertTrue(etag.endswith('-gzip"'))
+
+		headers['If-None-Match'] = etag
+		res = self.client().get('/questions?page=1', headers=headers)
+
+		self.assertEqual(res.status_code, 304)
+
+	def test_get_questions_sparse_fields(self):
+		res = self.client().get('/questions?page=1&fields=question,difficulty&include=')
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertNotIn('categories', data)
+		self.assertEqual(len(data['questions']), 10)
+		self.assertGreater(data['total_questions'], 10)
+		for question in data['questions']:
+			self.assertEqual(set(question), {'id', 'question', 'difficulty'})
+
+	def test_get_questions_unknown_field_fail_400(self):
+		res = self.client().get('/questions?fields=question,secret')
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 400)
+		self.assertFalse(data['success'])
+
+	def test_get_category_questions_include_categories(self):
+		res = self.client().get('/categories/1/questions?include=categories&fields=answer')
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(data['categories']['1'], 'Science')
+		self.assertEqual(set(data['questions'][0]), {'id', 'answer'})
 		
 	"""
 	TODO
@@ -261,6 +401,57 @@ class TriviaTestCase(unittest.TestCase):
 	"""
 
 
+class StatsSharedDatabaseTestCase(unittest.TestCase):
+	"""The stats cache of one process sees writes committed by another"""
+
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix='.db')
+		os.close(fd)
+		self.url = 'sqlite:///' + self.path
+		self.app = create_app({'SQLALCHEMY_DATABASE_URI': self.url, 'TESTING': True})
+		self.client = self.app.test_client
+
+	def tearDown(self):
+		with self.app.app_context():
+			db.session.remove()
+			db.get_engine(self.app).dispose()
+		os.remove(self.path)
+
+	def test_get_stats_sees_insert_from_another_engine(self):
+		before = json.loads(self.client().get('/stats').data)
+
+		# another worker process: its own engine and session on the same database
+		engine = create_engine(self.url)
+		with Session(engine) as session:
+			category = Category('Science')
+			session.add(category)
+			session.flush()
+			category_id = category.id
+			session.add(Question('Is water wet?', 'Yes', category_id, 1))
+			session.commit()
+		engine.dispose()
+		after = json.loads(self.client().get('/stats').data)
+
+		self.assertEqual(before['total_questions'], 0)
+		self.assertEqual(after['total_questions'], 1)
+		self.assertEqual(after['categories'][str(category_id)]['total_questions'], 1)
+
+	def test_get_stats_lists_empty_categories(self):
+		with self.app.app_context():
+			db.session.add_all([Category('Science'), Category('Art')])
+			db.session.commit()
+		res = self.client().get('/stats')
+		data = json.loads(res.data)
+
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(data['total_questions'], 0)
+		self.assertEqual(data['total_categories'], 2)
+		self.assertEqual(sorted(c['type'] for c in data['categories'].values()), ['Art', 'Science'])
+		for category in data['categories'].values():
+			self.assertEqual(category['total_questions'], 0)
+			self.assertEqual(category['difficulty'], {})
+
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
 	unittest.main()
\ No newline at end of file
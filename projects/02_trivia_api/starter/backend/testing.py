@@ -0,0 +1,146 @@
+import os
+import re
+import unittest
+
+from sqlalchemy import event, orm, text
+
+from flaskr import create_app
+from models import db
+
+'''
+Transactional test fixtures for the trivia backend.
+
+The app, the schema and the seed data are built once per test process.
+Every test then runs inside a transaction on a dedicated connection with a
+SAVEPOINT around the test body: commits issued by the views only release
+and restart the savepoint, and tearDown rolls the whole transaction back,
+so each test sees the data exactly as trivia.psql defines it.
+
+TRIVIA_TEST_DATABASE_URL selects the backend, the default is an in-memory
+SQLite database seeded from trivia.psql. Each process (e.g. every
+pytest-xdist worker) gets its own in-memory database, so tests can run in
+parallel.
+'''
+
+TEST_DATABASE_URL = os.environ.get('TRIVIA_TEST_DATABASE_URL', 'sqlite://')
+SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trivia.psql')
+
+COPY_BLOCK = re.compile(
+	r'^COPY public\.(\w+) \(([^)]*)\) FROM stdin;\n(.*?)^\\\.$',
+	re.MULTILINE | re.DOTALL)
+
+_app = None
+
+
+def load_seed_rows(path=SEED_FILE):
+	'''
+	load_seed_rows(path)
+		reads the COPY blocks of a pg_dump file into
+		{table: [row dict, ...]}, in dump order
+	'''
+	with open(path, encoding='utf-8') as f:
+		dump = f.read()
+
+	tables = {}
+	for table, columns, body in COPY_BLOCK.findall(dump):
+		names = [name.strip() for name in columns.split(',')]
+		rows = []
+		for line in body.splitlines():
+			values = [None if value == '\\N' else value for value in line.split('\t')]
+			rows.append(dict(zip(names, values)))
+		tables[table] = rows
+	return tables
+
+
+def seed_database(connection):
+	if connection.execute(db.metadata.tables['questions'].select().limit(1)).first():
+		return
+
+	for table, rows in load_seed_rows().items():
+		table = db.metadata.tables[table]
+		for row in rows:
+			for name, value in row.items():
+				if value is not None and table.c[name].type.python_type is int:
+					row[name] = int(value)
+		connection.execute(table.insert(), rows)
+
+
+def _use_sqlite_savepoints(engine):
+	# pysqlite defers BEGIN until the first DML statement, which breaks
+	# SAVEPOINT; take over transaction control as the SQLAlchemy docs suggest
+	@event.listens_for(engine, 'connect')
+	def do_connect(dbapi_connection, connection_record):
+		dbapi_connection.isolation_level = None
+
+	@event.listens_for(engine, 'begin')
+	def do_begin(connection):
+		connection.execute(text('BEGIN'))
+
+	engine.dispose()
+
+
+def get_test_app():
+	'''
+	get_test_app()
+		creates the app once per process, builds the schema
+		(setup_db runs create_all) and seeds it
+	'''
+	global _app
+	if _app is None:
+		app = create_app({
+			'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+			'TESTING': True
+		})
+		with app.app_context():
+			if db.engine.dialect.name == 'sqlite':
+				_use_sqlite_savepoints(db.engine)
+				db.create_all()
+			with db.engine.begin() as connection:
+				seed_database(connection)
+		_app = app
+	return _app
+
+
+class TransactionalTestCase(unittest.TestCase):
+	'''
+	TransactionalTestCase
+		base class for API tests, exposes self.app and self.client and
+		rolls back everything a test wrote
+	'''
+
+	@classmethod
+	def setUpClass(cls):
+		cls.app = get_test_app()
+		cls.client = cls.app.test_client
+
+	def setUp(self):
+		self._ctx = self.app.app_context()
+		self._ctx.push()
+
+		self._connection = db.engine.connect()
+		self._transaction = self._connection.begin()
+
+		factory = db.create_session(
+			{'bind': self._connection, 'binds': {}, 'query_cls': db.Query})
+
+		@event.listens_for(factory, 'after_transaction_end')
+		def restart_savepoint(session, transaction):
+			if transaction.nested and not transaction._parent.nested:
+				session.expire_all()
+				session.begin_nested()
+
+		def make_session():
+			session = factory()
+			session.begin_nested()
+			return session
+
+		self._session = db.session
+		db.session = orm.scoped_session(
+			make_session, scopefunc=self._session.registry.scopefunc)
+
+	def tearDown(self):
+		db.session.remove()
+		db.session = self._session
+		self._transaction.rollback()
+		self._connection.close()
+		self._ctx.pop()
@@ -0,0 +1,243 @@
+'''
+Auth overhead benchmark for the protected drink endpoints.
+
+Runs entirely offline: signing keys come from a local RSA issuer whose JWKS
+is served over local HTTP (flask_toolkit/auth/local_idp.py) and drinks live in a
+temporary SQLite file (database.db is never touched). Each scenario sends
+the same token to
+
+    GET    /drinks-detail
+    POST   /drinks
+    PATCH  /drinks/<id>
+    DELETE /drinks/<id>
+
+through the Flask test client, with
+
+    valid           one token reused for every request (verified-token cache hits)
+    valid_uncached  the verified-token cache is cleared before every request
+    expired         exp in the past
+    wrong_audience  aud other than API_AUDIENCE
+    unknown_kid     signed with a kid the JWKS does not publish
+
+get_token_auth_header, verify_token and check_permissions are wrapped with
+timers, so every request is split into auth time (the whole requires_auth
+layer) and handler time (the rest of the request). inside verify_token the
+verifier's timing hooks report the cache lookup, header parsing, key lookup
+and signature/claims check separately.
+Reports p50/p95 in milliseconds per scenario and endpoint, plus p50 per
+auth stage, as JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.auth --requests 200
+'''
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask_toolkit.auth.local_idp import LocalIssuer, serve_jwks
+
+ALL_PERMISSIONS = ['get:drinks-detail', 'post:drinks', 'patch:drinks', 'delete:drinks']
+RECIPE = [{'name': 'espresso', 'color': '#6f4e37', 'parts': 1},
+          {'name': 'milk', 'color': '#f8f8f0', 'parts': 2}]
+STAGES = ('get_token_auth_header', 'verify_token', 'check_permissions')
+VERIFIER_STAGES = ('cache', 'header', 'key', 'decode')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return round(values[index] * 1000, 3)
+
+
+class StageTimer:
+    '''
+    wraps the auth functions that requires_auth looks up on the auth module,
+    hooks into the stages of the verifier, and accumulates the time spent
+    in each during the current request
+    '''
+
+    def __init__(self, module):
+        self.module = module
+        self.current = {}
+        self.originals = {}
+
+    def install(self):
+        for name in STAGES:
+            original = getattr(self.module, name)
+            self.originals[name] = original
+            setattr(self.module, name, self._timed(name, original))
+        self.module.verifier.add_hook(self._record)
+
+    def uninstall(self):
+        for name, original in self.originals.items():
+            setattr(self.module, name, original)
+        self.module.verifier.remove_hook(self._record)
+
+    def _record(self, stage, seconds):
+        self.current[stage] = self.current.get(stage, 0) + seconds
+
+    def _timed(self, name, f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self.current[name] = self.current.get(name, 0) + time.perf_counter() - start
+        return wrapper
+
+    @contextmanager
+    def request(self):
+        self.current = {}
+        yield self.current
+
+
+def scenario_tokens(issuer):
+    return {
+        'valid': issuer.issue(ALL_PERMISSIONS),
+        'valid_uncached': issuer.issue(ALL_PERMISSIONS),
+        'expired': issuer.issue(ALL_PERMISSIONS, expires_in=-60),
+        'wrong_audience': issuer.issue(ALL_PERMISSIONS, audience='not-the-api'),
+        'unknown_kid': issuer.issue(ALL_PERMISSIONS, kid='retired-key')
+    }
+
+
+_titles = iter(range(10 ** 9))
+
+
+def endpoint_requests(app, client, count, db, Drink):
+    '''
+    returns (endpoint, send) pairs; send(headers) issues one request.
+    PATCH and DELETE work on drinks created up front so that the handler
+    does the same work regardless of the scenario.
+    '''
+    with app.app_context():
+        targets = [Drink(title=f'target {next(_titles)}', recipe=RECIPE)
+                   for _ in range(count)]
+        db.session.add_all(targets)
+        db.session.commit()
+        target_ids = [drink.id for drink in targets]
+
+    def post(headers):
+        return client.post('/drinks', headers=headers,
+                           json={'title': f'bench {next(_titles)}', 'recipe': RECIPE})
+
+    def patch(headers):
+        return client.patch(f'/drinks/{target_ids[0]}', headers=headers,
+                            json={'title': f'patched {next(_titles)}'})
+
+    def delete(headers):
+        if not target_ids:
+            return None
+        return client.delete(f'/drinks/{target_ids.pop()}', headers=headers)
+
+    return [
+        ('GET /drinks-detail', lambda headers: client.get('/drinks-detail', headers=headers)),
+        ('POST /drinks', post),
+        ('PATCH /drinks/<id>', patch),
+        ('DELETE /drinks/<id>', delete)
+    ]
+
+
+def run_scenario(name, token, endpoints, timer, auth, count):
+    headers = {'Authorization': 'Bearer ' + token}
+    report = {}
+    for endpoint, send in endpoints:
+        totals, auth_times, handler_times, statuses = [], [], [], {}
+        stages = {stage: [] for stage in STAGES + VERIFIER_STAGES}
+        for _ in range(count):
+            if name == 'valid_uncached':
+                auth.verified_tokens.clear()
+            with timer.request() as spent:
+                start = time.perf_counter()
+                response = send(headers)
+                total = time.perf_counter() - start
+            if response is None:
+                break
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            # the verifier stages run inside verify_token, count them once
+            auth_time = sum(spent.get(stage, 0) for stage in
+                            ('get_token_auth_header', 'verify_token', 'check_permissions'))
+            totals.append(total)
+            auth_times.append(auth_time)
+            handler_times.append(max(total - auth_time, 0))
+            for stage in stages:
+                if stage in spent:
+                    stages[stage].append(spent[stage])
+
+        report[endpoint] = {
+            'requests': len(totals),
+            'status': statuses,
+            'total_p50_ms': percentile(totals, 50),
+            'total_p95_ms': percentile(totals, 95),
+            'auth_p50_ms': percentile(auth_times, 50),
+            'auth_p95_ms': percentile(auth_times, 95),
+            'handler_p50_ms': percentile(handler_times, 50),
+            'handler_p95_ms': percentile(handler_times, 95),
+            'stages_p50_ms': {stage: percentile(values, 50)
+                              for stage, values in stages.items() if values}
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per scenario and endpoint')
+    parser.add_argument('--scenarios', default='valid,valid_uncached,expired,wrong_audience,unknown_kid')
+    parser.add_argument('--jwks-delay', type=float, default=0.0,
+                        help='seconds the JWKS stand-in waits before answering')
+    args = parser.parse_args(argv)
+
+    from src.auth import auth
+    issuer = LocalIssuer('https://' + auth.AUTH0_DOMAIN + '/', auth.API_AUDIENCE)
+    server = serve_jwks(issuer, delay=args.jwks_delay)
+    auth.jwks.url = server.url
+    auth.jwks.clear()
+    auth.verified_tokens.clear()
+
+    from src.api import app
+    from src.database.models import db, Drink
+
+    tmpdir = tempfile.TemporaryDirectory()
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmpdir.name, 'bench.db')
+    tokens = scenario_tokens(issuer)
+    timer = StageTimer(auth)
+    timer.install()
+    report = {}
+    try:
+        with app.app_context():
+            db.create_all()
+        # requests must push their own app context so each gets a fresh session
+        client = app.test_client()
+        for name in args.scenarios.split(','):
+            endpoints = endpoint_requests(app, client, args.requests, db, Drink)
+            report[name] = run_scenario(name, tokens[name], endpoints, timer,
+                                        auth, args.requests)
+        with app.app_context():
+            db.engine.dispose()
+    finally:
+        timer.uninstall()
+        server.shutdown()
+        tmpdir.cleanup()
+
+    json.dump({
+        'requests': args.requests,
+        'jwks_delay_s': args.jwks_delay,
+        'jwks_fetches': server.fetches,
+        'token_cache': auth.verified_tokens.stats(),
+        'scenarios': report
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+'''
+Order ingestion benchmark.
+
+For each batch size a fresh SQLite file with the given profile (WAL by
+default, see SQLITE_PROFILES in src/database/models.py) is seeded with a
+menu, then client threads POST /orders as fast as the acknowledgments come
+back for the given duration. Every 201 means the order was committed. A
+batch size of 1 commits every order on its own, as a plain insert would.
+Requests go through the Flask test client, so no network is involved.
+Reports sustained orders/s, p50/p95 acknowledgment latency and the
+writer's batch statistics per batch size as JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.orders --clients 32 --batch-sizes 1,100 --duration 5
+'''
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from .sqlite_concurrency import percentile
+
+
+def run_batch_size(api, db, Drink, batch_size, path, args):
+    from src.orders import OrderWriter
+
+    app = api.app
+    app.config['SQLITE_PROFILE'] = args.profile
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Drink(title=f'drink {i}', recipe=[{'name': 'espresso', 'color': '#6f4e37', 'parts': 1}])
+                            for i in range(args.drinks)])
+        db.session.commit()
+
+    writer = OrderWriter(app, batch_size=batch_size, max_delay=args.max_delay)
+    api.order_writer = writer
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client(index):
+        test_client = app.test_client()
+        rng = random.Random(args.seed * 100 + index)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            items = [{'drink_id': rng.randint(1, args.drinks), 'quantity': rng.randint(1, 3)}
+                     for _ in range(rng.randint(1, 3))]
+            start = time.perf_counter()
+            response = test_client.post('/orders', json={'customer': f'client {index}', 'items': items})
+            if response.status_code == 201:
+                local.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    writer.close()
+
+    stats = writer.stats()
+    with app.app_context():
+        db.engine.dispose()
+    return {
+        'orders': len(latencies),
+        'errors': sum(errors),
+        'orders_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'batches': stats['batches'],
+        'mean_batch': stats['mean_batch']
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-sizes', default='1,100')
+    parser.add_argument('--profile', default='concurrent')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--drinks', type=int, default=50)
+    parser.add_argument('--max-delay', type=float, default=0.002, help='seconds')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per batch size')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from src import api
+    from src.database.models import db, Drink
+    # the writer created at import is never started, each run brings its own
+    api.order_writer.close()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for batch_size in [int(size) for size in args.batch_sizes.split(',')]:
+            path = os.path.join(tmpdir, f'batch-{batch_size}.db')
+            report[batch_size] = run_batch_size(api, db, Drink, batch_size, path, args)
+
+    json.dump({
+        'config': {
+            'profile': args.profile,
+            'clients': args.clients,
+            'drinks': args.drinks,
+            'max_delay_s': args.max_delay,
+            'duration_s': args.duration
+        },
+        'batch_sizes': report
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
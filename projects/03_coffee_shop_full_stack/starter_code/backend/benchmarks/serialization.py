@@ -0,0 +1,91 @@
+'''
+JSON serialization and compression benchmark for the drink listings.
+
+Builds a synthetic menu of Drink rows in memory (nothing is written to
+database.db), shapes it the way GET /drinks (short form) and
+GET /drinks-detail (long form) return it, and reports the time to encode
+each payload with the stdlib provider and with FastJSONProvider (orjson,
+when installed) plus the bytes on the wire uncompressed, gzipped and
+brotli-compressed (when brotli is installed).
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization --drinks 2000
+'''
+import argparse
+import json
+import random
+import sys
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from src.api import app
+from src.database.models import Drink
+from flask_toolkit.responses import FastJSONProvider, _compress, brotli, orjson
+
+INGREDIENTS = [('espresso', '#6f4e37'), ('milk', '#f8f8f0'), ('oat milk', '#e9dcc3'),
+               ('foam', '#fffdf5'), ('water', '#d4f1f9'), ('chocolate', '#7b3f00'),
+               ('caramel', '#c68e17'), ('vanilla syrup', '#f3e5ab')]
+
+
+def synthetic_drinks(count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        recipe = [{'name': name, 'color': color, 'parts': rng.randint(1, 4)}
+                  for name, color in rng.sample(INGREDIENTS, rng.randint(1, 4))]
+        yield Drink(id=i + 1, title=f'Drink {i + 1}', recipe=recipe)
+
+
+def time_dumps(provider, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        provider.dumps(payload)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return round(timings[len(timings) // 2] * 1000, 3)
+
+
+def measure(payload, repeat):
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    body = fast.dumps(payload).encode('utf-8')
+
+    result = {
+        'stdlib_ms': time_dumps(stdlib, payload, repeat),
+        'fast_ms': time_dumps(fast, payload, repeat),
+        'identity_bytes': len(body),
+        'gzip_bytes': len(_compress(body, 'gzip', app.config))
+    }
+    if brotli is not None:
+        result['br_bytes'] = len(_compress(body, 'br', app.config))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drinks', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    drinks = list(synthetic_drinks(args.drinks, args.seed))
+    payloads = {
+        'GET /drinks': {'success': True, 'drinks': [drink.short() for drink in drinks]},
+        'GET /drinks-detail': {'success': True, 'drinks': [drink.long() for drink in drinks]}
+    }
+    with app.app_context():
+        report = {name: measure(payload, args.repeat) for name, payload in payloads.items()}
+
+    json.dump({
+        'drinks': args.drinks,
+        'orjson': orjson is not None,
+        'brotli': brotli is not None,
+        'payloads': report
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+'''
+Concurrent read/write benchmark for the SQLite profiles.
+
+For each profile (see SQLITE_PROFILES in src/database/models.py) a fresh
+SQLite file is seeded with a menu, then reader threads call
+GET /drinks?ingredient=<name> (answered from the database, not from the
+menu snapshot) while writer threads, one per barista tablet, alternate
+POST /drinks and PATCH /drinks/<id> on drinks of their own. Requests go
+through the Flask test client with tokens from the local issuer, so no
+network is involved. Reports throughput, errors and p50/p95 latency of
+reads and writes per profile as JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 4 --duration 5
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from flask_toolkit.auth.local_idp import LocalIssuer, serve_jwks
+
+INGREDIENTS = [('espresso', '#6f4e37'), ('milk', '#f8f8f0'), ('oat milk', '#e9dcc3'),
+               ('foam', '#fffdf5'), ('water', '#d4f1f9'), ('chocolate', '#7b3f00')]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return round(values[index] * 1000, 3)
+
+
+def recipe(rng):
+    return [{'name': name, 'color': color, 'parts': rng.randint(1, 4)}
+            for name, color in rng.sample(INGREDIENTS, rng.randint(1, 3))]
+
+
+def summarize(samples, elapsed):
+    latencies = [latency for latency, ok in samples if ok]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95)
+    }
+
+
+def run_profile(app, db, Drink, profile, path, args, headers):
+    app.config['SQLITE_PROFILE'] = profile
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Drink(title=f'seed {i}', recipe=recipe(rng))
+                            for i in range(args.drinks)])
+        db.session.commit()
+
+    reads, writes = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def reader(index):
+        client = app.test_client()
+        rng = random.Random(args.seed * 100 + index)
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.get('/drinks', query_string={'ingredient': rng.choice(INGREDIENTS)[0]})
+            local.append((time.perf_counter() - start, response.status_code == 200))
+        with lock:
+            reads.extend(local)
+
+    def writer(index):
+        client = app.test_client()
+        rng = random.Random(args.seed * 1000 + index)
+        # every tablet edits its own drinks, so updates never conflict
+        owned = list(range(index + 1, args.drinks + 1, args.writers))
+        local = []
+        n = 0
+        while time.perf_counter() < deadline:
+            n += 1
+            start = time.perf_counter()
+            if n % 2:
+                response = client.post('/drinks', headers=headers, json={
+                    'title': f'{profile} tablet {index} drink {n}', 'recipe': recipe(rng)})
+            else:
+                response = client.patch(f'/drinks/{rng.choice(owned)}', headers=headers, json={
+                    'title': f'{profile} tablet {index} edit {n}', 'recipe': recipe(rng)})
+            local.append((time.perf_counter() - start, response.status_code == 200))
+        with lock:
+            writes.extend(local)
+
+    threads = ([threading.Thread(target=reader, args=(i,)) for i in range(args.readers)] +
+               [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)])
+    started = time.perf_counter()
+    # create_drink prints failed inserts, keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        db.engine.dispose()
+    return {'reads': summarize(reads, elapsed), 'writes': summarize(writes, elapsed)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='default,concurrent')
+    parser.add_argument('--drinks', type=int, default=200)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per profile')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from src.auth import auth
+    issuer = LocalIssuer('https://' + auth.AUTH0_DOMAIN + '/', auth.API_AUDIENCE)
+    server = serve_jwks(issuer)
+    auth.jwks.url = server.url
+    auth.jwks.clear()
+    headers = {'Authorization': 'Bearer ' + issuer.issue(['post:drinks', 'patch:drinks'])}
+
+    from src.api import app
+    from src.database.models import db, Drink
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in args.profiles.split(','):
+            path = os.path.join(tmpdir, f'{profile}.db')
+            report[profile] = run_profile(app, db, Drink, profile, path, args, headers)
+    server.shutdown()
+
+    json.dump({
+        'config': {
+            'drinks': args.drinks,
+            'readers': args.readers,
+            'writers': args.writers,
+            'duration_s': args.duration
+        },
+        'profiles': report
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,20 @@
+import atexit
 import os
-from flask import Flask, request, jsonify, abort
+from flask import request, jsonify, abort
 from sqlalchemy import exc
+from sqlalchemy.orm.exc import StaleDataError
 import json
-from flask_cors import CORS
+from flask_toolkit import create_app
+from flask_toolkit.conditional import conditional, ENCODING_SUFFIXES
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db_drop_and_create_all, setup_db, db, Drink, Ingredient, Order
 from .auth.auth import AuthError, requires_auth
+from .menu import short_menu, long_menu
+from .events import drink_events
+from .orders import OrderWriter, BufferFull
 
-app = Flask(__name__)
+app = create_app(__name__, {'COMPRESS': True})
 setup_db(app)
-CORS(app)
 
 '''
 @TODO uncomment the following line to initialize the database
@@ -18,50 +23,188 @@ CORS(app)
 '''
 #db_drop_and_create_all()
 
+DRINKS_PER_PAGE = 20
+MAX_DRINKS_PER_PAGE = 100
+# seconds between keep-alive comments on an idle event stream
+STREAM_HEARTBEAT = 15
+MAX_ORDER_ITEMS = 20
+MAX_ITEM_QUANTITY = 20
+ORDERS_PER_QUEUE_PAGE = 50
+MAX_ORDERS_PER_QUEUE_PAGE = 200
+# seconds POST /orders waits for its batch to be committed
+ORDER_ACK_TIMEOUT = float(os.environ.get('ORDER_ACK_TIMEOUT', 5))
+
+'''
+orders taken by POST /orders are buffered and committed in batches,
+see src/orders.py
+'''
+order_writer = OrderWriter(
+    app,
+    batch_size=int(os.environ.get('ORDER_BATCH_SIZE', 100)),
+    max_delay=float(os.environ.get('ORDER_BATCH_DELAY', 0.002)),
+    capacity=int(os.environ.get('ORDER_BUFFER_SIZE', 10000))
+)
+atexit.register(order_writer.close)
+
+'''
+menu_response(menu)
+    the whole menu snapshot, or one page of it when ?page= is given
+    (?per_page= defaults to DRINKS_PER_PAGE, at most MAX_DRINKS_PER_PAGE)
+'''
+def menu_response(menu):
+    if 'page' not in request.args:
+        response = menu.response()
+    else:
+        page = request.args.get('page', type=int)
+        per_page = request.args.get('per_page', DRINKS_PER_PAGE, type=int)
+        if page is None or page < 1 or per_page is None or not 1 <= per_page <= MAX_DRINKS_PER_PAGE:
+            abort(400, 'Invalid page or per_page')
+        response = menu.page_response(page, per_page)
+
+    if response is None:
+        abort(404, 'No drinks found')
+    return response
+
+'''
+valid_recipe(recipe)
+    the recipe as a list, a single ingredient may be sent without the list.
+    aborts with 422 unless it is a non-empty list of
+    {"name": string, "color": string, "parts": integer > 0}, the shape
+    Drink.short() and Drink.long() rely on
+'''
+def valid_recipe(recipe):
+    if isinstance(recipe, dict):
+        recipe = [recipe]
+    if not isinstance(recipe, list) or not recipe:
+        abort(422, 'Recipe must be a non-empty list of ingredients')
+    for entry in recipe:
+        if (not isinstance(entry, dict) or
+                not isinstance(entry.get('name'), str) or not entry['name'].strip() or
+                not isinstance(entry.get('color'), str) or
+                type(entry.get('parts')) is not int or entry['parts'] < 1):
+            abort(422, 'Every ingredient needs a name, a color and a positive number of parts')
+    return recipe
+
+'''
+drink_response(drink)
+    the long form of a single drink with its version as a strong ETag
+'''
+def drink_response(drink):
+    response = jsonify({
+        "success": True,
+        "drinks": [drink.long()]
+    })
+    response.set_etag(drink.etag)
+    return response
+
+'''
+if_match_fails(drink)
+    True when the request carries an If-Match that names another version
+    of the drink. compressed responses add an encoding suffix to the ETag,
+    those variants are accepted too.
+'''
+def if_match_fails(drink):
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return False
+    return not any(if_match.contains(drink.etag + suffix) for suffix in ENCODING_SUFFIXES)
+
 ## ROUTES
 '''
 GET /drinks
     public endpoint
     retrieves drinks with their short representation
+    GET /drinks?page=2&per_page=20 returns one page and adds "page", "per_page" and "total"
+    GET /drinks?ingredient=oat milk only returns the drinks using that ingredient
+        (case-insensitive, an empty list when none does)
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 
 '''
 @app.route('/drinks', methods=['GET'])
+@conditional(Drink.__tablename__, Ingredient.__tablename__)
 def retrieve_drinks():
-    drinks = Drink.query.all()
+    ingredient = request.args.get('ingredient', None)
+    if ingredient is not None:
+        if not ingredient.strip():
+            abort(400, 'Ingredient must not be empty')
+        return jsonify({
+            "success": True,
+            "drinks": Drink.menu('short', Drink.with_ingredient(ingredient))
+        })
 
-    if len(drinks) == 0:
-        abort(404, 'No drinks found')
+    return menu_response(short_menu)
 
-    drinks = list(map(lambda drink: drink.short(), drinks))
 
-    return jsonify({
-        "success": True,
-        "drinks": drinks
-    })
+'''
+GET /drinks/stream
+    public endpoint
+    Server-Sent Events feed of menu changes, made by POST, PATCH and DELETE /drinks:
+        event: insert / update    data: {"drink": <short form>}
+        event: delete             data: {"id": <id>}
+        event: reset              data: {}  events were missed, reload GET /drinks
+    a reconnecting client sends Last-Event-ID (browsers do it automatically)
+    and receives the events it missed, as long as they are still in the log
+    of this process; otherwise it gets a reset first
+'''
+@app.route('/drinks/stream', methods=['GET'])
+def stream_drinks():
+    last_event_id = request.headers.get('Last-Event-ID', None)
+    seq = drink_events.resume_from(last_event_id) if last_event_id else None
+    reset = last_event_id is not None and seq is None
+    if seq is None:
+        seq = drink_events.last_seq
+
+    def stream(seq):
+        yield 'retry: 3000\n\n'
+        if reset:
+            yield drink_events.reset_frame(seq)
+        while True:
+            frames, last_seq = drink_events.frames_after(seq, STREAM_HEARTBEAT)
+            if frames is None:
+                yield drink_events.reset_frame(last_seq)
+            elif frames:
+                yield ''.join(frames)
+            else:
+                yield ': keep-alive\n\n'
+            seq = last_seq
+
+    response = app.response_class(stream(seq), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 '''
     GET /drinks-detail
     requires the 'get:drinks-detail' permission
     retrieves drinks with their long representation (For Barista Role)
+    accepts the page and per_page parameters of GET /drinks
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
 @app.route('/drinks-detail', methods=['GET'])
 @requires_auth('get:drinks-detail')
+@conditional(Drink.__tablename__)
 def retrieve_drinks_with_detail(payload):
-    drinks = Drink.query.all()
+    return menu_response(long_menu)
 
-    if len(drinks) == 0:
-        abort(404, 'No drinks found')
-
-    drinks = list(map(lambda drink: drink.long(), drinks))
 
+'''
+    GET /ingredients
+    requires the 'get:drinks-detail' permission
+    inventory impact of the menu: for every ingredient the number of drinks using it
+    and the total parts across their recipes, ordered by name
+    returns status code 200 and json {"success": True, "ingredients": [{"name": name, "drinks": count, "parts": total}]}
+'''
+@app.route('/ingredients', methods=['GET'])
+@requires_auth('get:drinks-detail')
+@conditional(Ingredient.__tablename__)
+def retrieve_ingredient_usage(payload):
     return jsonify({
         "success": True,
-        "drinks": drinks
+        "ingredients": Ingredient.usage()
     })
 
 
@@ -84,21 +227,16 @@ def create_drink(payload):
     if not title or not recipe:
         abort(400, 'Title or recipe is missing')
 
-    if not isinstance(recipe, list):
-        recipe = [recipe]
+    recipe = valid_recipe(recipe)
 
+    new_drink = Drink(title=title, recipe=recipe)
     try:
-        new_drink = Drink(title=title, recipe=str(json.dumps(recipe)))
         new_drink.insert()
-    except Exception as e:
-        print(e)
+    except exc.IntegrityError:
+        db.session.rollback()
         abort(400, "New drink cannot be created due to violation on unique constraint: drink.title")
 
-    
-    return jsonify({
-        "success": True,
-        "drinks": [new_drink.long()]
-    })
+    return drink_response(new_drink)
 
 
 '''
@@ -108,6 +246,9 @@ def create_drink(payload):
         it should update the corresponding row for <id>
         it should require the 'patch:drinks' permission
         it should contain the drink.long() data representation
+        with If-Match: <ETag of the drink> the update only applies to that version of the drink,
+            it is made with a single UPDATE ... WHERE id = ? AND version = ? and the response
+            is 412 if the drink was changed since, without locking the row in between
     returns status code 200 and json {"success": True, "drinks": drink} where drink an array containing only the updated drink
         or appropriate status code indicating reason for failure
 '''
@@ -120,22 +261,50 @@ def update_drink(payload, id):
     if not updated_drink:
         abort(404, 'Drink with id: ' + str(id) + ' could not be found.')
 
+    if if_match_fails(updated_drink):
+        abort(412, 'Drink with id: ' + str(id) + ' was changed by another request.')
+
     body = request.get_json()
 
     title = body.get('title', None)
     recipe = body.get('recipe', None)
+    if recipe is not None:
+        recipe = valid_recipe(recipe)
 
-    if title:
-        updated_drink.title = title
-    if recipe:
-        updated_drink.recipe = recipe
+    try:
+        # assigning the recipe loads the ingredients, which can autoflush the title
+        if title:
+            updated_drink.title = title
+        if recipe:
+            updated_drink.recipe = recipe
+
+        updated_drink.update()
+    except StaleDataError:
+        db.session.rollback()
+        abort(412, 'Drink with id: ' + str(id) + ' was changed by another request.')
+    except exc.IntegrityError:
+        db.session.rollback()
+        abort(400, "Drink cannot be updated due to violation on unique constraint: drink.title")
+
+    return drink_response(updated_drink)
 
-    updated_drink.update()
+'''
+    GET /drinks/<id>
+        requires the 'get:drinks-detail' permission
+        the long form of one drink, with its version as ETag for If-Match
+    returns status code 200 and json {"success": True, "drinks": [drink]}
+        or 404 if <id> is not found
+'''
+@app.route('/drinks/<int:id>', methods=['GET'])
+@requires_auth('get:drinks-detail')
+def retrieve_drink(payload, id):
 
-    return jsonify({
-        "success": True,
-        "drinks": [updated_drink.long()]
-    })
+    drink = Drink.query.get(id)
+
+    if not drink:
+        abort(404, 'Drink with id: ' + str(id) + ' could not be found.')
+
+    return drink_response(drink)
 
 '''
     DELETE /drinks/<id>
@@ -143,6 +312,8 @@ def update_drink(payload, id):
         it should respond with a 404 error if <id> is not found
         it should delete the corresponding row for <id>
         it should require the 'delete:drinks' permission
+        with If-Match: <ETag of the drink> only that version of the drink is deleted, the
+            response is 412 if the drink was changed since
     returns status code 200 and json {"success": True, "delete": id} where id is the id of the deleted record
         or appropriate status code indicating reason for failure
 '''
@@ -155,44 +326,114 @@ def delete_drink(payload, id):
     if not deleted_drink:
         abort(404, 'Drink with id: ' + str(id) + ' could not be found.')
 
-    deleted_drink.delete()
+    if if_match_fails(deleted_drink):
+        abort(412, 'Drink with id: ' + str(id) + ' was changed by another request.')
+
+    try:
+        deleted_drink.delete()
+    except StaleDataError:
+        db.session.rollback()
+        abort(412, 'Drink with id: ' + str(id) + ' was changed by another request.')
 
     return jsonify({
         "success": True,
         "delete": id
     })
 
-def get_error_message(error, default_message):
-    try:
-        return error.description
-    except:
-        return default_message
+'''
+    POST /orders
+        public endpoint
+        takes an order: {"customer": "Ann", "items": [{"drink_id": 1, "quantity": 2}]}
+        customer is optional, quantity defaults to 1, every drink must be on the menu
+        the order is buffered and written with others in one transaction; the response
+        is only sent once that transaction is committed
+    returns status code 201 and json {"success": True, "order": order}
+        or 400 / 422 for an invalid order, 503 when the buffer is full or the order
+        could not be committed in time (it is then not placed, unless its batch was
+        already being committed and did not finish within another ORDER_ACK_TIMEOUT)
+'''
+@app.route('/orders', methods=['POST'])
+def create_order():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400, 'Order must be a JSON object')
+
+    customer = body.get('customer', None)
+    if customer is not None and (not isinstance(customer, str) or len(customer) > 80):
+        abort(400, 'Customer must be a string of at most 80 characters')
+
+    entries = body.get('items', None)
+    if not isinstance(entries, list) or not 1 <= len(entries) <= MAX_ORDER_ITEMS:
+        abort(400, 'An order needs between 1 and ' + str(MAX_ORDER_ITEMS) + ' items')
+
+    menu_ids = short_menu.get()['ids']
+    items = []
+    for entry in entries:
+        drink_id = entry.get('drink_id') if isinstance(entry, dict) else None
+        quantity = entry.get('quantity', 1) if isinstance(entry, dict) else None
+        if type(drink_id) is not int or type(quantity) is not int or not 1 <= quantity <= MAX_ITEM_QUANTITY:
+            abort(400, 'Every item needs a drink_id and a quantity between 1 and ' + str(MAX_ITEM_QUANTITY))
+        if drink_id not in menu_ids:
+            abort(422, 'Drink with id: ' + str(drink_id) + ' is not on the menu.')
+        items.append((drink_id, quantity))
+
+    # give the pooled connection back before waiting, the writer thread
+    # needs one to commit the batch this request waits for
+    db.session.remove()
 
-## Error Handling
+    try:
+        pending = order_writer.submit(customer, items)
+    except BufferFull:
+        abort(503, 'Too many orders, try again shortly.')
+
+    if not pending.wait(ORDER_ACK_TIMEOUT):
+        if order_writer.withdraw(pending):
+            abort(503, 'The order could not be placed in time, try again shortly.')
+        # its batch is being committed, the outcome follows shortly
+        if not pending.wait(ORDER_ACK_TIMEOUT):
+            app.logger.warning('order for %s was not confirmed within %ss', customer, 2 * ORDER_ACK_TIMEOUT)
+            abort(503, 'The order could not be confirmed in time, it may still be placed.')
+
+    if pending.error is not None:
+        app.logger.warning('order for %s could not be written: %r', customer, pending.error)
+        abort(503, 'The order could not be placed, try again shortly.')
 
-@app.errorhandler(422)
-def unprocessable(error):
     return jsonify({
-        "success": False, 
-        "error": 422,
-        "message": get_error_message(error, "unprocessable"),
-        }), 422
+        "success": True,
+        "order": pending.format()
+    }), 201
 
-@app.errorhandler(404)
-def not_found(error):
+'''
+    GET /orders/queue
+        requires the 'get:drinks-detail' permission
+        the barista queue: queued orders, oldest first, with their items and drink titles
+        GET /orders/queue?after=<id> continues after the last order of the previous page
+        ?limit= defaults to 50, at most 200
+    returns status code 200 and json {"success": True, "orders": orders, "next_after": id}
+        where next_after is the id of the last order returned, null when the queue is empty
+'''
+@app.route('/orders/queue', methods=['GET'])
+@requires_auth('get:drinks-detail')
+@conditional(Order.__tablename__, Drink.__tablename__)
+def retrieve_order_queue(payload):
+    after = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', ORDERS_PER_QUEUE_PAGE, type=int)
+    if after is None or after < 0 or limit is None or not 1 <= limit <= MAX_ORDERS_PER_QUEUE_PAGE:
+        abort(400, 'Invalid after or limit')
+
+    orders = Order.queue(after=after, limit=limit)
     return jsonify({
-        "success": False, 
-        "error": 404,
-        "message": get_error_message(error, "resource not found")
-        }), 404
+        "success": True,
+        "orders": [order.format() for order in orders],
+        "next_after": orders[-1].id if orders else None
+    })
 
-@app.errorhandler(400)
-def bad_request(error):
-    return jsonify({
-        "success": False, 
-        "error": 400,
-        "message": get_error_message(error, "bad request")
-        }), 400
+## Error Handling
+
+'''
+HTTP errors are answered as {"success": False, "error": code, "message": message}
+by flask_toolkit, with the description given to abort() as the message
+'''
 
 @app.errorhandler(AuthError)
 def auth_error(auth_error):
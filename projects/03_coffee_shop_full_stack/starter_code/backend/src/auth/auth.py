@@ -1,8 +1,8 @@
-import json
-from flask import request, _request_ctx_stack
+import os
 from functools import wraps
-from jose import jwt
-from urllib.request import urlopen
+
+from flask_toolkit.auth import (AuthError, TokenCache, Verifier, all_of, any_of, compile_permissions,
+                                get_token_auth_header, key_source, permissions_of)
 
 
 """
@@ -13,77 +13,60 @@ https://fsnd-kml.auth0.com/.well-known/jwks.json
 AUTH0_DOMAIN = 'fsnd-kml.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'Trial'
+# JWKS_URL may point at a local file:// or http:// stand-in, see
+# flask_toolkit/auth/local_idp.py, or be a PEM public key, see flask_toolkit.auth.key_source
+JWKS_URL = os.environ.get('JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+JWKS_TTL = int(os.environ.get('JWKS_TTL', 3600))
 
-## AuthError Exception
 '''
-AuthError Exception
-A standardized way to communicate auth failure modes
+signing keys of the IdP, fetched once and refreshed in the background
+instead of on every authenticated request
 '''
-class AuthError(Exception):
-    def __init__(self, error, status_code):
-        self.error = error
-        self.status_code = status_code
-
-
-## Auth Header
+jwks = key_source(JWKS_URL, ttl=JWKS_TTL)
 
 '''
-@TODO implement get_token_auth_header() method
-    it should attempt to get the header from the request
-        it should raise an AuthError if no header is present
-    it should attempt to split bearer and the token
-        it should raise an AuthError if the header is malformed
-    return the token part of the header
+payloads of tokens that already passed verify_decode_jwt, reused until
+the token expires. call verified_tokens.invalidate(token) or
+verified_tokens.invalidate_where(predicate) to revoke early.
 '''
-def get_token_auth_header():
-    auth = request.headers.get('Authorization', None)
-    if not auth:
-        raise AuthError({
-            'code': 'authorization_header_missing',
-            'description': 'Authorization header is expected.'
-        }, 401)
-
-    parts = auth.split()
-    if parts[0].lower() != 'bearer':
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization header must start with "Bearer".'
-        }, 401)
-
-    elif len(parts) == 1:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Token not found.'
-        }, 401)
+verified_tokens = TokenCache(maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)))
 
-    elif len(parts) > 2:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization header must be bearer token.'
-        }, 401)
+'''
+the verifier shared with BasicFlaskAuth, see flask_toolkit/auth/verifier.py. add timing hooks
+with verifier.add_hook(lambda stage, seconds: ...)
+'''
+verifier = Verifier(jwks, issuer='https://' + AUTH0_DOMAIN + '/', audience=API_AUDIENCE,
+                    algorithms=ALGORITHMS, cache=verified_tokens)
 
-    token = parts[1]
-    return token
+## AuthError Exception and Auth Header
+'''
+AuthError and get_token_auth_header() are defined in flask_toolkit.auth,
+shared with BasicFlaskAuth, and imported above
+'''
 
 '''
 @TODO implement check_permissions(permission, payload) method
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
+        permission: string permission (i.e. 'post:drink') or a compiled Requirement,
+            see permissions.all_of / any_of
         payload: decoded jwt payload
+        permissions: optional frozenset of the payload's permissions, as cached by verify_token
 
     it should raise an AuthError if permissions are not included in the payload
         !!NOTE check your RBAC settings in Auth0
     it should raise an AuthError if the requested permission string is not in the payload permissions array
     return true otherwise
 '''
-def check_permissions(permission, payload):
-    if 'permissions' not in payload:
+def check_permissions(permission, payload, permissions=None):
+    if permissions is None:
+        permissions = permissions_of(payload)
+    if permissions is None:
         raise AuthError({
             'code': 'invalid_claims',
             'description': 'Permissions not included in JWT.'
         }, 400)
 
-    if permission not in payload['permissions']:
+    if not compile_permissions(permission).satisfied_by(permissions):
         raise AuthError({
             'code': 'unauthorized',
             'description': 'Permission not found.'
@@ -104,65 +87,25 @@ def check_permissions(permission, payload):
     !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
 '''
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
-    if 'kid' not in unverified_header:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization malformed.'
-        }, 401)
-
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-    if rsa_key:
-        try:
-            payload = jwt.decode(
-                token,
-                rsa_key,
-                algorithms=ALGORITHMS,
-                audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
-            )
-
-            return payload
-
-        except jwt.ExpiredSignatureError:
-            raise AuthError({
-                'code': 'token_expired',
-                'description': 'Token expired.'
-            }, 401)
-
-        except jwt.JWTClaimsError:
-            raise AuthError({
-                'code': 'invalid_claims',
-                'description': 'Incorrect claims. Please, check the audience and issuer.'
-            }, 401)
-
-        except Exception:
-            raise AuthError({
-                'code': 'invalid_header',
-                'description': 'Unable to parse authentication token.'
-            }, 400)
-
-    raise AuthError({
-        'code': 'invalid_header',
-        'description': 'Unable to find the appropriate key.'
-    }, 400)
+    return verifier.decode(token)
+
+
+'''
+verify_token(token)
+    verify_decode_jwt() behind the verified-token cache: a token is only
+    verified again once it has expired or been evicted. returns a copy of
+    the payload, so views cannot alter the cached one, and the frozenset
+    of its permissions (None without a permissions claim).
+'''
+def verify_token(token):
+    return verifier.verify(token)
 
 
 '''
 @TODO implement @requires_auth(permission) decorator method
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
+        permission: string permission (i.e. 'post:drink'), or all_of()/any_of()
+            combinations of permissions, compiled once when the route is decorated
 
     it should use the get_token_auth_header method to get the token
     it should use the verify_decode_jwt method to decode the jwt
@@ -170,12 +113,14 @@ def verify_decode_jwt(token):
     return the decorator which passes the decoded payload to the decorated method
 '''
 def requires_auth(permission=''):
+    requirement = compile_permissions(permission)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
+            payload, permissions = verify_token(token)
+            check_permissions(requirement, payload, permissions)
             return f(payload, *args, **kwargs)
         return wrapper
     return requires_auth_decorator
\ No newline at end of file
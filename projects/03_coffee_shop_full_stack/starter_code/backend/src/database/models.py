@@ -1,23 +1,102 @@
+import logging
 import os
-from sqlalchemy import Column, String, Integer
-from flask_sqlalchemy import SQLAlchemy
+import uuid
+from sqlalchemy import Column, String, Integer, Float, JSON, ForeignKey, Index, event, func, inspect
+from sqlalchemy.orm import relationship, validates, selectinload
+from sqlalchemy.pool import QueuePool
+from flask_sqlalchemy import SQLAlchemy as _SQLAlchemy
+from flask_toolkit import init_db
+from flask_toolkit.versions import TableVersions
 import json
 
+from ..events import drink_events
+
+logger = logging.getLogger(__name__)
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
+'''
+SQLite profiles
+    applied to file-backed SQLite databases when their engine is created,
+    selected with the SQLITE_PROFILE config key (a name or a dict)
+    default: SQLite's own settings, rollback journal, one connection per checkout
+    concurrent: WAL so readers do not block behind a writer, synchronous=NORMAL
+        (durable across application crashes, only the last transactions can
+        be lost on power failure), writers wait up to busy_timeout ms for the
+        lock instead of failing, and a pool of reused connections
+'''
+SQLITE_PROFILES = {
+    'default': {},
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'pool_size': 8,
+        'max_overflow': 8
+    }
+}
+
+def sqlite_profile(config):
+    profile = config.get('SQLITE_PROFILE', 'concurrent')
+    if isinstance(profile, str):
+        profile = SQLITE_PROFILES[profile]
+    return profile
+
+def _apply_pragmas(profile):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if 'busy_timeout' in profile:
+            cursor.execute('PRAGMA busy_timeout = {:d}'.format(profile['busy_timeout']))
+        if 'journal_mode' in profile:
+            cursor.execute('PRAGMA journal_mode = {}'.format(profile['journal_mode']))
+        if 'synchronous' in profile:
+            cursor.execute('PRAGMA synchronous = {}'.format(profile['synchronous']))
+        cursor.close()
+    return on_connect
+
+'''
+SQLAlchemy
+    Flask-SQLAlchemy with the SQLite profile of the app applied to the
+    engines of file-backed SQLite databases (in-memory ones are left alone)
+'''
+class SQLAlchemy(_SQLAlchemy):
+    def apply_driver_hacks(self, app, sa_url, options):
+        if sa_url.drivername.startswith('sqlite') and sa_url.database not in (None, '', ':memory:'):
+            profile = sqlite_profile(app.config)
+            if profile.get('pool_size'):
+                options.setdefault('poolclass', QueuePool)
+                options.setdefault('pool_size', profile['pool_size'])
+                options.setdefault('max_overflow', profile.get('max_overflow', 0))
+                # pooled connections are handed to whichever thread checks them out
+                options.setdefault('connect_args', {}).setdefault('check_same_thread', False)
+            options['_sqlite_profile'] = profile
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        profile = engine_opts.pop('_sqlite_profile', None)
+        engine = super().create_engine(sa_url, engine_opts)
+        if profile:
+            event.listen(engine, 'connect', _apply_pragmas(profile))
+        return engine
+
 db = SQLAlchemy()
+# a version per table, bumped in the transaction of every committed write
+# and shared by every process, see flask_toolkit/versions.py
+table_versions = TableVersions(db)
 
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    SQLITE_PROFILE (default 'concurrent', env COFFEE_SQLITE_PROFILE) selects
+    one of SQLITE_PROFILES or is a dict of the same keys, the DB_* settings
+    of flask_toolkit tune the pool of any other database
 '''
 def setup_db(app):
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
-    db.init_app(app)
+    app.config.setdefault("SQLITE_PROFILE", os.environ.get("COFFEE_SQLITE_PROFILE", "concurrent"))
+    init_db(app, db, database_path)
+    table_versions.init_app(app)
 
 '''
 db_drop_and_create_all()
@@ -38,32 +117,118 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, stored as native JSON and parsed by the column type
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe =  Column(String(180), nullable=False)
+    recipe =  Column(JSON, nullable=False)
+    # replaced by SQLAlchemy on every INSERT and UPDATE of the row. random
+    # rather than counted: SQLite reuses the id of a deleted last row, and a
+    # counter would restart at 1, so (id, version) never names two contents
+    version = Column(String(32), nullable=False)
+
+    __mapper_args__ = {'version_id_col': version,
+                       'version_id_generator': lambda version: uuid.uuid4().hex}
+
+    # one row per recipe entry, rebuilt whenever recipe is assigned
+    ingredients = relationship('Ingredient', cascade='all, delete-orphan',
+                               order_by='Ingredient.position', back_populates='drink')
+
+    # id -> (version, {'short': ..., 'long': ...}), shared by all sessions
+    # and valid across processes, since versions are never reissued
+    _forms = {}
 
     '''
     short()
         short form representation of the Drink model
+        the returned dict is shared, callers must not modify it
     '''
     def short(self):
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
-        return {
-            'id': self.id,
-            'title': self.title,
-            'recipe': short_recipe
-        }
+        return self._serialized()['short']
 
     '''
     long()
         long form representation of the Drink model
+        the returned dict is shared, callers must not modify it
     '''
     def long(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'recipe': json.loads(self.recipe)
+        return self._serialized()['long']
+
+    '''
+    _serialized()
+        the short and long forms of this row version, built once per
+        version. pending or locally modified instances are not cached.
+    '''
+    def _serialized(self):
+        cached = Drink._forms.get(self.id)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+
+        forms = {
+            'short': {
+                'id': self.id,
+                'title': self.title,
+                'recipe': [{'color': r['color'], 'parts': r['parts']} for r in self.recipe]
+            },
+            'long': {
+                'id': self.id,
+                'title': self.title,
+                'recipe': self.recipe
+            }
         }
+        if self.id is not None and self.version is not None and not inspect(self).modified:
+            Drink._forms[self.id] = (self.version, forms)
+        return forms
+
+    '''
+    menu(form)
+        the short or long form of every drink, ordered by id. only the
+        (id, version) pairs are read for drinks whose current version is
+        already serialized; the rest are loaded in one query per chunk.
+    '''
+    @classmethod
+    def menu(cls, form, *criterion):
+        rows = db.session.query(cls.id, cls.version).filter(*criterion).order_by(cls.id).all()
+        stale = [id for id, version in rows
+                 if cls._forms.get(id, (None,))[0] != version]
+        for start in range(0, len(stale), 500):
+            for drink in cls.query.filter(cls.id.in_(stale[start:start + 500])):
+                drink._serialized()
+
+        menu = []
+        for id, version in rows:
+            cached = cls._forms.get(id)
+            if cached is not None:
+                menu.append(cached[1][form])
+        return menu
+
+    '''
+    etag
+        strong validator of this row version, sent as ETag with the long
+        form and expected back in If-Match by PATCH /drinks/<id>
+    '''
+    @property
+    def etag(self):
+        return '{}-{}'.format(self.id, self.version)
+
+    '''
+    with_ingredient(name)
+        criterion matching drinks whose recipe uses the ingredient,
+        answered from the ingredient index, e.g. Drink.menu('short', Drink.with_ingredient('milk'))
+    '''
+    @classmethod
+    def with_ingredient(cls, name):
+        return cls.id.in_(
+            db.session.query(Ingredient.drink_id).filter(Ingredient.name == Ingredient.normalize(name))
+        )
+
+    @validates('recipe')
+    def _sync_ingredients(self, key, recipe):
+        self.ingredients = [
+            Ingredient(position=position, name=Ingredient.normalize(entry['name']),
+                       parts=Ingredient.parts_of(entry))
+            for position, entry in enumerate(recipe or [])
+            if isinstance(entry, dict) and isinstance(entry.get('name'), str)
+        ]
+        return recipe
 
     '''
     insert()
@@ -77,11 +242,13 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        self._publish('insert', lambda: {'drink': self.short()})
 
     '''
     delete()
         deletes a new model into a database
         the model must exist in the database
+        the DELETE only matches the version that was loaded, like update()
         EXAMPLE
             drink = Drink(title=req_title, recipe=req_recipe)
             drink.delete()
@@ -89,11 +256,16 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        Drink._forms.pop(self.id, None)
+        self._publish('delete', lambda: {'id': self.id})
 
     '''
     update()
         updates a new model into a database
         the model must exist in the database
+        the UPDATE only matches the version that was loaded
+        (WHERE id = ? AND version = ?), if another transaction changed the
+        row in the meantime sqlalchemy.orm.exc.StaleDataError is raised
         EXAMPLE
             drink = Drink.query.filter(Drink.id == id).one_or_none()
             drink.title = 'Black Coffee'
@@ -101,6 +273,126 @@ class Drink(db.Model):
     '''
     def update(self):
         db.session.commit()
+        self._publish('update', lambda: {'drink': self.short()})
+
+    '''
+    _publish(event, data)
+        announces a committed change on the drink event stream. the change
+        is already in the database, so a failure to build or publish the
+        event is logged and never reaches the caller.
+    '''
+    def _publish(self, event, data):
+        try:
+            drink_events.publish(event, data())
+        except Exception:
+            logger.exception('could not publish the %s event of drink %s', event, self.id)
 
     def __repr__(self):
-        return json.dumps(self.short())
\ No newline at end of file
+        return json.dumps(self.short())
+
+
+'''
+Ingredient
+an entry of a drink's recipe, kept in sync with Drink.recipe so drinks can
+be searched and the menu aggregated by ingredient with indexed queries
+'''
+class Ingredient(db.Model):
+    id = Column(Integer, primary_key=True)
+    drink_id = Column(Integer, ForeignKey('drink.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    # lower-cased and stripped, see normalize()
+    name = Column(String(80), nullable=False)
+    parts = Column(Integer)
+
+    drink = relationship('Drink', back_populates='ingredients')
+
+    # covers both the lookup by name and the per-ingredient totals
+    __table_args__ = (Index('ix_ingredient_name_drink_parts', 'name', 'drink_id', 'parts'),)
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join(name.split()).lower()
+
+    @staticmethod
+    def parts_of(entry):
+        parts = entry.get('parts')
+        if isinstance(parts, bool) or not isinstance(parts, (int, float)):
+            return None
+        return parts
+
+    '''
+    usage()
+        inventory impact of the whole menu: for every ingredient, the number
+        of drinks using it and the total parts across their recipes
+    '''
+    @classmethod
+    def usage(cls):
+        rows = db.session.query(
+            cls.name,
+            func.count(func.distinct(cls.drink_id)),
+            func.coalesce(func.sum(cls.parts), 0)
+        ).group_by(cls.name).order_by(cls.name).all()
+        return [{'name': name, 'drinks': drinks, 'parts': parts}
+                for name, drinks, parts in rows]
+
+
+'''
+Order
+an order taken by POST /orders, written by the OrderWriter in batches.
+status is 'queued' until a barista picks it up.
+'''
+class Order(db.Model):
+    # ORDER is an SQL keyword
+    __tablename__ = 'orders'
+
+    id = Column(Integer, primary_key=True)
+    customer = Column(String(80))
+    status = Column(String(16), nullable=False, default='queued')
+    # unix time at which the order was accepted, before it was buffered
+    created_at = Column(Float, nullable=False)
+
+    items = relationship('OrderItem', cascade='all, delete-orphan',
+                         order_by='OrderItem.id', back_populates='order')
+
+    # the barista queue reads queued orders oldest first
+    __table_args__ = (Index('ix_orders_status_id', 'status', 'id'),)
+
+    def format(self):
+        return {
+            'id': self.id,
+            'customer': self.customer,
+            'status': self.status,
+            'created_at': self.created_at,
+            'items': [item.format() for item in self.items]
+        }
+
+    '''
+    queue(after=0, limit=50)
+        queued orders with an id greater than after, oldest first, with
+        their items and drink titles loaded in two more queries
+    '''
+    @classmethod
+    def queue(cls, after=0, limit=50):
+        return cls.query.options(
+            selectinload(cls.items).joinedload(OrderItem.drink).load_only('title')
+        ).filter(cls.status == 'queued', cls.id > after).order_by(cls.id).limit(limit).all()
+
+
+'''
+OrderItem
+a drink and its quantity in an order
+'''
+class OrderItem(db.Model):
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    drink_id = Column(Integer, ForeignKey('drink.id'), nullable=False)
+    quantity = Column(Integer, nullable=False, default=1)
+
+    order = relationship('Order', back_populates='items')
+    drink = relationship('Drink')
+
+    def format(self):
+        item = {'drink_id': self.drink_id, 'quantity': self.quantity}
+        if 'drink' in self.__dict__ and self.drink is not None:
+            item['title'] = self.drink.title
+        return item
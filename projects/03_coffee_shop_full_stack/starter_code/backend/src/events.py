@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+from collections import deque
+from itertools import islice
+
+
+'''
+EventLog(capacity=1000)
+    in-process pub/sub for Server-Sent Events. published events are encoded
+    into SSE frames once and appended to a bounded log; subscribers keep no
+    queue of their own, only the sequence number of the last frame they
+    sent, and all wait on one condition. an idle subscriber therefore costs
+    a blocked wait and publishing costs one append plus a wake-up.
+
+    event ids are "<log id>-<sequence>". the log id is random per process,
+    so ids from before a restart (or from another worker) are recognised as
+    unknown and the subscriber is told to reload instead of missing events.
+'''
+class EventLog:
+    def __init__(self, capacity=1000):
+        self.log_id = os.urandom(4).hex()
+        self.capacity = capacity
+        self._frames = deque(maxlen=capacity)
+        self._seq = 0
+        self._condition = threading.Condition()
+
+    def publish(self, event, data):
+        with self._condition:
+            self._seq += 1
+            frame = 'id: {}-{}\nevent: {}\ndata: {}\n\n'.format(
+                self.log_id, self._seq, event, json.dumps(data, separators=(',', ':')))
+            self._frames.append((self._seq, frame))
+            self._condition.notify_all()
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    '''
+    reset_frame(seq)
+        tells a subscriber that events were lost and it should reload the
+        full state; carries an id so a reconnect resumes from seq
+    '''
+    def reset_frame(self, seq):
+        return 'id: {}-{}\nevent: reset\ndata: {{}}\n\n'.format(self.log_id, seq)
+
+    '''
+    resume_from(last_event_id)
+        the sequence number to continue after, or None when the id is not
+        from this log or older than the frames it still holds
+    '''
+    def resume_from(self, last_event_id):
+        log_id, _, seq = (last_event_id or '').partition('-')
+        if log_id != self.log_id or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._condition:
+            oldest = self._frames[0][0] if self._frames else self._seq + 1
+            if seq > self._seq or seq < oldest - 1:
+                return None
+        return seq
+
+    '''
+    frames_after(seq, timeout)
+        the frames published after seq, waiting up to timeout seconds for
+        the first one. returns (frames, last seq); frames is None when the
+        subscriber fell so far behind that some were already dropped.
+    '''
+    def frames_after(self, seq, timeout):
+        with self._condition:
+            if self._seq <= seq:
+                self._condition.wait(timeout)
+            missed = self._seq - seq
+            if missed > len(self._frames):
+                return None, self._seq
+            # the newest frames are at the right end, take only those
+            frames = [frame for _, frame in islice(reversed(self._frames), missed)]
+            frames.reverse()
+            return frames, self._seq
+
+
+'''
+drink_events
+    insert, update and delete of drinks, published by Drink.insert(),
+    update() and delete() once the change is committed
+'''
+drink_events = EventLog()
@@ -0,0 +1,90 @@
+import threading
+
+from flask import current_app, json
+from flask_toolkit.versions import request_versions
+
+from .database.models import Drink
+
+
+'''
+menu snapshots
+    the short (public) and long (barista) menus are serialized once per
+    version of the drink table and served from memory until insert(),
+    update() or delete() commits a change. each snapshot keeps the list of
+    drinks, the encoded body of the full response and the encoded pages
+    requested so far. snapshots live in one process, but the drink table
+    version they are keyed on is read from the database, so a change
+    committed by any process replaces them. behind @conditional that
+    version was already read for the request, and a warm snapshot is then
+    served without any query.
+'''
+class MenuSnapshot:
+    def __init__(self, form):
+        self.form = form
+        self._current = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = request_versions([Drink.__tablename__])[Drink.__tablename__][0]
+        snapshot = self._current
+        if snapshot is None or snapshot['version'] != version:
+            with self._lock:
+                # another request may have rebuilt it while this one waited
+                snapshot = self._current
+                if snapshot is None or snapshot['version'] != version:
+                    snapshot = self._build(version)
+                    self._current = snapshot
+        return snapshot
+
+    def _build(self, version):
+        drinks = Drink.menu(self.form)
+        return {
+            'version': version,
+            'drinks': drinks,
+            'ids': frozenset(drink['id'] for drink in drinks),
+            'body': encode({'success': True, 'drinks': drinks}),
+            'pages': {}
+        }
+
+    '''
+    response()
+        the full menu, None when there are no drinks
+    page_response(page, per_page)
+        one page of the menu, None when the page is empty
+    '''
+    def response(self):
+        snapshot = self.get()
+        if not snapshot['drinks']:
+            return None
+        return _json_response(snapshot['body'])
+
+    def page_response(self, page, per_page):
+        snapshot = self.get()
+        key = (page, per_page)
+        body = snapshot['pages'].get(key)
+        if body is None:
+            start = (page - 1) * per_page
+            drinks = snapshot['drinks'][start:start + per_page]
+            if not drinks:
+                return None
+            body = encode({
+                'success': True,
+                'drinks': drinks,
+                'page': page,
+                'per_page': per_page,
+                'total': len(snapshot['drinks'])
+            })
+            snapshot['pages'][key] = body
+        return _json_response(body)
+
+
+def encode(payload):
+    return (json.dumps(payload) + '\n').encode('utf-8')
+
+
+def _json_response(body):
+    return current_app.response_class(body, mimetype='application/json')
+
+
+short_menu = MenuSnapshot('short')
+long_menu = MenuSnapshot('long')
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import deque
+
+from .database.models import db, Order, OrderItem
+
+
+'''
+BufferFull Exception
+raised by OrderWriter.submit() when the buffer holds capacity orders,
+or the writer was closed
+'''
+class BufferFull(Exception):
+    pass
+
+
+'''
+PendingOrder
+    an order accepted into the buffer. wait(timeout) blocks until the batch
+    holding it was committed (id is set) or could not be written (error
+    is set); it returns False if neither happened within timeout.
+'''
+class PendingOrder:
+    __slots__ = ('customer', 'items', 'created_at', 'id', 'error', '_done')
+
+    def __init__(self, customer, items):
+        self.customer = customer
+        # [(drink_id, quantity)]
+        self.items = items
+        self.created_at = time.time()
+        self.id = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _resolve(self, id=None, error=None):
+        self.id = id
+        self.error = error
+        self._done.set()
+
+    def format(self):
+        return {
+            'id': self.id,
+            'customer': self.customer,
+            'status': 'queued',
+            'created_at': self.created_at,
+            'items': [{'drink_id': drink_id, 'quantity': quantity}
+                      for drink_id, quantity in self.items]
+        }
+
+
+'''
+OrderWriter(app, batch_size=100, max_delay=0.002, capacity=10000)
+    takes orders into an in-process buffer and writes them from a single
+    background thread in batched transactions, one commit per batch
+    instead of one per order. a batch is flushed once it holds batch_size
+    orders, or max_delay seconds after its first order arrived, whichever
+    comes first; orders arriving while a batch commits make up the next one.
+
+    the writer only acknowledges durably: submit() returns a PendingOrder
+    and the request answers once its batch is committed. if a batch fails,
+    its orders are retried one transaction each, so one bad order does not
+    fail the others. at most capacity orders wait in the buffer, beyond
+    that submit() raises BufferFull.
+
+    the buffer lives in one process; orders that were not committed are
+    lost with it, but none of them was acknowledged. close() flushes
+    what is left, it is registered with atexit by the api.
+'''
+class OrderWriter:
+    def __init__(self, app, batch_size=100, max_delay=0.002, capacity=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.capacity = capacity
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.orders = 0
+        self.batches = 0
+        self.size_flushes = 0
+        self.failed = 0
+
+    def submit(self, customer, items):
+        pending = PendingOrder(customer, items)
+        with self._condition:
+            if self._closed:
+                raise BufferFull('order writer is closed')
+            if len(self._pending) >= self.capacity:
+                raise BufferFull('order buffer is full')
+            self._pending.append(pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='order-writer', daemon=True)
+                self._thread.start()
+            # wake the writer for the first order of a batch and once it is full
+            if len(self._pending) in (1, self.batch_size):
+                self._condition.notify()
+        return pending
+
+    '''
+    withdraw(pending)
+        removes an order that is still waiting in the buffer, returns False
+        once its batch is being written. lets a request that gave up
+        waiting tell the client for certain that the order was not placed.
+    '''
+    def withdraw(self, pending):
+        with self._condition:
+            try:
+                self._pending.remove(pending)
+            except ValueError:
+                return False
+        pending._resolve(error='withdrawn')
+        return True
+
+    def close(self, timeout=None):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'buffered': len(self._pending),
+                'orders': self.orders,
+                'batches': self.batches,
+                'size_flushes': self.size_flushes,
+                'failed': self.failed,
+                'mean_batch': round(self.orders / self.batches, 2) if self.batches else None
+            }
+
+    def _next_batch(self):
+        with self._condition:
+            while True:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return None
+                deadline = time.monotonic() + self.max_delay
+                while len(self._pending) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                # every order of the batch may have been withdrawn meanwhile
+                if self._pending:
+                    break
+            if len(self._pending) >= self.batch_size:
+                self.size_flushes += 1
+            return [self._pending.popleft()
+                    for _ in range(min(self.batch_size, len(self._pending)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            with self.app.app_context():
+                self._write(batch)
+
+    def _write(self, batch):
+        orders = []
+        try:
+            for pending in batch:
+                order = Order(customer=pending.customer, status='queued', created_at=pending.created_at)
+                order.items = [OrderItem(drink_id=drink_id, quantity=quantity)
+                               for drink_id, quantity in pending.items]
+                orders.append(order)
+            db.session.add_all(orders)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) > 1:
+                for pending in batch:
+                    self._write([pending])
+                return
+            with self._condition:
+                self.failed += 1
+            batch[0]._resolve(error=str(e))
+            return
+
+        with self._condition:
+            self.orders += len(batch)
+            self.batches += 1
+        for pending, order in zip(batch, orders):
+            pending._resolve(id=order.id)
@@ -0,0 +1,707 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from flask import Flask
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session
+
+import src.database.models as models
+from flask_toolkit.auth.local_idp import LocalIssuer
+
+# the app binds its database when src.api is imported, use a scratch file
+# instead of the committed database.db
+directory = tempfile.mkdtemp()
+models.database_path = 'sqlite:///' + os.path.join(directory, 'test.db')
+
+# tokens are signed by a local issuer, its keys are read from a JWKS file
+issuer = LocalIssuer('https://fsnd-kml.auth0.com/', 'Trial')
+os.environ['JWKS_URL'] = issuer.write_jwks(os.path.join(directory, 'jwks.json'))
+
+from src import api
+from src.database.models import db, db_drop_and_create_all, Drink, Ingredient, Order
+from src.events import EventLog, drink_events
+from src.orders import OrderWriter
+
+# every test brings its own writer
+api.order_writer.close()
+
+RECIPE = [{'name': 'espresso', 'color': '#6f4e37', 'parts': 1}]
+
+
+def tearDownModule():
+    with api.app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class CoffeeShopTestCase(unittest.TestCase):
+    """This class represents the coffee shop test case"""
+
+    def setUp(self):
+        self.app = api.app
+        self.client = self.app.test_client
+        with self.app.app_context():
+            db_drop_and_create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+
+    def auth(self, *permissions, **claims):
+        return {'Authorization': 'Bearer ' + issuer.issue(permissions, **claims)}
+
+    def add_drinks(self, *titles):
+        with self.app.app_context():
+            drinks = [Drink(title=title, recipe=RECIPE) for title in titles]
+            db.session.add_all(drinks)
+            db.session.commit()
+            return [drink.id for drink in drinks]
+
+
+class AuthTestCase(CoffeeShopTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_drinks('Latte')
+
+    def test_get_drinks_detail(self):
+        res = self.client().get('/drinks-detail', headers=self.auth('get:drinks-detail'))
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['recipe'], RECIPE)
+
+    def test_401_missing_header(self):
+        res = self.client().get('/drinks-detail')
+
+        self.assertEqual(res.status_code, 401)
+        self.assertFalse(res.get_json()['success'])
+
+    def test_401_blank_header(self):
+        res = self.client().get('/drinks-detail', headers={'Authorization': ' '})
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_401_expired_token(self):
+        res = self.client().get('/drinks-detail', headers=self.auth('get:drinks-detail', expires_in=-60))
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_400_unknown_kid(self):
+        res = self.client().get('/drinks-detail', headers=self.auth('get:drinks-detail', kid='unknown'))
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_403_permission_not_granted(self):
+        res = self.client().get('/drinks-detail', headers=self.auth('post:drinks'))
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(data['message'], 'Permission not found.')
+
+    def test_403_any_permission_is_not_every_permission(self):
+        res = self.client().delete('/drinks/1', headers=self.auth('get:drinks-detail', 'patch:drinks'))
+
+        self.assertEqual(res.status_code, 403)
+
+
+class DrinkRecipeTestCase(CoffeeShopTestCase):
+
+    def create(self, body):
+        return self.client().post('/drinks', json=body, headers=self.auth('post:drinks'))
+
+    def test_create_drink(self):
+        res = self.create({'title': 'Latte', 'recipe': RECIPE})
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['recipe'], RECIPE)
+        with self.app.app_context():
+            # stored as a native JSON list, not as encoded text
+            self.assertEqual(Drink.query.get(data['drinks'][0]['id']).recipe, RECIPE)
+
+    def test_single_ingredient_without_list(self):
+        res = self.create({'title': 'Espresso', 'recipe': RECIPE[0]})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks'][0]['recipe'], RECIPE)
+
+    def test_short_form_hides_ingredient_names(self):
+        self.create({'title': 'Latte', 'recipe': RECIPE})
+        res = self.client().get('/drinks')
+
+        self.assertEqual(res.get_json()['drinks'][0]['recipe'], [{'color': '#6f4e37', 'parts': 1}])
+
+    def test_422_invalid_recipes(self):
+        invalid = [
+            [],
+            'espresso',
+            [{'name': 'espresso', 'color': '#6f4e37'}],
+            [{'name': 'espresso', 'color': '#6f4e37', 'parts': 0}],
+            [{'name': 'espresso', 'color': '#6f4e37', 'parts': '1'}],
+            [{'name': 'espresso', 'color': '#6f4e37', 'parts': True}],
+            [{'name': ' ', 'color': '#6f4e37', 'parts': 1}],
+            [{'name': 'espresso', 'parts': 1}],
+            [RECIPE[0], 'milk']
+        ]
+        for recipe in invalid:
+            res = self.create({'title': 'Latte', 'recipe': recipe})
+            # an empty list counts as a missing recipe
+            self.assertEqual(res.status_code, 400 if recipe == [] else 422, recipe)
+            self.assertFalse(res.get_json()['success'])
+
+        with self.app.app_context():
+            self.assertEqual(Drink.query.count(), 0)
+
+    def test_422_patch_invalid_recipe(self):
+        drink_id = self.add_drinks('Latte')[0]
+        res = self.client().patch('/drinks/{}'.format(drink_id), json={'recipe': [{'name': 'milk'}]},
+                                  headers=self.auth('patch:drinks'))
+
+        self.assertEqual(res.status_code, 422)
+        with self.app.app_context():
+            self.assertEqual(Drink.query.get(drink_id).recipe, RECIPE)
+
+    def test_400_duplicate_title(self):
+        self.create({'title': 'Latte', 'recipe': RECIPE})
+        res = self.create({'title': 'Latte', 'recipe': RECIPE})
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(res.get_json()['success'])
+
+
+class IngredientIndexTestCase(CoffeeShopTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            db.session.add_all([
+                Drink(title='Latte', recipe=[{'name': 'Espresso', 'color': '#6f4e37', 'parts': 1},
+                                             {'name': 'Oat  Milk', 'color': '#f8f8f0', 'parts': 3}]),
+                Drink(title='Flat White', recipe=[{'name': 'espresso', 'color': '#6f4e37', 'parts': 2},
+                                                  {'name': 'milk', 'color': '#f8f8f0', 'parts': 1}])
+            ])
+            db.session.commit()
+
+    def titles(self, ingredient):
+        res = self.client().get('/drinks', query_string={'ingredient': ingredient})
+        self.assertEqual(res.status_code, 200)
+        return sorted(drink['title'] for drink in res.get_json()['drinks'])
+
+    def test_search_by_ingredient(self):
+        self.assertEqual(self.titles('espresso'), ['Flat White', 'Latte'])
+        self.assertEqual(self.titles(' OAT milk '), ['Latte'])
+        self.assertEqual(self.titles('cinnamon'), [])
+
+    def test_400_blank_ingredient(self):
+        res = self.client().get('/drinks?ingredient=%20')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_patch_rebuilds_ingredients(self):
+        with self.app.app_context():
+            latte_id = Drink.query.filter_by(title='Latte').one().id
+        res = self.client().patch('/drinks/{}'.format(latte_id), json={'recipe': RECIPE},
+                                  headers=self.auth('patch:drinks'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.titles('oat milk'), [])
+        with self.app.app_context():
+            self.assertEqual(Ingredient.query.filter_by(drink_id=latte_id).count(), 1)
+
+    def test_delete_removes_ingredients(self):
+        with self.app.app_context():
+            latte_id = Drink.query.filter_by(title='Latte').one().id
+        self.client().delete('/drinks/{}'.format(latte_id), headers=self.auth('delete:drinks'))
+
+        self.assertEqual(self.titles('oat milk'), [])
+        with self.app.app_context():
+            self.assertEqual(Ingredient.query.filter_by(drink_id=latte_id).count(), 0)
+
+    def test_ingredient_usage(self):
+        res = self.client().get('/ingredients', headers=self.auth('get:drinks-detail'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['ingredients'], [
+            {'name': 'espresso', 'drinks': 2, 'parts': 3},
+            {'name': 'milk', 'drinks': 1, 'parts': 1},
+            {'name': 'oat milk', 'drinks': 1, 'parts': 3}
+        ])
+
+    def test_search_uses_covering_index(self):
+        with self.app.app_context():
+            query = db.session.query(Ingredient.drink_id).filter(Ingredient.name == 'milk')
+            sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plan = ' '.join(str(row) for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)))
+
+        self.assertIn('COVERING INDEX ix_ingredient_name_drink_parts', plan)
+
+
+class SQLiteProfileTestCase(CoffeeShopTestCase):
+
+    def pragmas(self, engine):
+        with engine.connect() as connection:
+            return tuple(connection.exec_driver_sql('PRAGMA ' + name).scalar()
+                         for name in ('journal_mode', 'synchronous', 'busy_timeout'))
+
+    def test_concurrent_profile(self):
+        with self.app.app_context():
+            engine = db.engine
+            self.assertEqual(self.pragmas(engine), ('wal', 1, 5000))
+        self.assertIsInstance(engine.pool, QueuePool)
+        self.assertEqual(engine.pool.size(), 8)
+
+    def test_default_profile_and_memory_databases_are_left_alone(self):
+        for uri, profile in (('sqlite:///' + os.path.join(directory, 'default.db'), 'default'),
+                             ('sqlite://', 'concurrent')):
+            app = Flask(__name__)
+            app.config.update(SQLALCHEMY_DATABASE_URI=uri, SQLALCHEMY_TRACK_MODIFICATIONS=False,
+                              SQLITE_PROFILE=profile)
+            other = models.SQLAlchemy(app)
+            with app.app_context():
+                engine = other.engine
+                journal_mode, synchronous, _ = self.pragmas(engine)
+                engine.dispose()
+            self.assertNotIsInstance(engine.pool, QueuePool)
+            self.assertNotEqual(journal_mode, 'wal')
+            self.assertEqual(synchronous, 2)
+
+    def test_profile_as_dict(self):
+        profile = {'journal_mode': 'WAL', 'busy_timeout': 100}
+
+        self.assertIs(models.sqlite_profile({'SQLITE_PROFILE': profile}), profile)
+        self.assertIs(models.sqlite_profile({}), models.SQLITE_PROFILES['concurrent'])
+
+    def test_reads_do_not_wait_for_a_writer(self):
+        self.add_drinks('Latte')
+        # another process holds the write lock in an open transaction
+        writer = sqlite3.connect(os.path.join(directory, 'test.db'), isolation_level=None)
+        try:
+            writer.execute('BEGIN EXCLUSIVE')
+            writer.execute("INSERT INTO orders (status, created_at) VALUES ('queued', 0)")
+            start = time.monotonic()
+            res = self.client().get('/drinks')
+            elapsed = time.monotonic() - start
+            writer.execute('ROLLBACK')
+        finally:
+            writer.close()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertLess(elapsed, 1)
+
+
+class OptimisticConcurrencyTestCase(CoffeeShopTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.drink_id = self.add_drinks('Latte')[0]
+        self.url = '/drinks/{}'.format(self.drink_id)
+
+    def etag(self):
+        res = self.client().get(self.url, headers=self.auth('get:drinks-detail'))
+        self.assertEqual(res.status_code, 200)
+        return res.headers['ETag']
+
+    def patch(self, title, etag=None):
+        headers = self.auth('patch:drinks')
+        if etag is not None:
+            headers['If-Match'] = etag
+        return self.client().patch(self.url, json={'title': title}, headers=headers)
+
+    def delete(self, etag=None):
+        headers = self.auth('delete:drinks')
+        if etag is not None:
+            headers['If-Match'] = etag
+        return self.client().delete(self.url, headers=headers)
+
+    def change_from_another_process(self, title):
+        engine = create_engine(models.database_path)
+        try:
+            with Session(engine) as session:
+                session.get(Drink, self.drink_id).title = title
+                session.commit()
+        finally:
+            engine.dispose()
+
+    def test_patch_with_current_etag(self):
+        etag = self.etag()
+        res = self.patch('Mocha', etag)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks'][0]['title'], 'Mocha')
+        self.assertNotEqual(res.headers['ETag'], etag)
+        self.assertEqual(res.headers['ETag'], self.etag())
+
+    def test_patch_accepts_compressed_etag_and_star(self):
+        self.assertEqual(self.patch('Mocha', self.etag()[:-1] + '-gzip"').status_code, 200)
+        self.assertEqual(self.patch('Flat White', '*').status_code, 200)
+
+    def test_412_patch_with_stale_etag(self):
+        etag = self.etag()
+        self.change_from_another_process('Mocha')
+        res = self.patch('Cortado', etag)
+
+        self.assertEqual(res.status_code, 412)
+        self.assertFalse(res.get_json()['success'])
+        with self.app.app_context():
+            self.assertEqual(Drink.query.get(self.drink_id).title, 'Mocha')
+
+    def racing_another_write(self, request):
+        # the drink changes between the read and the write of the request
+        original = Drink.query_class.get
+
+        def get_then_change(query, ident):
+            drink = original(query, ident)
+            self.change_from_another_process('Mocha')
+            return drink
+
+        Drink.query_class.get = get_then_change
+        try:
+            return request()
+        finally:
+            Drink.query_class.get = original
+
+    def test_412_patch_racing_another_write(self):
+        res = self.racing_another_write(lambda: self.patch('Cortado'))
+
+        self.assertEqual(res.status_code, 412)
+        with self.app.app_context():
+            self.assertEqual(Drink.query.get(self.drink_id).title, 'Mocha')
+
+    def test_delete_with_current_etag(self):
+        res = self.delete(self.etag())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['delete'], self.drink_id)
+
+    def test_412_delete_racing_another_write(self):
+        res = self.racing_another_write(lambda: self.delete())
+
+        self.assertEqual(res.status_code, 412)
+        with self.app.app_context():
+            self.assertIsNotNone(Drink.query.get(self.drink_id))
+
+    def test_412_delete_with_stale_etag(self):
+        etag = self.etag()
+        self.change_from_another_process('Mocha')
+        res = self.delete(etag)
+
+        self.assertEqual(res.status_code, 412)
+        with self.app.app_context():
+            self.assertIsNotNone(Drink.query.get(self.drink_id))
+
+
+class EventLogTestCase(unittest.TestCase):
+
+    def test_subscriber_wakes_on_publish(self):
+        log = EventLog()
+        received = []
+        subscriber = threading.Thread(target=lambda: received.append(log.frames_after(0, 5)))
+        subscriber.start()
+        time.sleep(0.05)
+        log.publish('insert', {'drink': {'id': 1}})
+        subscriber.join(5)
+
+        frames, last_seq = received[0]
+        self.assertEqual(last_seq, 1)
+        self.assertEqual(frames, ['id: {}-1\nevent: insert\ndata: {{"drink":{{"id":1}}}}\n\n'.format(log.log_id)])
+
+    def test_idle_subscriber_times_out_empty(self):
+        self.assertEqual(EventLog().frames_after(0, 0.01), ([], 0))
+
+    def test_resume_from(self):
+        log = EventLog(capacity=2)
+        for id in range(4):
+            log.publish('delete', {'id': id})
+
+        self.assertEqual(log.resume_from(log.log_id + '-3'), 3)
+        self.assertEqual(log.resume_from(log.log_id + '-4'), 4)
+        # dropped out of the log, from the future, from another process, malformed
+        self.assertIsNone(log.resume_from(log.log_id + '-1'))
+        self.assertIsNone(log.resume_from(log.log_id + '-5'))
+        self.assertIsNone(log.resume_from('0badc0de-3'))
+        self.assertIsNone(log.resume_from(log.log_id + '-x'))
+
+    def test_subscriber_behind_the_log_gets_none(self):
+        log = EventLog(capacity=2)
+        for id in range(3):
+            log.publish('delete', {'id': id})
+
+        self.assertEqual(log.frames_after(0, 0), (None, 3))
+        self.assertEqual(len(log.frames_after(1, 0)[0]), 2)
+
+
+class DrinkStreamTestCase(CoffeeShopTestCase):
+
+    def read(self, last_event_id=None, count=2):
+        headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+        res = self.client().get('/drinks/stream', headers=headers, buffered=False)
+        try:
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.mimetype, 'text/event-stream')
+            chunks = iter(res.response)
+            return [next(chunks).decode('utf-8') for _ in range(count)]
+        finally:
+            res.close()
+
+    def test_reconnect_receives_missed_events(self):
+        last_event_id = '{}-{}'.format(drink_events.log_id, drink_events.last_seq)
+        res = self.client().post('/drinks', json={'title': 'Latte', 'recipe': RECIPE},
+                                 headers=self.auth('post:drinks'))
+        drink_id = res.get_json()['drinks'][0]['id']
+
+        retry, frames = self.read(last_event_id)
+        self.assertEqual(retry, 'retry: 3000\n\n')
+        self.assertIn('event: insert\n', frames)
+        self.assertIn('"id":{}'.format(drink_id), frames)
+
+    def test_reconnect_with_dropped_id_gets_reset(self):
+        last_event_id = '{}-{}'.format(drink_events.log_id, drink_events.last_seq)
+        for id in range(drink_events.capacity + 1):
+            drink_events.publish('delete', {'id': id})
+
+        retry, reset = self.read(last_event_id)
+        self.assertEqual(reset, 'id: {}-{}\nevent: reset\ndata: {{}}\n\n'.format(
+            drink_events.log_id, drink_events.last_seq))
+
+    def test_reconnect_with_id_of_another_process_gets_reset(self):
+        retry, reset = self.read('0badc0de-1')
+
+        self.assertIn('event: reset\n', reset)
+
+    def test_delete_is_published(self):
+        drink_id = self.add_drinks('Latte')[0]
+        last_event_id = '{}-{}'.format(drink_events.log_id, drink_events.last_seq)
+        self.client().delete('/drinks/{}'.format(drink_id), headers=self.auth('delete:drinks'))
+
+        retry, frames = self.read(last_event_id)
+        self.assertIn('event: delete\ndata: {{"id":{}}}\n'.format(drink_id), frames)
+
+
+class DrinkFormsTestCase(CoffeeShopTestCase):
+
+    def test_replaced_drink_is_not_served_from_cache(self):
+        drink_id = self.add_drinks('Latte')[0]
+        res = self.client().get('/drinks')
+        self.assertEqual([drink['title'] for drink in res.get_json()['drinks']], ['Latte'])
+
+        # another process deletes the drink and adds one, SQLite reuses the id
+        engine = create_engine(models.database_path)
+        try:
+            with Session(engine) as session:
+                session.delete(session.get(Drink, drink_id))
+                session.commit()
+                mocha = Drink(title='Mocha', recipe=RECIPE)
+                session.add(mocha)
+                session.commit()
+                self.assertEqual(mocha.id, drink_id)
+        finally:
+            engine.dispose()
+
+        res = self.client().get('/drinks')
+        self.assertEqual([drink['title'] for drink in res.get_json()['drinks']], ['Mocha'])
+
+
+class MenuSnapshotTestCase(CoffeeShopTestCase):
+
+    def titles(self, res):
+        return [drink['title'] for drink in res.get_json()['drinks']]
+
+    def test_warm_menu_only_reads_the_drink_version(self):
+        self.add_drinks('Latte', 'Mocha')
+        self.client().get('/drinks')
+        statements = []
+        with self.app.app_context():
+            engine = db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            res = self.client().get('/drinks')
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+        self.assertEqual(self.titles(res), ['Latte', 'Mocha'])
+        # the versions read by @conditional, the snapshot does not read them again
+        self.assertEqual(len(statements), 1)
+        self.assertIn('table_versions', statements[0])
+
+    def test_commit_replaces_snapshot(self):
+        self.add_drinks('Latte')
+        self.assertEqual(self.titles(self.client().get('/drinks')), ['Latte'])
+        self.add_drinks('Mocha')
+
+        self.assertEqual(self.titles(self.client().get('/drinks')), ['Latte', 'Mocha'])
+
+    def test_menu_pages(self):
+        self.add_drinks('Latte', 'Mocha', 'Flat White')
+        res = self.client().get('/drinks?page=2&per_page=2')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.titles(res), ['Flat White'])
+        self.assertEqual((data['page'], data['per_page'], data['total']), (2, 2, 3))
+        self.assertEqual(self.client().get('/drinks?page=3&per_page=2').status_code, 404)
+        self.assertEqual(self.client().get('/drinks?page=0').status_code, 400)
+
+    def test_404_empty_menu(self):
+        res = self.client().get('/drinks')
+
+        self.assertEqual(res.status_code, 404)
+        self.assertFalse(res.get_json()['success'])
+
+
+'''
+BlockedWriter
+    an OrderWriter whose batches wait for release before they are written,
+    so a test can act while a batch is being committed
+'''
+class BlockedWriter(OrderWriter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def _write(self, batch):
+        self.writing.set()
+        self.release.wait(5)
+        super()._write(batch)
+
+
+class OrderWriterTestCase(CoffeeShopTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.drink_id = self.add_drinks('Latte')[0]
+
+    def count_orders(self):
+        with self.app.app_context():
+            return Order.query.count()
+
+    def test_full_batch_is_committed_at_once(self):
+        writer = OrderWriter(self.app, batch_size=10, max_delay=5)
+        pending = [writer.submit('client {}'.format(i), [(self.drink_id, 1)]) for i in range(10)]
+        for order in pending:
+            self.assertTrue(order.wait(5))
+        writer.close(5)
+
+        self.assertTrue(all(order.id is not None and order.error is None for order in pending))
+        stats = writer.stats()
+        self.assertEqual(stats['batches'], 1)
+        self.assertEqual(stats['size_flushes'], 1)
+        self.assertEqual(stats['orders'], 10)
+        self.assertEqual(self.count_orders(), 10)
+
+    def test_withdraw_buffered_order(self):
+        writer = OrderWriter(self.app, batch_size=10, max_delay=5)
+        pending = writer.submit('Ann', [(self.drink_id, 1)])
+
+        self.assertTrue(writer.withdraw(pending))
+        self.assertEqual(pending.error, 'withdrawn')
+        writer.close(5)
+
+        self.assertEqual(writer.stats()['batches'], 0)
+        self.assertEqual(self.count_orders(), 0)
+
+    def test_withdraw_fails_once_batch_is_written(self):
+        writer = BlockedWriter(self.app, batch_size=1)
+        pending = writer.submit('Ann', [(self.drink_id, 1)])
+        self.assertTrue(writer.writing.wait(5))
+
+        self.assertFalse(writer.withdraw(pending))
+        writer.release.set()
+        self.assertTrue(pending.wait(5))
+        writer.close(5)
+
+        self.assertIsNotNone(pending.id)
+        self.assertEqual(self.count_orders(), 1)
+
+    def test_failed_batch_is_retried_order_by_order(self):
+        writer = BlockedWriter(self.app, batch_size=3)
+        # a NULL drink_id violates a NOT NULL constraint and fails the batch
+        pending = [writer.submit('Ann', [(self.drink_id, 1)]),
+                   writer.submit('Bob', [(None, 1)]),
+                   writer.submit('Cid', [(self.drink_id, 2)])]
+        writer.release.set()
+        for order in pending:
+            self.assertTrue(order.wait(5))
+        writer.close(5)
+
+        self.assertIsNotNone(pending[0].id)
+        self.assertIsNone(pending[1].id)
+        self.assertIsNotNone(pending[1].error)
+        self.assertIsNotNone(pending[2].id)
+        stats = writer.stats()
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['orders'], 2)
+        self.assertEqual(self.count_orders(), 2)
+
+
+class OrdersApiTestCase(CoffeeShopTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.drink_id = self.add_drinks('Latte')[0]
+
+    def tearDown(self):
+        api.order_writer.close(5)
+        super().tearDown()
+
+    def test_create_order(self):
+        api.order_writer = OrderWriter(self.app)
+        res = self.client().post('/orders', json={'customer': 'Ann', 'items': [{'drink_id': self.drink_id}]})
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(data['success'])
+        self.assertIsNotNone(data['order']['id'])
+        self.assertEqual(data['order']['items'], [{'drink_id': self.drink_id, 'quantity': 1}])
+
+    def test_422_drink_not_on_menu(self):
+        api.order_writer = OrderWriter(self.app)
+        res = self.client().post('/orders', json={'items': [{'drink_id': self.drink_id + 1}]})
+
+        self.assertEqual(res.status_code, 422)
+        self.assertFalse(res.get_json()['success'])
+
+    def test_503_buffer_full(self):
+        api.order_writer = OrderWriter(self.app, max_delay=5, capacity=1)
+        api.order_writer.submit('Ann', [(self.drink_id, 1)])
+        res = self.client().post('/orders', json={'items': [{'drink_id': self.drink_id}]})
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(data['message'], 'Too many orders, try again shortly.')
+
+    def test_more_waiting_orders_than_pooled_connections(self):
+        # every waiting request used to hold a pooled connection, starving the writer
+        api.order_writer = OrderWriter(self.app, batch_size=100, max_delay=0.05)
+        pool = models.SQLITE_PROFILES['concurrent']
+        clients = pool['pool_size'] + pool['max_overflow'] + 8
+        statuses = []
+        barrier = threading.Barrier(clients)
+
+        def order():
+            client = self.client()
+            barrier.wait()
+            res = client.post('/orders', json={'items': [{'drink_id': self.drink_id}]})
+            statuses.append(res.status_code)
+
+        threads = [threading.Thread(target=order) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+
+        self.assertEqual(statuses, [201] * clients)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -1,27 +1,182 @@
 import os
-from flask import Flask
-from models import setup_db
+import base64
+import binascii
+import json
+from flask import Response, abort, jsonify, request, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
+from models import setup_db, warm_pool, db, Person, format_row
+from flask_toolkit import create_app as create_toolkit_app
+
+PEOPLE_PER_PAGE = 50
+MAX_PEOPLE_PER_PAGE = 500
+MAX_SEARCH_LENGTH = 80
+MAX_BATCH_SIZE = 1000
+# rows read per query while exporting
+EXPORT_CHUNK_SIZE = 1000
+
+'''
+cursors
+    ?cursor= is the opaque form of the sort key of the last row returned:
+    [id] when listing, [lower(name), id] when searching
+'''
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, types):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        abort(400, 'Invalid cursor')
+    if (not isinstance(values, list) or len(values) != len(types) or
+            not all(type(value) is kind for value, kind in zip(values, types))):
+        abort(400, 'Invalid cursor')
+    return values
 
 def create_app(test_config=None):
 
-    app = Flask(__name__)
+    # environment-derived settings are read once, when the app is created
+    config = {"EXCITED": os.environ.get('EXCITED') == 'true'}
+    config.update(test_config or {})
+    app = create_toolkit_app(__name__, config)
     setup_db(app)
-    CORS(app)
+
+    greeting = "Hello"
+    if app.config["EXCITED"]: greeting = greeting + "!!!!!"
+    ready = {'warmed': False}
 
     @app.route('/')
     def get_greeting():
-        excited = os.environ['EXCITED']
-        greeting = "Hello" 
-        if excited == 'true': greeting = greeting + "!!!!!"
         return greeting
 
     @app.route('/coolkids')
     def be_cool():
         return "Be cool, man, be coooool! You're almost a FSND grad!"
 
+    '''
+    health checks are never answered from the response cache
+    '''
+    def health(status, status_code=200):
+        response = jsonify({'status': status})
+        response.status_code = status_code
+        response.cache_control.no_store = True
+        return response
+
+    '''
+    GET /healthz
+        liveness: the process serves requests, the database is not touched
+    '''
+    @app.route('/healthz')
+    def healthz():
+        return health('ok')
+
+    '''
+    GET /readyz
+        readiness: the first call opens and checks every pooled connection,
+        later calls check one. 503 while the database is unreachable.
+    '''
+    @app.route('/readyz')
+    def readyz():
+        try:
+            warm_pool(1 if ready['warmed'] else None)
+        except SQLAlchemyError:
+            return health('unavailable', 503)
+        ready['warmed'] = True
+        return health('ready')
+
+    '''
+    GET /people
+        people by id, PEOPLE_PER_PAGE at a time (?limit=, at most MAX_PEOPLE_PER_PAGE)
+        ?q=<prefix> only returns people whose name starts with prefix, ignoring case,
+            ordered by name
+        pass the returned next_cursor as ?cursor= to read the next page; each page is
+            one indexed range scan however deep it is
+    returns status code 200 and json {"success": True, "people": people, "next_cursor": cursor}
+        where next_cursor is null on the last page
+    '''
+    @app.route('/people')
+    def get_people():
+        limit = request.args.get('limit', PEOPLE_PER_PAGE, type=int)
+        if limit is None or not 1 <= limit <= MAX_PEOPLE_PER_PAGE:
+            abort(400, 'limit must be between 1 and ' + str(MAX_PEOPLE_PER_PAGE))
+        cursor = request.args.get('cursor')
+        q = request.args.get('q')
+
+        if q is None:
+            after = decode_cursor(cursor, (int,))[0] if cursor else 0
+            rows = Person.page(after, limit + 1)
+            last_key = lambda row: [row.id]
+        else:
+            q = q.strip()
+            if not q or len(q) > MAX_SEARCH_LENGTH:
+                abort(400, 'q must have between 1 and ' + str(MAX_SEARCH_LENGTH) + ' characters')
+            after = decode_cursor(cursor, (str, int)) if cursor else None
+            rows = Person.search(q, after, limit + 1)
+            last_key = lambda row: [row.name_key, row.id]
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return jsonify({
+            'success': True,
+            'people': [format_row(row) for row in rows],
+            'next_cursor': encode_cursor(last_key(rows[-1])) if more else None
+        })
+
+    '''
+    POST /people/batch
+        creates up to MAX_BATCH_SIZE people in one transaction:
+        {"people": [{"name": "Ann", "catchphrase": "..."}, ...]}
+        either all of them are created or none is
+    returns status code 201 and json {"success": True, "created": count}
+    '''
+    @app.route('/people/batch', methods=['POST'])
+    def create_people():
+        body = request.get_json(silent=True)
+        people = body.get('people') if isinstance(body, dict) else None
+        if not isinstance(people, list) or not 1 <= len(people) <= MAX_BATCH_SIZE:
+            abort(400, 'people must be a list of 1 to ' + str(MAX_BATCH_SIZE) + ' people')
+
+        rows = []
+        for person in people:
+            name = person.get('name') if isinstance(person, dict) else None
+            catchphrase = person.get('catchphrase', '') if isinstance(person, dict) else None
+            if not isinstance(name, str) or not name.strip() or not isinstance(catchphrase, str):
+                abort(400, 'every person needs a name, and a catchphrase must be a string')
+            rows.append({'name': name, 'catchphrase': catchphrase})
+
+        try:
+            # one executemany instead of an INSERT per Person object
+            db.session.execute(Person.__table__.insert(), rows)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(422, 'people could not be created')
+
+        return jsonify({'success': True, 'created': len(rows)}), 201
+
+    '''
+    GET /people/export
+        every person as newline-delimited JSON, one object per line, by id.
+        rows are read EXPORT_CHUNK_SIZE at a time and streamed as they are
+        encoded, so memory stays flat and no transaction is held open
+        between chunks.
+    '''
+    @app.route('/people/export')
+    def export_people():
+        def generate():
+            after = 0
+            while True:
+                rows = Person.page(after, EXPORT_CHUNK_SIZE)
+                db.session.close()
+                if not rows:
+                    return
+                yield ''.join(json.dumps(format_row(row)) + '\n' for row in rows)
+                after = rows[-1].id
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
     return app
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+    app.run()
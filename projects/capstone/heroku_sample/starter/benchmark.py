@@ -0,0 +1,92 @@
+'''
+Cold-start benchmark for dyno-style restarts.
+
+Every boot is a new Python process, as after a dyno restart. Each process
+imports app.py, which creates the app and runs the SCHEMA_MODE step. It
+then sends GET /readyz, which warms the connection pool, and GET /
+through the Flask test client. For each SCHEMA_MODE the boots run against
+a database that is already at the migration head. 'migrations' is also
+measured on an empty database, where the first boot runs the upgrade.
+Reports the median and max wall time of a whole boot, plus the median time
+to create the app and to answer the first /readyz, in milliseconds as JSON.
+
+DATABASE_URL defaults to a temporary SQLite file. Point it at Postgres to
+include real connection setup in /readyz.
+
+Usage (from this directory):
+    python benchmark.py --boots 10
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = '''
+import json, time
+started = time.perf_counter()
+from app import app
+created = time.perf_counter()
+client = app.test_client()
+assert client.get('/readyz').status_code == 200
+ready = time.perf_counter()
+assert client.get('/').status_code == 200
+print(json.dumps({'create_app': created - started, 'readyz': ready - created}))
+'''
+
+
+def boot(env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=HERE, env=env,
+                            capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['wall'] = wall
+    return timings
+
+
+def summarize(boots):
+    ms = lambda seconds: round(seconds * 1000, 1)
+    return {
+        'boots': len(boots),
+        'wall_p50_ms': ms(statistics.median(b['wall'] for b in boots)),
+        'wall_max_ms': ms(max(b['wall'] for b in boots)),
+        'create_app_p50_ms': ms(statistics.median(b['create_app'] for b in boots)),
+        'first_readyz_p50_ms': ms(statistics.median(b['readyz'] for b in boots))
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--boots', type=int, default=10, help='boots per mode')
+    parser.add_argument('--modes', default='check,create,migrations,none')
+    args = parser.parse_args(argv)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        def environment(mode, name):
+            env = dict(os.environ, SCHEMA_MODE=mode)
+            env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tmpdir, name))
+            return env
+
+        # bring the shared database to the head once
+        boot(environment('migrations', 'current.db'))
+        for mode in args.modes.split(','):
+            report[mode] = summarize([boot(environment(mode, 'current.db'))
+                                      for _ in range(args.boots)])
+        if 'DATABASE_URL' not in os.environ:
+            report['migrations_first_boot'] = summarize([
+                boot(environment('migrations', f'empty-{i}.db')) for i in range(args.boots)])
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
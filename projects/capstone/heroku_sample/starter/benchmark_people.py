@@ -0,0 +1,123 @@
+'''
+People API benchmark on SQLite.
+
+Fills a temporary SQLite database with --rows people through
+POST /people/batch (the migrations create the schema), then times through
+the Flask test client:
+
+    batch insert   rows/s of POST /people/batch while filling the table
+    list           the first page and a page in the middle of GET /people,
+                   and the same middle page read with OFFSET for comparison
+    search         first and middle pages of GET /people?q= for a common
+                   and a rare prefix
+    export         a full GET /people/export, rows/s
+
+Reports medians in milliseconds as JSON.
+
+Usage (from this directory):
+    python benchmark_people.py --rows 1000000
+'''
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+SYLLABLES = ['an', 'bo', 'ca', 'de', 'el', 'fi', 'ga', 'ho', 'is', 'jo', 'ka', 'lu',
+             'ma', 'ne', 'ol', 'pa', 'qu', 'ri', 'sa', 'to', 'ur', 'vi', 'wa', 'xa', 'yo', 'ze']
+
+
+def name(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def median_ms(f, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=1000, help='people per POST /people/batch')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir.name, 'people.db')
+    os.environ['SCHEMA_MODE'] = 'migrations'
+    from app import app, encode_cursor
+    from models import db, Person
+
+    client = app.test_client()
+    rng = random.Random(args.seed)
+    report = {'rows': args.rows}
+
+    start = time.perf_counter()
+    for offset in range(0, args.rows, args.batch):
+        people = [{'name': name(rng), 'catchphrase': 'hi'}
+                  for _ in range(min(args.batch, args.rows - offset))]
+        assert client.post('/people/batch', json={'people': people}).status_code == 201
+    elapsed = time.perf_counter() - start
+    report['batch_insert'] = {'seconds': round(elapsed, 1), 'rows_per_s': round(args.rows / elapsed)}
+
+    def get(query_string):
+        response = client.get('/people', query_string=query_string)
+        assert response.status_code == 200
+        return response.get_json()
+
+    middle = encode_cursor([args.rows // 2])
+
+    def offset_page():
+        with app.app_context():
+            [person.format() for person in
+             Person.query.order_by(Person.id).offset(args.rows // 2).limit(50).all()]
+
+    report['list'] = {
+        'first_page_ms': median_ms(lambda: get({}), args.repeat),
+        'middle_page_ms': median_ms(lambda: get({'cursor': middle}), args.repeat),
+        'middle_page_with_offset_ms': median_ms(offset_page, args.repeat)
+    }
+
+    report['search'] = {}
+    for prefix in ('ma', 'zexaqu'):
+        first = get({'q': prefix, 'limit': 500})
+        # the 500th match stands in for a page deep into the results
+        cursor = first['next_cursor']
+        report['search'][prefix] = {
+            'first_page_ms': median_ms(lambda: get({'q': prefix}), args.repeat),
+            'next_page_ms': median_ms(lambda: get({'q': prefix, 'cursor': cursor}), args.repeat)
+            if cursor else None,
+            'first_page_matches': len(get({'q': prefix})['people'])
+        }
+
+    start = time.perf_counter()
+    lines = 0
+    response = client.get('/people/export')
+    for chunk in response.response:
+        lines += chunk.count('\n') if isinstance(chunk, str) else chunk.count(b'\n')
+    elapsed = time.perf_counter() - start
+    report['export'] = {
+        'rows': lines,
+        'seconds': round(elapsed, 2),
+        'rows_per_s': round(lines / elapsed)
+    }
+
+    with app.app_context():
+        db.engine.dispose()
+    tmpdir.cleanup()
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
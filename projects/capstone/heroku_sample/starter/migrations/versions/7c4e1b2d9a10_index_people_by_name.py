@@ -0,0 +1,27 @@
+"""index People by lower(name) for search and keyset pagination
+
+Revision ID: 7c4e1b2d9a10
+Revises: 02b69cbe8b30
+Create Date: 2026-10-19 10:12:05.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e1b2d9a10'
+down_revision = '02b69cbe8b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() builds the index from the model, and reflection
+    # cannot see expression indexes on SQLite, so let the database check
+    op.create_index('ix_People_lower_name_id', 'People', [sa.text('lower(name)'), 'id'],
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_People_lower_name_id', table_name='People')
@@ -0,0 +1,37 @@
+"""index People by lower(name) COLLATE "C" on Postgres
+
+The search compares lower(name) with LIKE and a range in byte order (see
+models.name_key). Postgres only uses an index for those when the index has
+the same collation, and its default collations ignore spaces and
+punctuation, so the index of 7c4e1b2d9a10 is rebuilt with COLLATE "C".
+SQLite compares bytes already and keeps the index as it is.
+
+Revision ID: 9e3a5f7b2c41
+Revises: 7c4e1b2d9a10
+Create Date: 2026-10-19 16:40:27.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3a5f7b2c41'
+down_revision = '7c4e1b2d9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_People_lower_name_id', table_name='People', if_exists=True)
+    op.create_index('ix_People_lower_name_id', 'People',
+                    [sa.text('lower(name) COLLATE "C"'), 'id'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_People_lower_name_id', table_name='People')
+    op.create_index('ix_People_lower_name_id', 'People', [sa.text('lower(name)'), 'id'])
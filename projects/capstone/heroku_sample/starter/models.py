@@ -1,21 +1,112 @@
-from sqlalchemy import Column, String, create_engine
+import os
+from sqlalchemy import Column, String, Integer, Index, create_engine, text, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate, upgrade
 import json
 
-database_path = os.environ['DATABASE_URL']
+from flask_toolkit import init_db
+
+# heroku still hands out postgres:// urls, SQLAlchemy 1.4 only accepts postgresql://
+database_path = os.environ['DATABASE_URL'].replace('postgres://', 'postgresql://', 1)
+migrations_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
 
 db = SQLAlchemy()
+migrate = Migrate()
 
 '''
 setup_db(app)
-    binds a flask application and a SQLAlchemy service
+    binds a flask application and a SQLAlchemy service, the DB_* settings
+    of flask_toolkit tune the connection pool
+    SCHEMA_MODE (config or env, default 'check') decides what happens to the schema on boot:
+        check: one query compares the database with the migration head and
+            logs a warning when it is behind. the schema is migrated once per
+            deploy by the release phase (`flask db upgrade`, see Procfile),
+            never by the web workers
+        migrations: runs `flask db upgrade` when the database is behind, for
+            a single local process without a release phase
+        create: db.create_all(), which reflects every table on every boot
+        none: nothing
 '''
 def setup_db(app, database_path=database_path):
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
-    db.init_app(app)
-    db.create_all()
+    app.config.setdefault("SCHEMA_MODE", os.environ.get("SCHEMA_MODE", "check"))
+    init_db(app, db, database_path)
+    migrate.init_app(app, db, directory=migrations_directory)
+
+    schema_mode = app.config["SCHEMA_MODE"]
+    if schema_mode == 'create':
+        db.create_all()
+    elif schema_mode in ('check', 'migrations'):
+        with app.app_context():
+            if not migrations_current():
+                if schema_mode == 'migrations':
+                    upgrade(directory=migrations_directory)
+                else:
+                    app.logger.warning('the database schema is behind the migrations and workers do not '
+                                       'migrate it, run `flask db upgrade`')
+    elif schema_mode != 'none':
+        raise ValueError('SCHEMA_MODE must be check, migrations, create or none, not ' + repr(schema_mode))
+
+
+'''
+migrations_current()
+    True when the database is at the head revision of ./migrations
+'''
+def migrations_current():
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory(migrations_directory).get_heads())
+    with db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == heads
+
+
+'''
+warm_pool(size=None)
+    opens size connections (by default as many as the pool keeps), runs
+    SELECT 1 on each and returns them to the pool, so the first requests
+    after a boot do not pay for connecting. returns the number checked.
+'''
+def warm_pool(size=None):
+    if size is None:
+        pool = db.engine.pool
+        size = pool.size() if hasattr(pool, 'size') else 1
+    connections = []
+    try:
+        for _ in range(max(size, 1)):
+            connection = db.engine.connect()
+            connections.append(connection)
+            connection.execute(text('SELECT 1'))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+'''
+name_key(column)
+    lower(column) compared byte by byte, the sort and search key of
+    people. LIKE 'prefix%', the range of the prefix and ORDER BY then agree
+    and are all served by one index: Postgres gets COLLATE "C", since its
+    default collations ignore spaces and punctuation, SQLite compares bytes
+    already. SQLite's lower() only folds ASCII letters.
+'''
+class name_key(FunctionElement):
+    type = String()
+    name = 'name_key'
+    inherit_cache = True
+
+
+@compiles(name_key)
+def _compile_name_key(element, compiler, **kw):
+    return 'lower(%s)' % compiler.process(element.clauses, **kw)
+
+
+@compiles(name_key, 'postgresql')
+def _compile_name_key_postgresql(element, compiler, **kw):
+    return 'lower(%s) COLLATE "C"' % compiler.process(element.clauses, **kw)
 
 
 '''
@@ -29,6 +120,9 @@ class Person(db.Model):
   name = Column(String)
   catchphrase = Column(String)
 
+  # serves ?q= prefix search and its keyset pagination, see search()
+  __table_args__ = (Index('ix_People_lower_name_id', name_key(name), id),)
+
   def __init__(self, name, catchphrase=""):
     self.name = name
     self.catchphrase = catchphrase
@@ -37,4 +131,65 @@ class Person(db.Model):
     return {
       'id': self.id,
       'name': self.name,
-      'catchphrase': self.catchphrase}
\ No newline at end of file
+      'catchphrase': self.catchphrase}
+
+  '''
+  page(after=0, limit=50)
+      rows (id, name, catchphrase) with an id greater than after, by id
+  search(prefix, after=None, limit=50)
+      rows whose lower-cased name starts with prefix, by (name_key, id),
+      continuing after the (name_key, id) pair given in after. the match is
+      name_key LIKE the escaped prefix followed by %, bounded by the range
+      of the prefix so SQLite can seek too, and answered by a range scan of
+      ix_People_lower_name_id, without sorting.
+  both read plain rows instead of loading Person objects
+  '''
+  @classmethod
+  def page(cls, after=0, limit=50):
+    return db.session.query(cls.id, cls.name, cls.catchphrase).filter(
+      cls.id > after).order_by(cls.id).limit(limit).all()
+
+  @classmethod
+  def search(cls, prefix, after=None, limit=50):
+    key = name_key(cls.name)
+    prefix = prefix.lower()
+    query = db.session.query(cls.id, cls.name, cls.catchphrase, key.label('name_key')).filter(
+      key.like(escape_like(prefix) + '%', escape='\\'), key >= prefix)
+    upper = prefix_upper_bound(prefix)
+    if upper is not None:
+      query = query.filter(key < upper)
+    if after is not None:
+      # the first condition lets the index seek to the cursor, the second
+      # skips the rows of the same name already returned
+      query = query.filter(key >= after[0], tuple_(key, cls.id) > tuple_(*after))
+    return query.order_by(key, cls.id).limit(limit).all()
+
+
+'''
+escape_like(value)
+    value with the LIKE wildcards % and _ and the escape character \
+    escaped, for LIKE ... ESCAPE '\'
+'''
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+'''
+prefix_upper_bound(prefix)
+    the smallest string greater than every string starting with prefix, in
+    code point (and UTF-8 byte) order. None when there is none, i.e. the
+    prefix is only U+10FFFF characters. surrogates are skipped, since
+    they cannot be encoded.
+'''
+def prefix_upper_bound(prefix):
+    prefix = prefix.rstrip('\U0010ffff')
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+    return prefix[:-1] + chr(following)
+
+
+def format_row(row):
+    return {'id': row.id, 'name': row.name, 'catchphrase': row.catchphrase}
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+# models reads DATABASE_URL when it is imported
+directory = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(directory, 'test.db'))
+
+from sqlalchemy.dialects import postgresql
+
+from app import create_app, decode_cursor
+from models import db, name_key, prefix_upper_bound, Person
+
+
+class PeopleSearchTestCase(unittest.TestCase):
+    """This class represents the ?q= search of GET /people"""
+
+    names = ['John Smith', 'John Snow', 'Johnson', "O'Brien", 'Obi', 'a-b', 'ab',
+             '100% Real', '100 Real', 'snake_case', 'snakeXcase', 'Zoë']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app({'TESTING': True, 'SCHEMA_MODE': 'migrations'})
+        cls.client = cls.app.test_client
+        res = cls.client().post('/people/batch', json={'people': [{'name': name} for name in cls.names]})
+        assert res.status_code == 201
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def search(self, q, **params):
+        res = self.client().get('/people', query_string=dict(params, q=q))
+        self.assertEqual(res.status_code, 200)
+        return res.get_json()
+
+    def names_of(self, q):
+        return [person['name'] for person in self.search(q)['people']]
+
+    def test_prefix_with_space(self):
+        self.assertEqual(self.names_of('john s'), ['John Smith', 'John Snow'])
+        self.assertEqual(self.names_of('JOHN'), ['John Smith', 'John Snow', 'Johnson'])
+
+    def test_prefix_with_punctuation(self):
+        self.assertEqual(self.names_of("o'b"), ["O'Brien"])
+        self.assertEqual(self.names_of('a-'), ['a-b'])
+
+    def test_wildcards_match_literally(self):
+        self.assertEqual(self.names_of('100%'), ['100% Real'])
+        self.assertEqual(self.names_of('snake_'), ['snake_case'])
+        self.assertEqual(self.names_of('\\'), [])
+
+    def test_prefix_of_last_code_point(self):
+        self.assertEqual(self.names_of('\U0010ffff'), [])
+        self.assertEqual(self.names_of('z\U0010ffff'), [])
+
+    def test_cursor_pagination(self):
+        first = self.search('john', limit=2)
+        self.assertEqual([person['name'] for person in first['people']], ['John Smith', 'John Snow'])
+        self.assertEqual(decode_cursor(first['next_cursor'], (str, int))[0], 'john snow')
+
+        second = self.search('john', limit=2, cursor=first['next_cursor'])
+        self.assertEqual([person['name'] for person in second['people']], ['Johnson'])
+        self.assertIsNone(second['next_cursor'])
+
+
+class NameKeyTestCase(unittest.TestCase):
+    """This class represents the sort key and bounds of the search"""
+
+    def test_postgres_compares_bytes(self):
+        sql = str(name_key(Person.name).compile(dialect=postgresql.dialect()))
+        self.assertEqual(sql, 'lower("People".name) COLLATE "C"')
+
+    def test_prefix_upper_bound(self):
+        self.assertEqual(prefix_upper_bound('ab'), 'ac')
+        self.assertEqual(prefix_upper_bound('a\U0010ffff'), 'b')
+        self.assertIsNone(prefix_upper_bound('\U0010ffff\U0010ffff'))
+        self.assertEqual(prefix_upper_bound('\ud7ff'), '\ue000')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,12 @@
 import os
-from flask import Flask, request, abort, jsonify
+from flask import request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from flask_cors import CORS
+
+from flask_toolkit import create_app as create_toolkit_app
 
 def create_app(test_config=None):
-  # create and configure the app
-  app = Flask(__name__)
-  CORS(app)
+  # create and configure the app, with CORS and JSON errors from flask_toolkit
+  app = create_toolkit_app(__name__, test_config)
 
   return app
 